@@ -1,35 +1,258 @@
-from flask import Flask, jsonify, request, session, send_from_directory
+from flask import Flask, Response, g, jsonify, request, session, send_from_directory
 from flask_cors import CORS
 import pymysql
-import bcrypt
+import atexit
+import click
+import hmac
 from datetime import datetime
-import os
 from functools import wraps
-from decimal import Decimal  # Add this import
+from config import Config
+from json_provider import FastJSONProvider
+from db_pool import ConnectionPool, PoolTimeout
+from cache import TTLCache
+from events import EventBroadcaster, TooManySubscribers, format_event
+from data_versions import DataVersions, bump_versions, read_version, touch_versions
+from password_hashing import HashQueueFull, PasswordHasher
+from sessions import MemorySessionStore, RedisSessionStore, ServerSideSessionInterface
+from metrics import Instrumentation
+from ratings import apply_review, expected_rating, reconcile_ratings
+from rollups import apply_to_rollup, rating_trend, rebuild_rollups, trend_start
+from bulk_import import check_review_lengths, detect_format, import_employees, import_reviews
+from migrations import migrate, pending_migrations
+from explain_check import run_explain_check
+from search_index import EmployeeSearchIndex, search_reviews
+from departments import DepartmentCache
+from leaderboard import Leaderboard
+from review_queue import ReviewQueue
+from exports import EXPORTS, ExportJobs, csv_chunks, encode_chunks, export_rows, parse_date
+from queries import (
+    QUERIES, COUNT_RATED, DASHBOARD_STATS, DEPARTMENT_RATINGS, EMPLOYEE_DETAILS, EMPLOYEE_EXISTS, EMPLOYEE_ID_BY_EMAIL,
+    EMPLOYEE_DELETE, EMPLOYEE_INSERT, EMPLOYEE_LIST, EMPLOYEE_RATING_FOR_UPDATE, EMPLOYEE_ROLLUP_MONTHS,
+    EMPLOYEE_SORT_ANCHOR, REVIEW_BEFORE_SQL, REVIEW_INSERT, REVIEW_PAGE, REVIEW_STREAM, SEARCH_EMPLOYEES, TOP_RATED,
+    USER_ID_BY_EMAIL, USER_ID_BY_USERNAME, USER_INSERT, USER_LOGIN, USER_PASSWORD_UPDATE, employee_decoder, encode_rows,
+    initials, tuple_cursor, validate as validate_queries
+)
 
 app = Flask(__name__, static_folder='../frontend/static', static_url_path='/static')
-app.secret_key = os.urandom(24)
-CORS(app)
+# A stable key keeps session cookies valid across restarts and workers
+app.secret_key = Config.SECRET_KEY
+# Encodes Decimal and date values directly, using orjson when installed
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['X-Next-After-Id'])
+
+# Sessions live server side; the cookie only holds a signed session id
+app.session_interface = ServerSideSessionInterface(
+    RedisSessionStore(Config.SESSION_REDIS_URL) if Config.SESSION_BACKEND == 'redis' else MemorySessionStore(),
+    lifetime=Config.SESSION_LIFETIME,
+    local_cache_size=Config.SESSION_LOCAL_CACHE_SIZE,
+    local_cache_ttl=Config.SESSION_LOCAL_CACHE_TTL
+)
 
 # Database configuration
 db_config = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'root@123',
-    'database': 'employee_pro',
+    'host': Config.DB_HOST,
+    'port': Config.DB_PORT,
+    'user': Config.DB_USER,
+    'password': Config.DB_PASSWORD,
+    'database': Config.DB_NAME,
     'cursorclass': pymysql.cursors.DictCursor
 }
 
-# Helper function to convert Decimal objects to float for JSON serialization
-def convert_decimal_to_float(obj):
-    if isinstance(obj, dict):
-        return {k: convert_decimal_to_float(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimal_to_float(item) for item in obj]
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    else:
-        return obj
+# Request/SQL timing, exported at /metrics (see get_metrics)
+instrumentation = Instrumentation(slow_query_ms=Config.SLOW_QUERY_LOG_MS)
+instrumentation.init_app(app, endpoint=None)
+
+# Shared connection pool used by every route
+db_pool = ConnectionPool(
+    db_config,
+    min_size=Config.DB_POOL_MIN_SIZE,
+    max_size=Config.DB_POOL_MAX_SIZE,
+    timeout=Config.DB_POOL_TIMEOUT,
+    idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+    max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+    reap_interval=Config.DB_POOL_REAP_INTERVAL,
+    cursor_wrapper=instrumentation.wrap_cursor
+)
+# Each process opens its minimum connections and starts the reaper on its
+# first request (gunicorn workers already do right after forking), and
+# closes its idle connections on exit
+app.before_request(db_pool.ensure_started)
+atexit.register(db_pool.close_all)
+
+
+# Connection pool and password hashing figures for /metrics
+instrumentation.registry.callback(
+    'performancepro_db_pool_connections',
+    'Database connections by state.',
+    'gauge',
+    lambda: [((('state', state),), db_pool.stats()[state]) for state in ('in_use', 'idle', 'waiting')]
+)
+instrumentation.registry.callback(
+    'performancepro_db_pool_events_total',
+    'Connections created and recycled, checkouts and checkout timeouts.',
+    'counter',
+    lambda: [((('event', event),), db_pool.stats()[event]) for event in ('created', 'recycled', 'checkouts', 'timeouts')]
+)
+password_hash_duration = instrumentation.registry.histogram(
+    'performancepro_password_hash_duration_seconds',
+    'Time spent hashing or checking a password in a worker.',
+    ('operation',)
+)
+password_hash_queue_wait = instrumentation.registry.histogram(
+    'performancepro_password_hash_queue_wait_seconds',
+    'Time a password operation waited for a free hashing worker.',
+    ('operation',)
+)
+instrumentation.registry.callback(
+    'performancepro_password_hash_rejected_total',
+    'Password operations rejected because the hashing queue was full.',
+    'counter',
+    lambda: [((), password_hasher.stats()['rejected'])]
+)
+
+def observe_password_hash(operation, queue_wait, duration):
+    password_hash_queue_wait.observe(queue_wait, operation=operation)
+    password_hash_duration.observe(duration, operation=operation)
+
+# bcrypt runs on a bounded pool of worker processes
+password_hasher = PasswordHasher(
+    rounds=Config.BCRYPT_ROUNDS,
+    workers=Config.BCRYPT_WORKERS,
+    max_queue=Config.BCRYPT_MAX_QUEUE,
+    observer=observe_password_hash
+)
+
+# Cached /api/dashboard payload, dropped whenever employees or reviews change
+dashboard_cache = TTLCache(Config.DASHBOARD_CACHE_TTL)
+
+# Data version counters behind the ETags of the read routes
+data_versions = DataVersions(lambda: db_pool.connection(), Config.DATA_VERSION_REFRESH)
+conditional_get = data_versions.conditional_get
+
+# Department id -> name dictionary, so employee queries need no join
+departments = DepartmentCache(lambda: db_pool.connection(), lambda: data_versions.get('departments')[0])
+
+# Change events pushed to live dashboards over /api/stream/dashboard
+dashboard_events = EventBroadcaster(
+    max_clients=Config.DASHBOARD_STREAM_MAX_CLIENTS,
+    queue_size=Config.DASHBOARD_STREAM_QUEUE_SIZE
+)
+instrumentation.registry.callback(
+    'performancepro_dashboard_stream_clients',
+    'Clients connected to the live dashboard stream.',
+    'gauge',
+    lambda: [((), dashboard_events.stats()['clients'])]
+)
+
+# In-memory search index over employees, rebuilt in the background when
+# the 'directory' data version moves and patched in place for this
+# process's own writes
+search_index = EmployeeSearchIndex()
+
+def current_search_index():
+    search_index.ensure_current(data_versions.get('directory')[0], get_db_connection)
+    return search_index
+
+# Employees ranked by rating, answering top-N lists and rating threshold
+# counts from memory. Like the search index it is patched in place for this
+# process's own writes; after writes made elsewhere it is rebuilt in the
+# background and the SQL queries answer until it has caught up.
+leaderboard = Leaderboard()
+
+# The leaderboard if it is current, else None. Checking may take a pooled
+# connection, so callers resolve it before checking out their own.
+def current_leaderboard():
+    if leaderboard.ensure_current(data_versions.get('employees')[0], get_db_connection):
+        return leaderboard
+    return None
+
+# Build the leaderboard and search index on a connection of its own,
+# outside the pool, so a server can have them ready before its first
+# request: gunicorn does it in the master and the workers inherit them
+# when they fork. If the data moves on meanwhile, or this fails, they are
+# rebuilt on first use as usual.
+def warm_caches():
+    connection = pymysql.connect(**db_config)
+    try:
+        with connection.cursor() as cursor:
+            employees_version = read_version(cursor, 'employees')
+            directory_version = read_version(cursor, 'directory')
+        leaderboard.rebuild(connection, employees_version)
+        search_index.rebuild(connection, directory_version)
+    finally:
+        connection.close()
+
+# Drop this process's cached views of the data after committing a write
+def data_changed():
+    dashboard_cache.invalidate()
+    data_versions.invalidate()
+
+# Write-behind queue for POST /api/reviews when REVIEW_INGEST_MODE=queue
+review_queue_delay = instrumentation.registry.histogram(
+    'performancepro_review_queue_delay_seconds',
+    'Time from queueing a review to committing it to the database.',
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+
+def review_queue_flushed(reviews, delays):
+    for delay in delays:
+        review_queue_delay.observe(delay)
+    if reviews:
+        data_changed()
+        dashboard_events.publish('refresh', {})
+
+review_queue = None
+if Config.REVIEW_INGEST_MODE == 'queue':
+    review_queue = ReviewQueue(
+        Config.REVIEW_QUEUE_PATH,
+        lambda: db_pool.connection(),
+        flush_size=Config.REVIEW_QUEUE_FLUSH_SIZE,
+        flush_interval=Config.REVIEW_QUEUE_FLUSH_INTERVAL,
+        claim_timeout=Config.REVIEW_QUEUE_CLAIM_TIMEOUT,
+        on_flush=review_queue_flushed
+    )
+    # Every worker process runs a batcher, started on its first request
+    app.before_request(review_queue.ensure_started)
+    instrumentation.registry.callback(
+        'performancepro_review_queue_pending',
+        'Reviews queued but not yet written to the database.',
+        'gauge',
+        lambda: [((), review_queue.lag()[0])]
+    )
+    instrumentation.registry.callback(
+        'performancepro_review_queue_lag_seconds',
+        'Age of the oldest review still waiting in the queue.',
+        'gauge',
+        lambda: [((), review_queue.lag()[1])]
+    )
+    instrumentation.registry.callback(
+        'performancepro_review_queue_reviews_total',
+        'Queued reviews by outcome in this process.',
+        'counter',
+        lambda: [((('outcome', outcome),), review_queue.stats()[outcome])
+                 for outcome in ('enqueued', 'flushed', 'dropped', 'dead')]
+    )
+    instrumentation.registry.callback(
+        'performancepro_review_queue_dead_letters',
+        'Queued reviews the database refused, kept in dead_reviews.',
+        'gauge',
+        lambda: [((), review_queue.dead_letters())]
+    )
+    instrumentation.registry.callback(
+        'performancepro_review_queue_flush_failures_total',
+        'Batches of queued reviews that failed to write and were retried.',
+        'counter',
+        lambda: [((), review_queue.stats()['failures'])]
+    )
+
+# XLSX and CSV exports written to disk in the background
+export_jobs = ExportJobs(
+    Config.EXPORT_DIR,
+    lambda: db_pool.connection(),
+    departments.names,
+    workers=Config.EXPORT_JOB_WORKERS,
+    ttl=Config.EXPORT_JOB_TTL
+)
 
 # Error handlers
 @app.errorhandler(404)
@@ -40,9 +263,22 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
-# Helper function to connect to database
+@app.errorhandler(PoolTimeout)
+def pool_timeout(error):
+    return jsonify({'error': 'Database is busy, please retry shortly'}), 503
+
+@app.errorhandler(TooManySubscribers)
+def too_many_subscribers(error):
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '30'}
+
+@app.errorhandler(HashQueueFull)
+def hash_queue_full(error):
+    return jsonify({'error': str(error)}), 429, {'Retry-After': '1'}
+
+# Helper function to check out a pooled database connection.
+# Calling close() on it returns the connection to the pool.
 def get_db_connection():
-    return pymysql.connect(**db_config)
+    return db_pool.connection()
 
 # Authentication middleware
 def login_required(f):
@@ -88,40 +324,66 @@ def login():
         connection = get_db_connection()
         try:
             with connection.cursor() as cursor:
-                cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+                USER_LOGIN.execute(cursor, (username,))
                 user = cursor.fetchone()
-                
-                if user and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-                    # Validate role (case-insensitive comparison)
-                    user_role = user['role'].strip().lower()
-                    if user_role not in ['admin', 'customer']:
-                        return jsonify({'error': 'Invalid role. Only admin and customer roles are allowed.'}), 403
-                    
-                    # Check if requested role matches user's role
-                    if role.lower() != user_role:
-                        return jsonify({'error': 'Selected role does not match your account role.'}), 403
-                    
-                    session['user_id'] = user['id']
-                    session['username'] = user['username']
-                    session['role'] = user_role
-                    session['name'] = user['name']
-                    
-                    return jsonify({
-                        'success': True,
-                        'user': {
-                            'id': user['id'],
-                            'username': user['username'],
-                            'role': user_role,
-                            'name': user['name']
-                        }
-                    })
-                else:
-                    return jsonify({'error': 'Invalid username or password'}), 401
         finally:
+            # Release the connection before the slow password check
             connection.close()
+        
+        if user and password_hasher.check(password, user['password']):
+            # Validate role (case-insensitive comparison)
+            user_role = user['role'].strip().lower()
+            if user_role not in ['admin', 'customer']:
+                return jsonify({'error': 'Invalid role. Only admin and customer roles are allowed.'}), 403
+            
+            # Check if requested role matches user's role
+            if role.lower() != user_role:
+                return jsonify({'error': 'Selected role does not match your account role.'}), 403
+            
+            # Upgrade hashes made with a different work factor while the
+            # plain password is at hand
+            if password_hasher.needs_rehash(user['password']):
+                rehash_password(user['id'], password)
+            
+            # Start a fresh session id for the authenticated user
+            session.clear()
+            session.regenerate()
+            session['user_id'] = user['id']
+            session['username'] = user['username']
+            session['role'] = user_role
+            session['name'] = user['name']
+            
+            return jsonify({
+                'success': True,
+                'user': {
+                    'id': user['id'],
+                    'username': user['username'],
+                    'role': user_role,
+                    'name': user['name']
+                }
+            })
+        else:
+            return jsonify({'error': 'Invalid username or password'}), 401
+    except (PoolTimeout, HashQueueFull):
+        raise
     except Exception as e:
         return jsonify({'error': f'Database error: {str(e)}'}), 500
 
+# Helper function to store a password hash made with the current work factor.
+# Login already succeeded, so a busy hasher or database just skips the upgrade.
+def rehash_password(user_id, password):
+    try:
+        hashed_password = password_hasher.hash(password)
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                USER_PASSWORD_UPDATE.execute(cursor, (hashed_password, user_id))
+            connection.commit()
+        finally:
+            connection.close()
+    except (PoolTimeout, HashQueueFull, pymysql.MySQLError):
+        app.logger.warning('Skipped password rehash for user %s', user_id)
+
 @app.route('/api/logout', methods=['POST'])
 def logout():
     session.clear()
@@ -130,134 +392,396 @@ def logout():
 @app.route('/api/dashboard', methods=['GET'])
 @login_required
 @admin_required
+@conditional_get('employees', 'reviews')
 def get_dashboard_data():
+    # The cached payload is only served to requests tagged with the data
+    # versions it was built for, so its ETag always matches its contents
+    versions = g.data_versions
+    cached = dashboard_cache.get('dashboard')
+    if cached is not None and cached[0] == versions:
+        return jsonify(cached[1])
+    generation = dashboard_cache.generation
+
+    board = current_leaderboard()
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            # Get total employees
-            cursor.execute("SELECT COUNT(*) as count FROM employees")
-            total_employees = cursor.fetchone()['count']
-            
-            # Get average customer rating
-            cursor.execute("SELECT AVG(customer_rating) as avg_rating FROM employees WHERE review_count > 0")
-            avg_rating = cursor.fetchone()['avg_rating'] or 0
+            if board is not None:
+                stats = board.summary()
+            else:
+                DASHBOARD_STATS.execute(cursor)
+                stats = cursor.fetchone()
+            avg_rating = stats['avg_rating']
             
-            # Get total reviews
-            cursor.execute("SELECT SUM(review_count) as total FROM employees")
-            total_reviews = cursor.fetchone()['total'] or 0
-            
-            # Get top rated employees (rating >= 4.5)
-            cursor.execute("SELECT COUNT(*) as count FROM employees WHERE customer_rating >= 4.5")
-            top_rated = cursor.fetchone()['count']
-            
-            # Get rating distribution
-            cursor.execute("""
-                SELECT 
-                    SUM(CASE WHEN customer_rating >= 4.5 THEN 1 ELSE 0 END) as five_star,
-                    SUM(CASE WHEN customer_rating >= 3.5 AND customer_rating < 4.5 THEN 1 ELSE 0 END) as four_star,
-                    SUM(CASE WHEN customer_rating >= 2.5 AND customer_rating < 3.5 THEN 1 ELSE 0 END) as three_star,
-                    SUM(CASE WHEN customer_rating >= 1.5 AND customer_rating < 2.5 THEN 1 ELSE 0 END) as two_star,
-                    SUM(CASE WHEN customer_rating < 1.5 THEN 1 ELSE 0 END) as one_star
-                FROM employees
-            """)
-            rating_distribution = cursor.fetchone()
+            # Top rated employees (rating >= 4.5) are the five star bucket
+            rating_distribution = {
+                'five_star': stats['five_star'],
+                'four_star': stats['four_star'],
+                'three_star': stats['three_star'],
+                'two_star': stats['two_star'],
+                'one_star': stats['one_star']
+            }
             
-            # Get monthly ratings (last 6 months)
-            cursor.execute("""
-                SELECT 
-                    MONTH(date) as month,
-                    AVG(rating) as avg_rating
-                FROM customer_reviews
-                WHERE date >= DATE_SUB(CURRENT_DATE, INTERVAL 6 MONTH)
-                GROUP BY MONTH(date)
-                ORDER BY month
-            """)
-            monthly_ratings = cursor.fetchall()
+            # Get monthly ratings (last 6 months) from the monthly rollup
+            monthly_ratings = rating_trend(cursor, months=6)
             
-            # Convert Decimal values to float before returning JSON
             dashboard_data = {
-                'total_employees': total_employees,
+                'total_employees': stats['total_employees'],
                 'avg_customer_rating': round(float(avg_rating), 1) if avg_rating else 0,
-                'total_reviews': total_reviews,
-                'top_rated': top_rated,
-                'rating_distribution': convert_decimal_to_float(rating_distribution),
-                'monthly_ratings': convert_decimal_to_float(monthly_ratings)
+                # Let live dashboards recompute the average from deltas
+                'rated_employees': int(stats['rated_employees'] or 0),
+                'rating_total': float(stats['rating_total'] or 0),
+                'total_reviews': int(stats['total_reviews'] or 0),
+                'top_rated': int(stats['five_star'] or 0),
+                'rating_distribution': rating_distribution,
+                'monthly_ratings': monthly_ratings
             }
             
+            dashboard_cache.set('dashboard', (versions, dashboard_data), generation)
             return jsonify(dashboard_data)
     finally:
         connection.close()
 
+# Server-Sent Events stream of dashboard changes. Writes in this process
+# arrive as small deltas (review, employee_added, employee_deleted); a
+# client that falls behind, and writes made by other processes, which are
+# noticed at the next heartbeat, produce a refresh event telling the
+# client to reload /api/dashboard.
+@app.route('/api/stream/dashboard', methods=['GET'])
+@login_required
+@admin_required
+def stream_dashboard():
+    subscriber = dashboard_events.subscribe()
+    
+    def generate():
+        known_versions = data_versions.get('employees', 'reviews')
+        # Browsers reconnect after this many milliseconds
+        yield 'retry: 5000\n\n'
+        while True:
+            message = subscriber.get(timeout=Config.DASHBOARD_STREAM_HEARTBEAT)
+            if subscriber.overflowed:
+                subscriber.drain()
+                known_versions = data_versions.get('employees', 'reviews')
+                yield format_event('refresh', '{}')
+            elif message is not None:
+                event, data = message
+                known_versions = data_versions.get('employees', 'reviews')
+                yield format_event(event, app.json.dumps(data))
+            else:
+                versions = data_versions.get('employees', 'reviews')
+                if versions != known_versions:
+                    known_versions = versions
+                    yield format_event('refresh', '{}')
+                else:
+                    yield ': heartbeat\n\n'
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the client goes away, even before the stream started
+    response.call_on_close(lambda: dashboard_events.unsubscribe(subscriber))
+    return response
+
+# Columns GET /api/employees can sort on with ?sort=, ties broken by id
+EMPLOYEE_SORTS = {
+    'id': 'e.id',
+    'name': 'e.name',
+    'rating': 'e.customer_rating',
+    'review_count': 'e.review_count'
+}
+
+# Helper function to turn the query string of GET /api/employees into SQL.
+# Pagination is keyset based: the next page starts after the row whose id
+# is passed as ?after_id=, so every page costs the same no matter how deep.
+# The columns come back in the returned order, id first. department_ids
+# (name -> id) is read before the connection is checked out, since
+# refreshing the department cache takes a connection of its own.
+def build_employee_list_query(args, cursor, department_ids):
+    fields = args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in EMPLOYEE_LIST.columns]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    else:
+        fields = list(EMPLOYEE_LIST.columns)
+    
+    # id drives the cursor and name the avatar fallback, so both are always read
+    columns = tuple(dict.fromkeys(['id'] + fields + (['name'] if 'avatar' in fields else [])))
+    
+    sort = args.get('sort', 'id')
+    if sort not in EMPLOYEE_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(EMPLOYEE_SORTS)}")
+    order = args.get('order', 'asc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be a number')
+        if limit < 1 or limit > Config.EMPLOYEES_MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {Config.EMPLOYEES_MAX_PAGE_SIZE}')
+    
+    conditions = []
+    params = []
+    
+    if args.get('department'):
+        # An unknown name becomes "= NULL", which matches no employee
+        conditions.append('e.department_id = %s')
+        params.append(department_ids.get(args['department']))
+    
+    if args.get('department_id'):
+        try:
+            department_id = int(args['department_id'])
+        except ValueError:
+            raise ValueError('department_id must be a number')
+        conditions.append('e.department_id = %s')
+        params.append(department_id)
+    
+    if args.get('min_rating'):
+        try:
+            min_rating = float(args['min_rating'])
+        except ValueError:
+            raise ValueError('min_rating must be a number')
+        conditions.append('e.customer_rating >= %s')
+        params.append(min_rating)
+    
+    if args.get('name_prefix'):
+        prefix = args['name_prefix'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append('e.name LIKE %s')
+        params.append(prefix + '%')
+    
+    sort_column = EMPLOYEE_SORTS[sort]
+    comparison = '>' if order == 'asc' else '<'
+    if args.get('after_id'):
+        try:
+            after_id = int(args['after_id'])
+        except ValueError:
+            raise ValueError('after_id must be a number')
+        if sort == 'id':
+            conditions.append(f'e.id {comparison} %s')
+            params.append(after_id)
+        else:
+            EMPLOYEE_SORT_ANCHOR.execute(cursor, (after_id,), columns=(sort,))
+            anchor = cursor.fetchone()
+            if not anchor:
+                raise ValueError('after_id does not reference an existing employee')
+            conditions.append(
+                f'({sort_column} {comparison} %s OR ({sort_column} = %s AND e.id {comparison} %s))'
+            )
+            params.extend([anchor[sort], anchor[sort], after_id])
+    
+    order_by = 'e.id' if sort == 'id' else f'{sort_column} {order.upper()}, e.id'
+    if limit is not None:
+        # Read one extra row to learn whether another page follows
+        params.append(limit + 1)
+    sql = EMPLOYEE_LIST.text(
+        columns,
+        where='WHERE ' + ' AND '.join(conditions) if conditions else '',
+        order_by=f'{order_by} {order.upper()}',
+        limit='LIMIT %s' if limit is not None else ''
+    )
+    
+    return sql, params, columns, fields, limit
+
 @app.route('/api/employees', methods=['GET'])
 @login_required
+@conditional_get('employees', 'reviews', 'departments')
 def get_employees():
     # Changed from @admin_required to @login_required to allow both admins and customers
+    names = departments.names()
+    department_ids = departments.ids()
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT e.*, d.name as department_name
-                FROM employees e
-                JOIN departments d ON e.department = d.name
-            """)
+            try:
+                sql, params, columns, fields, limit = build_employee_list_query(request.args, cursor, department_ids)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        # Rows stay tuples; the decoder builds each response object with
+        # the avatar fallback and department names in one pass and leaves
+        # out columns only read for the cursor or the avatar
+        with tuple_cursor(connection) as cursor:
+            cursor.execute(sql, params)
             employees = cursor.fetchall()
-            
-            # Format avatar for each employee
-            for emp in employees:
-                if not emp['avatar']:
-                    # Generate avatar initials from name
-                    name_parts = emp['name'].split()
-                    emp['avatar'] = ''.join([part[0].upper() for part in name_parts[:2]])
-            
-            # Convert Decimal values to float before returning JSON
-            employees = convert_decimal_to_float(employees)
-            
-            return jsonify(employees)
+        
+        next_after_id = None
+        if limit is not None and len(employees) > limit:
+            employees = employees[:limit]
+            next_after_id = employees[-1][0]
+        
+        decode = employee_decoder(columns, fields, names)
+        response = app.response_class(encode_rows(app.json.dumps, employees, decode), mimetype='application/json')
+        if next_after_id is not None:
+            response.headers['X-Next-After-Id'] = str(next_after_id)
+        return response
     finally:
         connection.close()
 
+# Helper function to build the cursor that points past the last review of a page
+def split_review_page(reviews, limit):
+    if len(reviews) <= limit:
+        return reviews, None
+    reviews = reviews[:limit]
+    last = reviews[-1]
+    return reviews, f"{last['date'].isoformat()}:{last['id']}"
+
+# Helper function to decode a review cursor into (date, id)
+def parse_review_cursor(value):
+    if not value:
+        return None
+    review_date, review_id = value.split(':')
+    return datetime.strptime(review_date, '%Y-%m-%d').date(), int(review_id)
+
+# Helper function to read one employee with its department name filled in
+# from names (department_id -> name, read before the checkout)
+def fetch_employee(cursor, employee_id, names):
+    EMPLOYEE_DETAILS.execute(cursor, (employee_id,))
+    employee = cursor.fetchone()
+    if employee:
+        employee['department'] = employee['department_name'] = names.get(employee['department_id'])
+    return employee
+
 @app.route('/api/employees/<int:employee_id>', methods=['GET'])
 @login_required
+@conditional_get('employees', 'reviews', 'departments')
 def get_employee_details(employee_id):
     # Changed from no decorator to @login_required to allow both admins and customers
+    names = departments.names()
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
             # Get employee details
-            cursor.execute("""
-                SELECT e.*, d.name as department_name
-                FROM employees e
-                JOIN departments d ON e.department = d.name
-                WHERE e.id = %s
-            """, (employee_id,))
-            employee = cursor.fetchone()
+            employee = fetch_employee(cursor, employee_id, names)
             
             if not employee:
                 return jsonify({'error': 'Employee not found'}), 404
             
             # Generate avatar if not exists
             if not employee['avatar']:
-                name_parts = employee['name'].split()
-                employee['avatar'] = ''.join([part[0].upper() for part in name_parts[:2]])
+                employee['avatar'] = initials(employee['name'])
             
-            # Get customer reviews for this employee
-            cursor.execute("""
-                SELECT * FROM customer_reviews
-                WHERE employee_id = %s
-                ORDER BY date DESC
-            """, (employee_id,))
+            # Only the newest page of reviews is embedded; older ones are
+            # served by GET /api/employees/<id>/reviews
+            page_size = Config.REVIEWS_PAGE_SIZE
+            REVIEW_PAGE.execute(cursor, (employee_id, page_size + 1), before='')
             reviews = cursor.fetchall()
+            reviews, next_cursor = split_review_page(reviews, page_size)
             
-            # Convert Decimal values to float before returning JSON
             employee_data = {
-                'employee': convert_decimal_to_float(employee),
-                'reviews': convert_decimal_to_float(reviews)
+                'employee': employee,
+                'reviews': reviews,
+                'reviews_next_cursor': next_cursor
             }
             
             return jsonify(employee_data)
     finally:
         connection.close()
 
+@app.route('/api/employees/<int:employee_id>/reviews', methods=['GET'])
+@login_required
+@conditional_get('employees', 'reviews')
+def get_employee_reviews(employee_id):
+    try:
+        before = parse_review_cursor(request.args.get('before'))
+    except ValueError:
+        return jsonify({'error': 'before must be a cursor returned by a previous page'}), 400
+    
+    if request.args.get('format') == 'ndjson':
+        return stream_employee_reviews(employee_id, before)
+    
+    try:
+        limit = int(request.args.get('limit', Config.REVIEWS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    if limit < 1 or limit > Config.REVIEWS_MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {Config.REVIEWS_MAX_PAGE_SIZE}'}), 400
+    
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            EMPLOYEE_EXISTS.execute(cursor, (employee_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Employee not found'}), 404
+            
+            if before:
+                REVIEW_PAGE.execute(
+                    cursor,
+                    (employee_id, before[0], before[0], before[1], limit + 1),
+                    before=REVIEW_BEFORE_SQL
+                )
+            else:
+                REVIEW_PAGE.execute(cursor, (employee_id, limit + 1), before='')
+            reviews, next_cursor = split_review_page(cursor.fetchall(), limit)
+            
+            return jsonify({
+                'reviews': reviews,
+                'next_cursor': next_cursor
+            })
+    finally:
+        connection.close()
+
+# Helper function to stream a body read from a pooled connection. The
+# connection is given back when the server closes the response, which also
+# happens for HEAD requests (the body is never read) and for clients that
+# go away mid-stream. A body that was not read to the end may leave unread
+# rows on an unbuffered cursor, so its connection is dropped instead.
+def streaming_response(connection, body, **kwargs):
+    finished = False
+    
+    def generate():
+        nonlocal finished
+        yield from body
+        finished = True
+    
+    def release():
+        if finished:
+            connection.close()
+        else:
+            connection.discard()
+    
+    response = Response(generate(), **kwargs)
+    response.call_on_close(release)
+    return response
+
+# Export an employee's reviews as newline-delimited JSON. Rows are read with
+# an unbuffered server-side cursor and written out as they arrive, so the
+# worker never holds more than one row in memory.
+def stream_employee_reviews(employee_id, before):
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            EMPLOYEE_EXISTS.execute(cursor, (employee_id,))
+            exists = cursor.fetchone() is not None
+    except Exception:
+        connection.close()
+        raise
+    if not exists:
+        connection.close()
+        return jsonify({'error': 'Employee not found'}), 404
+    
+    def generate():
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        if before:
+            REVIEW_STREAM.execute(
+                cursor,
+                (employee_id, before[0], before[0], before[1]),
+                before=REVIEW_BEFORE_SQL
+            )
+        else:
+            REVIEW_STREAM.execute(cursor, (employee_id,), before='')
+        for review in cursor:
+            yield app.json.dumps(review) + '\n'
+        cursor.close()
+    
+    return streaming_response(connection, generate(), mimetype='application/x-ndjson')
+
 @app.route('/api/employees', methods=['POST'])
 @login_required
 @admin_required
@@ -271,6 +795,11 @@ def add_employee():
             if field not in data or not data[field]:
                 return jsonify({'error': f'{field} is required'}), 400
         
+        names = departments.names()
+        department_id = departments.id_for(data['department'])
+        if department_id is None:
+            return jsonify({'error': f"Unknown department: {data['department']}"}), 400
+        
         # Generate avatar initials
         name_parts = data['name'].split()
         avatar = ''.join([part[0].upper() for part in name_parts[:2]])
@@ -279,18 +808,14 @@ def add_employee():
         try:
             with connection.cursor() as cursor:
                 # Check if email already exists
-                cursor.execute("SELECT id FROM employees WHERE email = %s", (data['email'],))
+                EMPLOYEE_ID_BY_EMAIL.execute(cursor, (data['email'],))
                 if cursor.fetchone():
                     return jsonify({'error': 'Email already exists'}), 400
                 
                 # Insert new employee
-                cursor.execute("""
-                    INSERT INTO employees 
-                    (name, department, position, email, phone, join_date, avatar)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
+                EMPLOYEE_INSERT.execute(cursor, (
                     data['name'],
-                    data['department'],
+                    department_id,
                     data['position'],
                     data['email'],
                     data.get('phone', ''),
@@ -299,19 +824,24 @@ def add_employee():
                 ))
                 
                 employee_id = cursor.lastrowid
+                bump_versions(cursor, 'employees', 'directory')
+                employees_version = read_version(cursor, 'employees')
+                directory_version = read_version(cursor, 'directory')
                 connection.commit()
+                data_changed()
+                leaderboard.update(employee_id, 0, 0, name=data['name'], department_id=department_id,
+                                   version=employees_version)
+                search_index.add({
+                    'id': employee_id,
+                    'name': data['name'],
+                    'position': data['position'],
+                    'department': data['department'],
+                    'email': data['email']
+                }, directory_version)
+                dashboard_events.publish('employee_added', {'employee_id': employee_id})
                 
                 # Get the newly created employee
-                cursor.execute("""
-                    SELECT e.*, d.name as department_name
-                    FROM employees e
-                    JOIN departments d ON e.department = d.name
-                    WHERE e.id = %s
-                """, (employee_id,))
-                new_employee = cursor.fetchone()
-                
-                # Convert Decimal values to float before returning JSON
-                new_employee = convert_decimal_to_float(new_employee)
+                new_employee = fetch_employee(cursor, employee_id, names)
                 
                 return jsonify({
                     'success': True,
@@ -322,6 +852,8 @@ def add_employee():
             return jsonify({'error': str(e)}), 500
         finally:
             connection.close()
+    except PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -332,14 +864,31 @@ def delete_employee(employee_id):
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            # Check if employee exists
-            cursor.execute("SELECT id FROM employees WHERE id = %s", (employee_id,))
-            if not cursor.fetchone():
+            # Check if employee exists, locking the row until the delete
+            EMPLOYEE_RATING_FOR_UPDATE.execute(cursor, (employee_id,))
+            employee = cursor.fetchone()
+            if not employee:
                 return jsonify({'error': 'Employee not found'}), 404
             
+            # Months of the dashboard trend that lose this employee's reviews
+            EMPLOYEE_ROLLUP_MONTHS.execute(cursor, (employee_id, trend_start(6)))
+            months = cursor.fetchall()
+            
             # Delete employee (cascade will delete reviews)
-            cursor.execute("DELETE FROM employees WHERE id = %s", (employee_id,))
+            EMPLOYEE_DELETE.execute(cursor, (employee_id,))
+            bump_versions(cursor, 'employees', 'reviews', 'directory')
+            employees_version = read_version(cursor, 'employees')
+            directory_version = read_version(cursor, 'directory')
             connection.commit()
+            data_changed()
+            leaderboard.remove(employee_id, employees_version)
+            search_index.remove(employee_id, directory_version)
+            dashboard_events.publish('employee_deleted', {
+                'employee_id': employee_id,
+                'customer_rating': employee['customer_rating'],
+                'review_count': employee['review_count'],
+                'months': months
+            })
             
             return jsonify({'success': True})
     except pymysql.MySQLError as e:
@@ -369,46 +918,73 @@ def add_review():
         except ValueError:
             return jsonify({'error': 'Rating must be a number'}), 400
         
+        # Values longer than their columns, which MySQL would refuse
+        try:
+            check_review_lengths(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Write-behind mode: queue the review durably and answer at once.
+        # Reviews of employees deleted by the time the batch is written are
+        # dropped there.
+        if review_queue is not None:
+            try:
+                employee_id = int(data['employee_id'])
+            except ValueError:
+                return jsonify({'error': 'employee_id must be a number'}), 400
+            review_queue.enqueue({
+                'employee_id': employee_id,
+                'customer_name': data['customer_name'],
+                'customer_email': data['customer_email'],
+                'rating': rating,
+                'comment': data.get('comment', ''),
+                'date': datetime.now().date().isoformat()
+            })
+            return jsonify({'success': True, 'queued': True}), 202
+        
         connection = get_db_connection()
         try:
             with connection.cursor() as cursor:
-                # Check if employee exists
-                cursor.execute("SELECT id FROM employees WHERE id = %s", (data['employee_id'],))
-                if not cursor.fetchone():
+                review_date = datetime.now().date()
+                
+                # Fold the rating into the employee's running totals. This
+                # also locks the employee row and tells us whether it exists.
+                if not apply_review(cursor, data['employee_id'], rating):
+                    connection.rollback()
                     return jsonify({'error': 'Employee not found'}), 404
                 
                 # Insert new review
-                cursor.execute("""
-                    INSERT INTO customer_reviews 
-                    (employee_id, customer_name, customer_email, rating, comment, date)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
+                REVIEW_INSERT.execute(cursor, (
                     data['employee_id'],
                     data['customer_name'],
                     data['customer_email'],
                     rating,
                     data.get('comment', ''),
-                    datetime.now().strftime('%Y-%m-%d')
+                    review_date
                 ))
                 
-                # Update employee rating and review count
-                cursor.execute("""
-                    UPDATE employees
-                    SET 
-                        customer_rating = (
-                            SELECT AVG(rating) 
-                            FROM customer_reviews 
-                            WHERE employee_id = %s
-                        ),
-                        review_count = (
-                            SELECT COUNT(*) 
-                            FROM customer_reviews 
-                            WHERE employee_id = %s
-                        )
-                    WHERE id = %s
-                """, (data['employee_id'], data['employee_id'], data['employee_id']))
+                EMPLOYEE_DETAILS.execute(cursor, (data['employee_id'],),
+                                         columns=('department_id', 'rating_sum', 'review_count', 'customer_rating'))
+                employee = cursor.fetchone()
+                
+                # Keep the monthly trend rollup in step with the new review
+                apply_to_rollup(cursor, data['employee_id'], employee['department_id'], review_date, rating)
+                bump_versions(cursor, 'employees', 'reviews')
+                employees_version = read_version(cursor, 'employees')
                 
                 connection.commit()
+                data_changed()
+                leaderboard.update(int(data['employee_id']), employee['customer_rating'], employee['review_count'],
+                                   version=employees_version)
+                dashboard_events.publish('review', {
+                    'employee_id': int(data['employee_id']),
+                    'rating': rating,
+                    'year': review_date.year,
+                    'month': review_date.month,
+                    'previous_rating': expected_rating(employee['rating_sum'] - rating, employee['review_count'] - 1),
+                    'customer_rating': employee['customer_rating'],
+                    'review_count': employee['review_count']
+                })
                 
                 return jsonify({'success': True})
         except pymysql.MySQLError as e:
@@ -416,38 +992,166 @@ def add_review():
             return jsonify({'error': str(e)}), 500
         finally:
             connection.close()
+    except PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Bulk import of employees or reviews from a CSV or NDJSON request body.
+# The format comes from ?format= or the Content-Type header.
+@app.route('/api/import/<kind>', methods=['POST'])
+@login_required
+@admin_required
+def bulk_import(kind):
+    importers = {'employees': import_employees, 'reviews': import_reviews}
+    if kind not in importers:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    try:
+        fmt = detect_format(request.args.get('format'), request.content_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    connection = get_db_connection()
+    try:
+        report = importers[kind](
+            connection,
+            request.stream,
+            fmt,
+            batch_size=Config.IMPORT_BATCH_SIZE,
+            max_errors=Config.IMPORT_MAX_ERRORS
+        )
+    except pymysql.MySQLError as e:
+        connection.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        connection.close()
+        data_changed()
+        dashboard_events.publish('refresh', {})
+    
+    return jsonify(report.as_dict())
+
+def parse_export_range(values):
+    start = parse_date(values.get('start'), 'start')
+    end = parse_date(values.get('end'), 'end')
+    if start and end and start > end:
+        raise ValueError('start must not be after end')
+    return start, end
+
+# Stream a full export as CSV (reviews, employees or monthly), optionally
+# limited to ?start= and ?end= dates, gzip compressed for clients that
+# accept it. Rows come from an unbuffered server-side cursor and leave in
+# chunks of EXPORT_CHUNK_SIZE characters, so memory use does not depend
+# on the size of the export.
+@app.route('/api/export/<kind>', methods=['GET'])
+@login_required
+@admin_required
+def export_csv(kind):
+    if kind not in EXPORTS:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    try:
+        start, end = parse_export_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    compress = request.accept_encodings['gzip'] > 0
+    names = departments.names()
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename="{kind}.csv"',
+        'Vary': 'Accept-Encoding'
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    connection = get_db_connection()
+    rows = export_rows(connection, kind, names, start, end)
+    chunks = csv_chunks(EXPORTS[kind]['columns'], rows, Config.EXPORT_CHUNK_SIZE)
+    return streaming_response(connection, encode_chunks(chunks, compress), mimetype='text/csv', headers=headers)
+
+# Start a background export to a file. JSON body: format ('xlsx' or
+# 'csv', default 'xlsx'), optional start and end dates.
+@app.route('/api/export/<kind>/jobs', methods=['POST'])
+@login_required
+@admin_required
+def start_export_job(kind):
+    if kind not in EXPORTS:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        start, end = parse_export_range(data)
+        job = export_jobs.start(kind, data.get('format', 'xlsx'), start, end, owner=session.get('username'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 501
+    return jsonify(dict(job, status_url=f"/api/export/jobs/{job['id']}")), 202
+
+@app.route('/api/export/jobs/<job_id>', methods=['GET'])
+@login_required
+@admin_required
+def get_export_job(job_id):
+    job = export_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Export not found'}), 404
+    if job['status'] == 'done':
+        job['download_url'] = f'/api/export/jobs/{job_id}/download'
+    return jsonify(job)
+
+@app.route('/api/export/jobs/<job_id>/download', methods=['GET'])
+@login_required
+@admin_required
+def download_export(job_id):
+    job = export_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Export not found'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': f"Export is {job['status']}"}), 409
+    return send_from_directory(
+        export_jobs.directory,
+        f"{job_id}.{job['format']}",
+        as_attachment=True,
+        download_name=ExportJobs.download_name(job)
+    )
+
+# Best rated employees with at least one review, overall or in one
+# department; from board (current_leaderboard()) when it is current,
+# otherwise SQL
+def top_rated_employees(cursor, board, limit, department_id=None):
+    if board is not None:
+        return board.top(limit, department_id)
+    if department_id is None:
+        TOP_RATED.execute(cursor, (limit,), department='')
+    else:
+        TOP_RATED.execute(cursor, (department_id, limit), department='AND department_id = %s')
+    return cursor.fetchall()
+
+# Number of employees rated at least min_rating, overall or in one department
+def count_rated_at_least(cursor, board, min_rating, department_id=None):
+    if board is not None:
+        return board.count_at_least(min_rating, department_id)
+    if department_id is None:
+        COUNT_RATED.execute(cursor, (min_rating,), department='')
+    else:
+        COUNT_RATED.execute(cursor, (min_rating, department_id), department='AND department_id = %s')
+    return cursor.fetchone()['count']
+
 @app.route('/api/analytics', methods=['GET'])
 @login_required
 @admin_required
+@conditional_get('employees', 'reviews', 'departments')
 def get_analytics():
+    names = departments.names()
+    board = current_leaderboard()
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            # Department ratings
-            cursor.execute("""
-                SELECT 
-                    e.department,
-                    AVG(e.customer_rating) as avg_rating
-                FROM employees e
-                WHERE e.review_count > 0
-                GROUP BY e.department
-            """)
-            department_ratings = cursor.fetchall()
+            # Department ratings, grouped on the id and named from the cache
+            DEPARTMENT_RATINGS.execute(cursor)
+            department_ratings = [
+                {'department': names.get(row['department_id']), 'avg_rating': row['avg_rating']}
+                for row in cursor.fetchall()
+            ]
             
-            # Performance trend (last 6 months)
-            cursor.execute("""
-                SELECT 
-                    MONTH(date) as month,
-                    AVG(rating) as avg_rating
-                FROM customer_reviews
-                WHERE date >= DATE_SUB(CURRENT_DATE, INTERVAL 6 MONTH)
-                GROUP BY MONTH(date)
-                ORDER BY month
-            """)
-            performance_trend = cursor.fetchall()
+            # Performance trend (last 6 months) from the monthly rollup
+            performance_trend = rating_trend(cursor, months=6)
             
             # Rating categories (mock data for now)
             rating_categories = [
@@ -459,23 +1163,16 @@ def get_analytics():
             ]
             
             # Top performers
-            cursor.execute("""
-                SELECT 
-                    name,
-                    customer_rating
-                FROM employees
-                WHERE review_count > 0
-                ORDER BY customer_rating DESC
-                LIMIT 5
-            """)
-            top_performers = cursor.fetchall()
+            top_performers = [
+                {'name': employee['name'], 'customer_rating': employee['customer_rating']}
+                for employee in top_rated_employees(cursor, board, Config.TOP_PERFORMERS_LIMIT)
+            ]
             
-            # Convert Decimal values to float before returning JSON
             analytics_data = {
-                'department_ratings': convert_decimal_to_float(department_ratings),
-                'performance_trend': convert_decimal_to_float(performance_trend),
+                'department_ratings': department_ratings,
+                'performance_trend': performance_trend,
                 'rating_categories': rating_categories,
-                'top_performers': convert_decimal_to_float(top_performers)
+                'top_performers': top_performers
             }
             
             return jsonify(analytics_data)
@@ -485,17 +1182,203 @@ def get_analytics():
 @app.route('/api/departments', methods=['GET'])
 @login_required
 @admin_required
+@conditional_get('departments')
 def get_departments():
+    return jsonify(departments.rows())
+
+# Helper function to read the limit of a search request
+def parse_search_limit(value):
+    if value is None:
+        return Config.SEARCH_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be a number')
+    if limit < 1 or limit > Config.SEARCH_MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {Config.SEARCH_MAX_LIMIT}')
+    return limit
+
+# Ranked search over employees (name, position, department, email) and
+# review comments. ?scope= is employees, reviews or all (the default).
+@app.route('/api/search', methods=['GET'])
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    scope = request.args.get('scope', 'all')
+    if scope not in ('employees', 'reviews', 'all'):
+        return jsonify({'error': 'scope must be employees, reviews or all'}), 400
+    try:
+        limit = parse_search_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    results = {}
+    if not query:
+        if scope in ('employees', 'all'):
+            results['employees'] = []
+        if scope in ('reviews', 'all'):
+            results['reviews'] = []
+        return jsonify(results)
+    
+    # The index and the department names may need a connection of their own
+    # to refresh, so they are resolved before this request takes one
+    if scope in ('employees', 'all'):
+        ranked = current_search_index().search(query, limit)
+        department_names = departments.names()
+    
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            if scope in ('employees', 'all'):
+                employees = []
+                if ranked:
+                    # Hydrate by primary key, keeping the index's ranking
+                    with tuple_cursor(connection) as rows_cursor:
+                        SEARCH_EMPLOYEES.execute(
+                            rows_cursor,
+                            [employee_id for employee_id, _ in ranked],
+                            placeholders=', '.join(['%s'] * len(ranked))
+                        )
+                        rows = {row[0]: row for row in rows_cursor.fetchall()}
+                    decode = employee_decoder(
+                        tuple(SEARCH_EMPLOYEES.columns),
+                        list(SEARCH_EMPLOYEES.columns) + ['department'],
+                        department_names
+                    )
+                    for employee_id, score in ranked:
+                        # Skip employees deleted since the index was built
+                        row = rows.get(employee_id)
+                        if row is None:
+                            continue
+                        employee = decode(row)
+                        employee['score'] = score
+                        employees.append(employee)
+                results['employees'] = employees
+            
+            if scope in ('reviews', 'all'):
+                results['reviews'] = search_reviews(cursor, query, limit)
+            
+            return jsonify(results)
+    finally:
+        connection.close()
+
+# Search-as-you-type suggestions, answered from the in-memory index alone
+@app.route('/api/search/autocomplete', methods=['GET'])
+@login_required
+def search_autocomplete():
+    try:
+        limit = parse_search_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(current_search_index().autocomplete(request.args.get('q', ''), limit))
+
+# Top rated employees, overall or for one department (?department= or
+# ?department_id=), and with ?min_rating= the number rated at least that
+@app.route('/api/leaderboard', methods=['GET'])
+@login_required
+@admin_required
+@conditional_get('employees', 'departments')
+def get_leaderboard():
+    try:
+        limit = int(request.args.get('limit', Config.TOP_PERFORMERS_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    if limit < 1 or limit > Config.LEADERBOARD_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {Config.LEADERBOARD_MAX_LIMIT}'}), 400
+    
+    department_id = None
+    if request.args.get('department_id'):
+        try:
+            department_id = int(request.args['department_id'])
+        except ValueError:
+            return jsonify({'error': 'department_id must be a number'}), 400
+    elif request.args.get('department'):
+        department_id = departments.id_for(request.args['department'])
+        if department_id is None:
+            return jsonify({'error': f"Unknown department: {request.args['department']}"}), 404
+    
+    min_rating = None
+    if request.args.get('min_rating'):
+        try:
+            min_rating = float(request.args['min_rating'])
+        except ValueError:
+            return jsonify({'error': 'min_rating must be a number'}), 400
+    
+    names = departments.names()
+    board = current_leaderboard()
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM departments")
-            departments = cursor.fetchall()
-            # Convert Decimal values to float before returning JSON
-            departments = convert_decimal_to_float(departments)
-            return jsonify(departments)
+            employees = [
+                dict(employee, department=names.get(employee['department_id']))
+                for employee in top_rated_employees(cursor, board, limit, department_id)
+            ]
+            result = {'employees': employees}
+            if min_rating is not None:
+                result['count_at_least'] = count_rated_at_least(cursor, board, min_rating, department_id)
+            return jsonify(result)
+    finally:
+        connection.close()
+
+# Compare this process's leaderboard with the employees table
+@app.route('/api/leaderboard/check', methods=['GET'])
+@login_required
+@admin_required
+def check_leaderboard():
+    connection = get_db_connection()
+    try:
+        problems = leaderboard.check(connection)
     finally:
         connection.close()
+    return jsonify({'consistent': not problems, 'problems': problems, 'leaderboard': leaderboard.stats()})
+
+# Prometheus scrape endpoint. Scrapers send METRICS_TOKEN as a bearer
+# token; admins can also open it with their session.
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    token = Config.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return instrumentation.metrics_view()
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    return instrumentation.metrics_view()
+
+@app.route('/api/pool', methods=['GET'])
+@login_required
+@admin_required
+def get_pool_stats():
+    return jsonify(db_pool.stats())
+
+@app.route('/api/password-hashing', methods=['GET'])
+@login_required
+@admin_required
+def get_password_hashing_stats():
+    return jsonify(password_hasher.stats())
+
+@app.route('/api/review-queue', methods=['GET'])
+@login_required
+@admin_required
+def get_review_queue_stats():
+    if review_queue is None:
+        return jsonify({'mode': Config.REVIEW_INGEST_MODE})
+    return jsonify(dict(review_queue.stats(), mode=Config.REVIEW_INGEST_MODE))
+
+@app.route('/api/sessions', methods=['GET'])
+@login_required
+@admin_required
+def get_session_stats():
+    return jsonify(app.session_interface.stats())
+
+# Log a user out on every device
+@app.route('/api/users/<int:user_id>/sessions', methods=['DELETE'])
+@login_required
+@admin_required
+def revoke_user_sessions(user_id):
+    revoked = app.session_interface.revoke_user(user_id)
+    return jsonify({'success': True, 'revoked': revoked})
 
 @app.route('/api/signup', methods=['POST'])
 def signup():
@@ -517,33 +1400,41 @@ def signup():
         try:
             with connection.cursor() as cursor:
                 # Check if username already exists
-                cursor.execute("SELECT id FROM users WHERE username = %s", (data['username'].strip(),))
+                USER_ID_BY_USERNAME.execute(cursor, (data['username'].strip(),))
                 if cursor.fetchone():
                     return jsonify({'error': 'Username already exists'}), 400
                 
                 # Check if email already exists
-                cursor.execute("SELECT id FROM users WHERE email = %s", (data['email'].strip(),))
+                USER_ID_BY_EMAIL.execute(cursor, (data['email'].strip(),))
                 if cursor.fetchone():
                     return jsonify({'error': 'Email already exists'}), 400
-                
-                # Hash password
-                hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
-                
+        finally:
+            # Release the connection while the password is hashed
+            connection.close()
+        
+        # Hash password
+        hashed_password = password_hasher.hash(data['password'])
+        
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
                 # Insert new user
-                cursor.execute("""
-                    INSERT INTO users (name, username, email, password, role)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
+                USER_INSERT.execute(cursor, (
                     data['name'].strip(),
                     data['username'].strip(),
                     data['email'].strip(),
-                    hashed_password.decode('utf-8'),
+                    hashed_password,
                     role  # Use the cleaned role
                 ))
+                bump_versions(cursor, 'users')
                 
                 connection.commit()
                 
                 return jsonify({'success': True})
+        except pymysql.IntegrityError:
+            # Someone took the username or email while the password was hashed
+            connection.rollback()
+            return jsonify({'error': 'Username or email already exists'}), 400
         except pymysql.MySQLError as e:
             connection.rollback()
             # Handle specific database errors
@@ -552,8 +1443,191 @@ def signup():
             return jsonify({'error': str(e)}), 500
         finally:
             connection.close()
+    except (PoolTimeout, HashQueueFull):
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Rebuild stored employee ratings from customer_reviews and report drift.
+# Usage: flask --app app reconcile-ratings [--dry-run]
+@app.cli.command('reconcile-ratings')
+@click.option('--dry-run', is_flag=True, help='Report drift without fixing it.')
+def reconcile_ratings_command(dry_run):
+    connection = get_db_connection()
+    try:
+        drift = reconcile_ratings(connection, fix=not dry_run)
+        if drift and not dry_run:
+            touch_versions(connection, 'employees')
+    finally:
+        connection.close()
+    
+    for item in drift:
+        stored, actual = item['stored'], item['actual']
+        click.echo(
+            f"employee {item['employee_id']}: "
+            f"sum {stored['rating_sum']} -> {actual['rating_sum']}, "
+            f"count {stored['review_count']} -> {actual['review_count']}, "
+            f"rating {stored['customer_rating']} -> {actual['customer_rating']}"
+        )
+    action = 'found' if dry_run else 'fixed'
+    click.echo(f'{len(drift)} employee(s) with rating drift {action}')
+    if drift and not dry_run:
+        data_changed()
+
+# Recreate the monthly rating rollup from customer_reviews.
+# Usage: flask --app app rebuild-rollups
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    connection = get_db_connection()
+    try:
+        rows = rebuild_rollups(connection)
+        touch_versions(connection, 'reviews')
+    finally:
+        connection.close()
+    data_changed()
+    click.echo(f'{rows} monthly rollup row(s) rebuilt')
+
+# Log a user out on every device.
+# Usage: flask --app app revoke-sessions USERNAME
+@app.cli.command('revoke-sessions')
+@click.argument('username')
+def revoke_sessions_command(username):
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            USER_ID_BY_USERNAME.execute(cursor, (username,))
+            user = cursor.fetchone()
+    finally:
+        connection.close()
+    if not user:
+        raise click.UsageError(f'No user named {username}')
+    revoked = app.session_interface.revoke_user(user['id'])
+    click.echo(f'{revoked} session(s) revoked')
+
+# Bulk import employees or reviews from a CSV or NDJSON file.
+# Usage: flask --app app import-employees FILE [--format csv|ndjson] [--batch-size N]
+#        flask --app app import-reviews FILE [--format csv|ndjson] [--batch-size N]
+def run_import_command(importer, path, fmt, batch_size):
+    try:
+        fmt = detect_format(fmt, filename=path)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    connection = get_db_connection()
+    try:
+        with open(path, 'rb') as stream:
+            report = importer(connection, stream, fmt, batch_size=batch_size,
+                              max_errors=Config.IMPORT_MAX_ERRORS).as_dict()
+    finally:
+        connection.close()
+    data_changed()
+    
+    for error in report['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    if report['errors_truncated']:
+        click.echo(f"... {report['failed'] - len(report['errors'])} more error(s)", err=True)
+    click.echo(
+        f"{report['processed']} row(s) read, {report['inserted']} inserted, {report['failed']} failed "
+        f"in {report['batches']} batch(es), {report['elapsed_seconds']}s ({report['rows_per_second']} rows/s)"
+    )
+
+@app.cli.command('import-employees')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=Config.IMPORT_BATCH_SIZE, show_default=True)
+def import_employees_command(path, fmt, batch_size):
+    run_import_command(import_employees, path, fmt, batch_size)
+
+@app.cli.command('import-reviews')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=Config.IMPORT_BATCH_SIZE, show_default=True)
+def import_reviews_command(path, fmt, batch_size):
+    run_import_command(import_reviews, path, fmt, batch_size)
+
+# Build the in-memory leaderboard and compare it with the database.
+# Usage: flask --app app check-leaderboard
+@app.cli.command('check-leaderboard')
+def check_leaderboard_command():
+    connection = get_db_connection()
+    try:
+        leaderboard.rebuild(connection)
+        problems = leaderboard.check(connection)
+    finally:
+        connection.close()
+    
+    for problem in problems:
+        click.echo(problem)
+    click.echo(f'{len(leaderboard)} employees checked, {len(problems)} problem(s)')
+    if problems:
+        raise SystemExit(1)
+
+# Apply pending schema migrations from database/migrations.
+# Usage: flask --app app migrate [--list]
+@app.cli.command('migrate')
+@click.option('--list', 'list_only', is_flag=True, help='Only list pending migrations.')
+def migrate_command(list_only):
+    connection = get_db_connection()
+    try:
+        if list_only:
+            pending = pending_migrations(connection)
+            for version, _ in pending:
+                click.echo(version)
+            click.echo(f'{len(pending)} pending migration(s)')
+            return
+        applied = migrate(connection, on_apply=lambda version: click.echo(f'Applying {version}'))
+    finally:
+        connection.close()
+    click.echo(f'{len(applied)} migration(s) applied')
+
+# Prepare every registered query on a connection of its own, outside the
+# pool, so it can run in a process that forks workers afterwards
+def check_queries():
+    connection = pymysql.connect(**db_config)
+    try:
+        return validate_queries(connection)
+    finally:
+        connection.close()
+
+# Prepare every registered query on the server and fail on any that no
+# longer matches the schema.
+# Usage: flask --app app check-queries
+@app.cli.command('check-queries')
+def check_queries_command():
+    problems = check_queries()
+    for problem in problems:
+        click.echo(f"[FAIL] {problem['query']} {problem['variant'] or ''}".rstrip())
+        click.echo(f"    -> {problem['error']}")
+    click.echo(f'{len(QUERIES)} queries checked, {len(problems)} problem(s)')
+    if problems:
+        raise SystemExit(1)
+
+# EXPLAIN the SQL issued by the read routes and fail on full scans.
+# Usage: flask --app app explain-check [--ignore-below ROWS] [--verbose]
+@app.cli.command('explain-check')
+@click.option('--ignore-below', default=1000, show_default=True,
+              help='Ignore scans of tables the optimizer estimates below this many rows.')
+@click.option('--verbose', is_flag=True, help='Print the plan of every statement.')
+def explain_check_command(ignore_below, verbose):
+    results = run_explain_check(app, db_pool, ignore_below=ignore_below,
+                                before_request=data_changed)
+    failures = 0
+    for result in results:
+        status = 'FAIL' if result['problems'] else 'ok'
+        if result['problems']:
+            failures += 1
+        if result['problems'] or verbose:
+            click.echo(f"[{status}] {result['route']}")
+            if result['query']:
+                click.echo(f"    {result['query']}")
+            for problem in result['problems']:
+                click.echo(f'    -> {problem}')
+            if verbose:
+                for row in result['plan']:
+                    click.echo(f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                               f"rows={row.get('rows')} extra={row.get('Extra')}")
+    click.echo(f'{len(results)} statement(s) checked, {failures} with full scans')
+    if failures:
+        raise SystemExit(1)
+
 if __name__ == '__main__':
     app.run(debug=True)
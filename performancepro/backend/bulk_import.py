@@ -0,0 +1,339 @@
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+from datetime import date, datetime
+
+import pymysql
+
+from data_versions import bump_versions
+from ratings import APPLY_RATING_DELTA_SQL
+from rollups import APPLY_ROLLUP_SQL, month_start
+
+# Bulk loading of employees and reviews from CSV or NDJSON streams. Rows are
+# validated and inserted batch by batch with multi-row INSERTs (pymysql's
+# executemany rewrites "INSERT ... VALUES (...)" into one statement), each
+# batch in its own transaction. Reviews update the affected employees'
+# ratings and monthly rollups once per batch instead of once per review.
+
+INSERT_EMPLOYEES_SQL = """
+    INSERT INTO employees
+    (name, department_id, position, email, phone, join_date, avatar)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+INSERT_REVIEWS_SQL = """
+    INSERT INTO customer_reviews
+    (employee_id, customer_name, customer_email, rating, comment, date)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+FORMATS = ('csv', 'ndjson')
+
+# Longest text each column holds (database/schema.sql). Longer values are
+# rejected row by row here; left to MySQL they fail the whole batch.
+EMPLOYEE_FIELD_LENGTHS = {'name': 100, 'position': 50, 'email': 100, 'phone': 20, 'avatar': 10}
+REVIEW_FIELD_LENGTHS = {'customer_name': 100, 'customer_email': 100}
+# comment is TEXT, limited in bytes rather than characters
+REVIEW_COMMENT_MAX_BYTES = 65535
+
+
+class ImportReport:
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.processed = 0
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+        self.started_at = time.monotonic()
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        elapsed = time.monotonic() - self.started_at
+        return {
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'batches': self.batches,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+            'errors_truncated': self.failed > len(self.errors),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.processed / elapsed, 1) if elapsed > 0 else None
+        }
+
+
+# Pick the input format from an explicit name, a content type or a file name
+def detect_format(fmt=None, content_type=None, filename=None):
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+        return fmt
+    if content_type:
+        if 'csv' in content_type:
+            return 'csv'
+        if 'ndjson' in content_type or 'json' in content_type:
+            return 'ndjson'
+    if filename:
+        if filename.endswith('.csv'):
+            return 'csv'
+        if filename.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+    raise ValueError('Could not tell whether the input is CSV or NDJSON')
+
+
+# Yield (line_number, row, error) for every record of a binary stream
+def read_rows(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+            continue
+        yield line_number, row, None
+
+
+def _batches(rows, batch_size, report):
+    batch = []
+    for line_number, row, error in rows:
+        report.processed += 1
+        if error:
+            report.error(line_number, error)
+            continue
+        batch.append((line_number, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text(row, field):
+    value = row.get(field)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _parse_date(value, field):
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{field} must be a date in YYYY-MM-DD format')
+
+
+def avatar_initials(name):
+    return ''.join([part[0].upper() for part in name.split()[:2]])
+
+
+def _raw_text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value)
+
+
+# Raise ValueError for the first field of row longer than its column. The
+# unstripped value is measured, as POST /api/reviews stores it.
+def check_lengths(row, lengths):
+    for field, length in lengths.items():
+        if len(_raw_text(row, field)) > length:
+            raise ValueError(f'{field} must be at most {length} characters')
+
+
+# Shared by review imports and POST /api/reviews, queued or not
+def check_review_lengths(row):
+    check_lengths(row, REVIEW_FIELD_LENGTHS)
+    if len(_raw_text(row, 'comment').encode('utf-8')) > REVIEW_COMMENT_MAX_BYTES:
+        raise ValueError(f'comment must be at most {REVIEW_COMMENT_MAX_BYTES} bytes')
+
+
+# departments maps department names to ids
+def _validate_employee(row, departments):
+    for field in ('name', 'department', 'position', 'email', 'join_date'):
+        if not _text(row, field):
+            raise ValueError(f'{field} is required')
+    if _text(row, 'department') not in departments:
+        raise ValueError(f"Unknown department: {_text(row, 'department')}")
+    check_lengths(row, EMPLOYEE_FIELD_LENGTHS)
+    name = _text(row, 'name')
+    return (
+        name,
+        departments[_text(row, 'department')],
+        _text(row, 'position'),
+        _text(row, 'email'),
+        _text(row, 'phone'),
+        _parse_date(_text(row, 'join_date'), 'join_date'),
+        _text(row, 'avatar') or avatar_initials(name)
+    )
+
+
+def _validate_review(row, today):
+    for field in ('employee_id', 'customer_name', 'customer_email', 'rating'):
+        if not _text(row, field):
+            raise ValueError(f'{field} is required')
+    try:
+        employee_id = int(_text(row, 'employee_id'))
+    except ValueError:
+        raise ValueError('employee_id must be a number')
+    try:
+        rating = int(_text(row, 'rating'))
+    except ValueError:
+        raise ValueError('Rating must be a number')
+    if rating < 1 or rating > 5:
+        raise ValueError('Rating must be between 1 and 5')
+    check_review_lengths(row)
+    review_date = _parse_date(_text(row, 'date'), 'date') if _text(row, 'date') else today
+    return (
+        employee_id,
+        _text(row, 'customer_name'),
+        _text(row, 'customer_email'),
+        rating,
+        _text(row, 'comment'),
+        review_date
+    )
+
+
+def _insert_batch(connection, sql, batch, report):
+    # batch is a list of (line_number, values)
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [values for _, values in batch])
+        return batch
+    except (pymysql.IntegrityError, pymysql.DataError):
+        connection.rollback()
+
+    # A constraint failed or a value did not fit somewhere in the batch;
+    # retry row by row so only the offending rows are rejected
+    inserted = []
+    with connection.cursor() as cursor:
+        for line_number, values in batch:
+            try:
+                cursor.execute(sql, values)
+                inserted.append((line_number, values))
+            except (pymysql.IntegrityError, pymysql.DataError) as e:
+                report.error(line_number, str(e))
+    return inserted
+
+
+def import_employees(connection, stream, fmt, batch_size=1000, max_errors=1000):
+    report = ImportReport(max_errors)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id, name FROM departments")
+        departments = {row['name']: row['id'] for row in cursor.fetchall()}
+
+    seen_emails = set()
+    for batch in _batches(read_rows(stream, fmt), batch_size, report):
+        valid = []
+        for line_number, row in batch:
+            try:
+                values = _validate_employee(row, departments)
+            except ValueError as e:
+                report.error(line_number, str(e))
+                continue
+            email = values[3].lower()
+            if email in seen_emails:
+                report.error(line_number, 'Email already exists')
+                continue
+            seen_emails.add(email)
+            valid.append((line_number, values))
+
+        if valid:
+            with connection.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(valid))
+                cursor.execute(
+                    f"SELECT email FROM employees WHERE email IN ({placeholders})",
+                    [values[3] for _, values in valid]
+                )
+                existing = {row['email'].lower() for row in cursor.fetchall()}
+            for line_number, values in valid:
+                if values[3].lower() in existing:
+                    report.error(line_number, 'Email already exists')
+            valid = [item for item in valid if item[1][3].lower() not in existing]
+
+        if valid:
+            inserted = _insert_batch(connection, INSERT_EMPLOYEES_SQL, valid, report)
+            with connection.cursor() as cursor:
+                bump_versions(cursor, 'employees', 'directory')
+            connection.commit()
+            report.inserted += len(inserted)
+        report.batches += 1
+    return report
+
+
+def import_reviews(connection, stream, fmt, batch_size=1000, max_errors=1000):
+    report = ImportReport(max_errors)
+    today = date.today()
+    for batch in _batches(read_rows(stream, fmt), batch_size, report):
+        valid = []
+        for line_number, row in batch:
+            try:
+                valid.append((line_number, _validate_review(row, today)))
+            except ValueError as e:
+                report.error(line_number, str(e))
+
+        if valid:
+            employee_ids = sorted({values[0] for _, values in valid})
+            with connection.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(employee_ids))
+                cursor.execute(
+                    f"SELECT id, department_id FROM employees WHERE id IN ({placeholders})",
+                    employee_ids
+                )
+                existing = {row['id']: row['department_id'] for row in cursor.fetchall()}
+            for line_number, values in valid:
+                if values[0] not in existing:
+                    report.error(line_number, 'Employee not found')
+            valid = [item for item in valid if item[1][0] in existing]
+
+        if valid:
+            inserted = _insert_batch(connection, INSERT_REVIEWS_SQL, valid, report)
+            apply_review_totals(connection, [values for _, values in inserted], existing)
+            with connection.cursor() as cursor:
+                bump_versions(cursor, 'employees', 'reviews')
+            connection.commit()
+            report.inserted += len(inserted)
+        report.batches += 1
+    return report
+
+
+# Fold a batch of inserted review rows (employee_id, ..., rating, ..., date)
+# into employee ratings and monthly rollups: one update per employee and
+# one upsert per employee and month, in the caller's transaction.
+# department_ids maps each employee id to its department id.
+def apply_review_totals(connection, reviews, department_ids):
+    ratings = defaultdict(lambda: [0, 0])
+    months = defaultdict(lambda: [0, 0])
+    for employee_id, _, _, rating, _, review_date in reviews:
+        ratings[employee_id][0] += rating
+        ratings[employee_id][1] += 1
+        month = months[(employee_id, month_start(review_date))]
+        month[0] += rating
+        month[1] += 1
+
+    with connection.cursor() as cursor:
+        # Lock employees in id order so concurrent batches cannot deadlock
+        cursor.executemany(APPLY_RATING_DELTA_SQL, [
+            (total, count, employee_id)
+            for employee_id, (total, count) in sorted(ratings.items())
+        ])
+        cursor.executemany(APPLY_ROLLUP_SQL, [
+            (period, employee_id, department_ids[employee_id], total, count)
+            for (employee_id, period), (total, count) in sorted(months.items())
+        ])
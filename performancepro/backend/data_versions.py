@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+from datetime import date
+from functools import wraps
+
+from flask import g, make_response, request
+
+# data_versions holds one counter per table group. Every write bumps the
+# counters it affects in the same transaction, so a committed change is
+# always visible as a new version. Read routes derive strong ETags from
+# the versions they depend on and answer If-None-Match with 304 without
+# running their queries.
+
+BUMP_VERSIONS_SQL = "UPDATE data_versions SET version = version + 1 WHERE name IN ({placeholders})"
+
+SELECT_VERSIONS_SQL = "SELECT name, version FROM data_versions"
+
+
+# Bump the named counters inside the caller's transaction
+def bump_versions(cursor, *names):
+    placeholders = ', '.join(['%s'] * len(names))
+    # Writers bump last, just before committing, so the hot counter rows
+    # stay locked only briefly; IN on the primary key locks them in key order
+    cursor.execute(BUMP_VERSIONS_SQL.format(placeholders=placeholders), names)
+
+
+# Version of one counter as seen by the caller's transaction; read right
+# after bump_versions it is the version the write will commit as
+def read_version(cursor, name):
+    cursor.execute("SELECT version FROM data_versions WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    return row['version'] if row else 0
+
+
+# Bump the named counters in a transaction of their own, for maintenance
+# jobs that commit their changes themselves
+def touch_versions(connection, *names):
+    with connection.cursor() as cursor:
+        bump_versions(cursor, *names)
+    connection.commit()
+
+
+# Process-wide view of data_versions. It is re-read at most once every
+# refresh_interval seconds, so a write committed by another process can go
+# unnoticed for that long; writes made by this process call invalidate()
+# after committing and are seen immediately. The counters are read outside
+# the lock, so a thread waiting for a database connection never holds up
+# others that only need the cached values.
+class DataVersions:
+    def __init__(self, connection_factory, refresh_interval=1.0):
+        self.connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._loaded_at = None
+        self._generation = 0
+
+    def _load(self):
+        connection = self.connection_factory()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(SELECT_VERSIONS_SQL)
+                return {row['name']: row['version'] for row in cursor.fetchall()}
+        finally:
+            connection.close()
+
+    def get(self, *names):
+        with self._lock:
+            started = time.monotonic()
+            if self._loaded_at is not None and started - self._loaded_at < self.refresh_interval:
+                return tuple(self._versions.get(name, 0) for name in names)
+            generation = self._generation
+        versions = self._load()
+        with self._lock:
+            # A read that overlapped an invalidate() may predate the write
+            # it announced, so it is used but not kept; nor is one older
+            # than what another thread stored meanwhile
+            if generation == self._generation and (self._loaded_at is None or started >= self._loaded_at):
+                self._versions = versions
+                self._loaded_at = started
+        return tuple(versions.get(name, 0) for name in names)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+
+    # Strong ETag for the current request and the given versions. Responses
+    # also depend on the query string and, for trend charts, on today's date.
+    def etag(self, versions):
+        versions = '-'.join(str(version) for version in versions)
+        key = f'{request.full_path}|{date.today().isoformat()}|{versions}'
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    # Decorator for GET routes whose response only changes when the named
+    # tables do. Place it below the authentication decorators. The route can
+    # read the versions its response is tagged with from g.data_versions
+    # (name -> version), e.g. to key a cache.
+    def conditional_get(self, *names):
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                versions = self.get(*names)
+                g.data_versions = dict(zip(names, versions))
+                etag = self.etag(versions)
+                if request.if_none_match.contains(etag):
+                    response = make_response('', 304)
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(etag)
+                # Browsers must revalidate on every use; the body is per user
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            return decorated_function
+        return decorator
@@ -0,0 +1,9 @@
+-- Running rating totals used to maintain customer_rating incrementally
+ALTER TABLE employees ADD COLUMN rating_sum INT NOT NULL DEFAULT 0;
+
+UPDATE employees e
+SET
+    rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM customer_reviews WHERE employee_id = e.id),
+    review_count = (SELECT COUNT(*) FROM customer_reviews WHERE employee_id = e.id),
+    customer_rating = CASE WHEN review_count > 0 THEN ROUND(rating_sum / review_count, 1) ELSE 0.0 END
+WHERE e.id > 0;
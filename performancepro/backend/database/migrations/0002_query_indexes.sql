@@ -0,0 +1,20 @@
+-- Secondary indexes for the access paths app.py queries
+
+-- Review history pages: WHERE employee_id = ? ORDER BY date DESC, id DESC
+-- (InnoDB appends the primary key, so the index also orders by id)
+ALTER TABLE customer_reviews ADD INDEX idx_reviews_employee_date (employee_id, date);
+
+-- Monthly trends: covering index for WHERE date >= ? ... AVG(rating)
+ALTER TABLE customer_reviews ADD INDEX idx_reviews_date_rating (date, rating);
+
+-- Department filter, department join and per-department rating averages
+ALTER TABLE employees ADD INDEX idx_employees_department_rating (department, customer_rating, review_count);
+
+-- Top performers, min_rating filter and the dashboard aggregate (covering)
+ALTER TABLE employees ADD INDEX idx_employees_rating (customer_rating, review_count);
+
+-- Sorting and filtering on review_count
+ALTER TABLE employees ADD INDEX idx_employees_review_count (review_count);
+
+-- Name prefix filter and sorting by name
+ALTER TABLE employees ADD INDEX idx_employees_name (name);
@@ -0,0 +1,22 @@
+-- Per employee and month rating totals feeding the trend charts
+CREATE TABLE monthly_ratings (
+    period DATE NOT NULL,
+    employee_id INT NOT NULL,
+    department VARCHAR(50) NOT NULL,
+    rating_sum INT NOT NULL DEFAULT 0,
+    review_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, employee_id),
+    INDEX idx_monthly_ratings_employee (employee_id),
+    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+);
+
+INSERT INTO monthly_ratings (period, employee_id, department, rating_sum, review_count)
+SELECT
+    DATE_FORMAT(r.date, '%Y-%m-01'),
+    r.employee_id,
+    e.department,
+    SUM(r.rating),
+    COUNT(*)
+FROM customer_reviews r
+JOIN employees e ON e.id = r.employee_id
+GROUP BY DATE_FORMAT(r.date, '%Y-%m-01'), r.employee_id, e.department;
@@ -0,0 +1,8 @@
+-- Counters bumped by every committed write, used to build ETags
+CREATE TABLE data_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_versions (name) VALUES
+('departments'), ('employees'), ('reviews'), ('users');
@@ -0,0 +1,7 @@
+-- Search over review comments uses InnoDB full-text search
+-- (MATCH ... AGAINST in boolean mode)
+ALTER TABLE customer_reviews ADD FULLTEXT INDEX ft_reviews_comment (comment);
+
+-- Bumped when an employee's searchable fields change; each process
+-- rebuilds its in-memory employee search index when it moves
+INSERT INTO data_versions (name) VALUES ('directory');
@@ -0,0 +1,8 @@
+-- Batches of queued reviews already written, so a batch taken over from a
+-- crashed worker is not written twice (REVIEW_INGEST_MODE=queue)
+CREATE TABLE review_ingest_batches (
+    batch_id CHAR(32) PRIMARY KEY,
+    review_count INT NOT NULL,
+    flushed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_review_ingest_batches_flushed (flushed_at)
+);
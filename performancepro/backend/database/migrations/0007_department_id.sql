@@ -0,0 +1,32 @@
+-- employees.department becomes an integer foreign key to departments.
+-- Department names referenced by employees but missing from departments
+-- are added first so every employee keeps its department.
+INSERT IGNORE INTO departments (name) SELECT DISTINCT department FROM employees;
+
+ALTER TABLE employees ADD COLUMN department_id INT NULL AFTER name;
+
+UPDATE employees e
+JOIN departments d ON d.name = e.department
+SET e.department_id = d.id
+WHERE e.id > 0;
+
+ALTER TABLE employees
+    MODIFY department_id INT NOT NULL,
+    DROP INDEX idx_employees_department_rating,
+    DROP COLUMN department,
+    ADD INDEX idx_employees_department_rating (department_id, customer_rating, review_count),
+    ADD CONSTRAINT fk_employees_department FOREIGN KEY (department_id) REFERENCES departments(id);
+
+-- The monthly rollup keeps the employee's department as an id as well
+ALTER TABLE monthly_ratings ADD COLUMN department_id INT NULL AFTER employee_id;
+
+UPDATE monthly_ratings m
+JOIN departments d ON d.name = m.department
+SET m.department_id = d.id
+WHERE m.employee_id > 0;
+
+ALTER TABLE monthly_ratings
+    MODIFY department_id INT NOT NULL,
+    DROP COLUMN department;
+
+UPDATE data_versions SET version = version + 1 WHERE name IN ('departments', 'employees', 'directory');
@@ -2,7 +2,13 @@
 CREATE DATABASE IF NOT EXISTS employee_pro;
 USE employee_pro;
 
--- Drop existing tables if they exist to recreate with correct schema
+-- Drop existing tables if they exist to recreate with correct schema.
+-- This file always describes the latest schema; existing databases are
+-- upgraded in place with "flask --app app migrate" instead.
+DROP TABLE IF EXISTS schema_migrations;
+DROP TABLE IF EXISTS review_ingest_batches;
+DROP TABLE IF EXISTS data_versions;
+DROP TABLE IF EXISTS monthly_ratings;
 DROP TABLE IF EXISTS customer_reviews;
 DROP TABLE IF EXISTS employees;
 DROP TABLE IF EXISTS users;
@@ -26,14 +32,20 @@ CREATE TABLE users (
 CREATE TABLE employees (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
-    department VARCHAR(50) NOT NULL,
+    department_id INT NOT NULL,
     position VARCHAR(50) NOT NULL,
     email VARCHAR(100) UNIQUE NOT NULL,
     phone VARCHAR(20),
     join_date DATE NOT NULL,
     avatar VARCHAR(10) NOT NULL,
     customer_rating DECIMAL(3,1) DEFAULT 0.0,
-    review_count INT DEFAULT 0
+    review_count INT DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    INDEX idx_employees_department_rating (department_id, customer_rating, review_count),
+    INDEX idx_employees_rating (customer_rating, review_count),
+    INDEX idx_employees_review_count (review_count),
+    INDEX idx_employees_name (name),
+    CONSTRAINT fk_employees_department FOREIGN KEY (department_id) REFERENCES departments(id)
 );
 
 CREATE TABLE customer_reviews (
@@ -44,9 +56,57 @@ CREATE TABLE customer_reviews (
     rating INT NOT NULL CHECK (rating BETWEEN 1 AND 5),
     comment TEXT,
     date DATE NOT NULL,
+    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
+    INDEX idx_reviews_employee_date (employee_id, date),
+    INDEX idx_reviews_date_rating (date, rating),
+    FULLTEXT INDEX ft_reviews_comment (comment)
+);
+
+-- Per employee and month rating totals feeding the trend charts.
+-- period is the first day of the month.
+CREATE TABLE monthly_ratings (
+    period DATE NOT NULL,
+    employee_id INT NOT NULL,
+    department_id INT NOT NULL,
+    rating_sum INT NOT NULL DEFAULT 0,
+    review_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, employee_id),
+    INDEX idx_monthly_ratings_employee (employee_id),
     FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
 );
 
+-- Counters bumped by every committed write, used to build ETags
+CREATE TABLE data_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_versions (name) VALUES
+('departments'), ('employees'), ('reviews'), ('users'), ('directory');
+
+-- Batches of queued reviews already written (REVIEW_INGEST_MODE=queue)
+CREATE TABLE review_ingest_batches (
+    batch_id CHAR(32) PRIMARY KEY,
+    review_count INT NOT NULL,
+    flushed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_review_ingest_batches_flushed (flushed_at)
+);
+
+-- Migrations already contained in this schema
+CREATE TABLE schema_migrations (
+    version VARCHAR(255) PRIMARY KEY,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO schema_migrations (version) VALUES
+('0001_employee_rating_sum'),
+('0002_query_indexes'),
+('0003_monthly_ratings'),
+('0004_data_versions'),
+('0005_search'),
+('0006_review_ingest'),
+('0007_department_id');
+
 -- Insert sample departments
 INSERT INTO departments (name) VALUES 
 ('Engineering'), ('Marketing'), ('Sales'), ('HR'), ('Finance');
@@ -59,14 +119,15 @@ INSERT INTO users (username, email, password, role, name) VALUES
 INSERT INTO users (username, email, password, role, name) VALUES 
 ('customer', 'customer@example.com', '$2b$12$tZ/nJb8f5WfZjXa8a5xUeL9K7H6jT8kGf2hV3zPq1mRcN8sW4Oi', 'customer', 'Customer User');
 
--- Insert sample employees
-INSERT INTO employees (name, department, position, email, phone, join_date, avatar) VALUES 
-('John Doe', 'Engineering', 'Senior Developer', 'john.doe@company.com', '+1 (555) 123-4567', '2022-01-15', 'JD'),
-('Jane Smith', 'Marketing', 'Marketing Manager', 'jane.smith@company.com', '+1 (555) 234-5678', '2021-03-20', 'JS'),
-('Mike Johnson', 'Sales', 'Sales Representative', 'mike.johnson@company.com', '+1 (555) 345-6789', '2022-06-10', 'MJ'),
-('Sarah Williams', 'HR', 'HR Specialist', 'sarah.williams@company.com', '+1 (555) 456-7890', '2021-11-05', 'SW'),
-('David Brown', 'Engineering', 'Junior Developer', 'david.brown@company.com', '+1 (555) 567-8901', '2023-02-28', 'DB'),
-('Lisa Davis', 'Finance', 'Financial Analyst', 'lisa.davis@company.com', '+1 (555) 678-9012', '2022-09-12', 'LD');
+-- Insert sample employees (department ids follow the departments above:
+-- 1 Engineering, 2 Marketing, 3 Sales, 4 HR, 5 Finance)
+INSERT INTO employees (name, department_id, position, email, phone, join_date, avatar) VALUES 
+('John Doe', 1, 'Senior Developer', 'john.doe@company.com', '+1 (555) 123-4567', '2022-01-15', 'JD'),
+('Jane Smith', 2, 'Marketing Manager', 'jane.smith@company.com', '+1 (555) 234-5678', '2021-03-20', 'JS'),
+('Mike Johnson', 3, 'Sales Representative', 'mike.johnson@company.com', '+1 (555) 345-6789', '2022-06-10', 'MJ'),
+('Sarah Williams', 4, 'HR Specialist', 'sarah.williams@company.com', '+1 (555) 456-7890', '2021-11-05', 'SW'),
+('David Brown', 1, 'Junior Developer', 'david.brown@company.com', '+1 (555) 567-8901', '2023-02-28', 'DB'),
+('Lisa Davis', 5, 'Financial Analyst', 'lisa.davis@company.com', '+1 (555) 678-9012', '2022-09-12', 'LD');
 
 -- Insert sample customer reviews
 INSERT INTO customer_reviews (employee_id, customer_name, customer_email, rating, comment, date) VALUES 
@@ -74,4 +135,24 @@ INSERT INTO customer_reviews (employee_id, customer_name, customer_email, rating
 (1, 'Bob Smith', 'bob@example.com', 4, 'Good work, solved my issue quickly.', '2024-01-10'),
 (2, 'Carol White', 'carol@example.com', 5, 'Outstanding marketing strategies!', '2024-01-12'),
 (3, 'David Lee', 'david@example.com', 3, 'Average service, could be better.', '2024-01-08'),
-(4, 'Emma Wilson', 'emma@example.com', 5, 'Very professional and friendly!', '2024-01-14');
\ No newline at end of file
+(4, 'Emma Wilson', 'emma@example.com', 5, 'Very professional and friendly!', '2024-01-14');
+
+-- Derive stored ratings from the sample reviews
+UPDATE employees e
+SET
+    rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM customer_reviews WHERE employee_id = e.id),
+    review_count = (SELECT COUNT(*) FROM customer_reviews WHERE employee_id = e.id),
+    customer_rating = CASE WHEN review_count > 0 THEN ROUND(rating_sum / review_count, 1) ELSE 0.0 END
+WHERE e.id > 0;
+
+-- Roll the sample reviews up by month
+INSERT INTO monthly_ratings (period, employee_id, department_id, rating_sum, review_count)
+SELECT
+    DATE_FORMAT(r.date, '%Y-%m-01'),
+    r.employee_id,
+    e.department_id,
+    SUM(r.rating),
+    COUNT(*)
+FROM customer_reviews r
+JOIN employees e ON e.id = r.employee_id
+GROUP BY DATE_FORMAT(r.date, '%Y-%m-01'), r.employee_id, e.department_id;
@@ -0,0 +1,311 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Connection handed out by the pool. It behaves like a regular pymysql
+# connection, except that close() returns it to the pool instead of
+# tearing down the socket, so existing "finally: connection.close()"
+# blocks keep working unchanged.
+class PooledConnection:
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        if self._pool.cursor_wrapper is not None:
+            cursor = self._pool.cursor_wrapper(cursor)
+        return cursor
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self._raw, self._created_at)
+
+    def discard(self):
+        # Close the underlying socket and give the slot back to the pool
+        if not self._released:
+            self._pool._discard(self._raw)
+        self.close()
+
+
+# Bounded, thread-safe pool of pymysql connections
+class ConnectionPool:
+    def __init__(self, db_config, min_size=2, max_size=10, timeout=5.0,
+                 idle_timeout=300.0, max_lifetime=3600.0, reap_interval=30.0, cursor_wrapper=None):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Invalid pool size: min=%s max=%s' % (min_size, max_size))
+        self.db_config = dict(db_config)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        # Seconds between the reaper's prune() and fill() passes
+        self.reap_interval = reap_interval
+        # Optional callable wrapping every cursor, e.g. for instrumentation
+        self.cursor_wrapper = cursor_wrapper
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        # Process the reaper thread was started in
+        self._reaper_pid = None
+        self._reset_state()
+
+    def _reset_state(self):
+        # Idle entries are (connection, created_at, returned_at), newest last
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._recycled = 0
+        self._timeouts = 0
+        self._checkouts = 0
+        self._closed = False
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        # Sockets inherited from a parent process must never be shared, so
+        # a forked worker starts with a fresh, empty pool.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _open(self):
+        return pymysql.connect(**self.db_config)
+
+    # Closing talks to the server, so it is never done under self._lock,
+    # where a slow peer would stall every checkout and release
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _discard_all(self, raws):
+        for raw in raws:
+            self._discard(raw)
+
+    def _is_expired(self, created_at, returned_at, now):
+        if self.max_lifetime and now - created_at >= self.max_lifetime:
+            return True
+        if self.idle_timeout and now - returned_at >= self.idle_timeout and self._size > self.min_size:
+            return True
+        return False
+
+    # Take expired idle connections out of the pool into stale, for the
+    # caller to close once it has released the lock
+    def _evict_stale(self, now, stale):
+        # The least recently returned connections sit at the left end
+        while self._idle and self._size > self.min_size:
+            raw, created_at, returned_at = self._idle[0]
+            if not self._is_expired(created_at, returned_at, now):
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._recycled += 1
+            stale.append(raw)
+
+    def connection(self):
+        deadline = time.monotonic() + self.timeout
+        stale = []
+        try:
+            with self._lock:
+                self._check_pid()
+                while True:
+                    now = time.monotonic()
+                    self._evict_stale(now, stale)
+                    while self._idle:
+                        raw, created_at, returned_at = self._idle.pop()
+                        if self._is_expired(created_at, returned_at, now):
+                            self._size -= 1
+                            self._recycled += 1
+                            stale.append(raw)
+                            continue
+                        self._in_use += 1
+                        self._checkouts += 1
+                        break
+                    else:
+                        raw = None
+
+                    if raw is not None:
+                        break
+
+                    if self._size < self.max_size:
+                        # Reserve the slot before releasing the lock to connect
+                        self._size += 1
+                        self._in_use += 1
+                        self._checkouts += 1
+                        break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout('Timed out after %.1fs waiting for a database connection' % self.timeout)
+                    self._waiting += 1
+                    try:
+                        self._available.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+        finally:
+            self._discard_all(stale)
+
+        if raw is None:
+            return self._connect_reserved()
+        return self._health_check(raw, created_at)
+
+    def _connect_reserved(self):
+        try:
+            raw = self._open()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._in_use -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self._created += 1
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _health_check(self, raw, created_at):
+        try:
+            raw.ping(reconnect=False)
+            return PooledConnection(self, raw, created_at)
+        except Exception:
+            self._discard(raw)
+            with self._lock:
+                self._recycled += 1
+            # Keep the reserved slot and replace the dead connection with a new one
+            return self._connect_reserved()
+
+    def _release(self, raw, created_at):
+        healthy = raw.open
+        if healthy:
+            try:
+                # Never hand out a connection with a half-finished transaction
+                raw.rollback()
+            except Exception:
+                healthy = False
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            now = time.monotonic()
+            keep = healthy and not self._closed and not (self.max_lifetime and now - created_at >= self.max_lifetime)
+            if keep:
+                self._idle.append((raw, created_at, now))
+            else:
+                self._size -= 1
+                self._recycled += 1
+            self._available.notify()
+        if not keep:
+            self._discard(raw)
+
+    def prune(self):
+        # Close idle connections past their idle timeout or lifetime
+        stale = []
+        with self._lock:
+            self._check_pid()
+            now = time.monotonic()
+            kept = deque()
+            for raw, created_at, returned_at in self._idle:
+                if self._is_expired(created_at, returned_at, now):
+                    self._size -= 1
+                    self._recycled += 1
+                    stale.append(raw)
+                else:
+                    kept.append((raw, created_at, returned_at))
+            self._idle = kept
+        self._discard_all(stale)
+
+    def fill(self):
+        # Open connections until the pool holds at least min_size
+        while True:
+            with self._lock:
+                self._check_pid()
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                raw = self._open()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            with self._lock:
+                self._created += 1
+                self._idle.appendleft((raw, time.monotonic(), time.monotonic()))
+                self._available.notify()
+
+    # Close the idle connections, e.g. when the process exits. Connections
+    # still checked out are closed when they are returned.
+    def close_all(self):
+        with self._lock:
+            self._check_pid()
+            self._closed = True
+            idle = [raw for raw, _, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+        self._discard_all(idle)
+
+    # Open min_size connections and start the reaper in this process. Cheap
+    # to call on every request: it does its work once per process, again
+    # after a fork. A database that is down only delays the first fill.
+    def ensure_started(self):
+        if self._reaper_pid == os.getpid():
+            return
+        with self._lock:
+            if self._reaper_pid == os.getpid():
+                return
+            self._reaper_pid = os.getpid()
+        try:
+            self.fill()
+        except Exception:
+            logger.warning('could not open %d database connections at startup', self.min_size, exc_info=True)
+        if self.reap_interval:
+            threading.Thread(target=self._reap, name='db-pool-reaper', daemon=True).start()
+
+    def _reap(self):
+        # Close connections past their idle timeout or lifetime while they
+        # sit unused, instead of at the next checkout, and top the pool
+        # back up to min_size
+        pid = os.getpid()
+        while self._reaper_pid == pid and not self._closed:
+            time.sleep(self.reap_interval)
+            try:
+                self.prune()
+                self.fill()
+            except Exception:
+                logger.warning('database pool maintenance failed', exc_info=True)
+
+    def stats(self):
+        with self._lock:
+            self._check_pid()
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'created': self._created,
+                'recycled': self._recycled,
+                'timeouts': self._timeouts,
+                'checkouts': self._checkouts
+            }
@@ -0,0 +1,62 @@
+import threading
+
+# departments is a handful of rows that almost never change, so every
+# process keeps it as two dictionaries instead of joining it into employee
+# queries: employees carry department_id and names are filled in from
+# here. The dictionaries are reloaded whenever the 'departments' data
+# version moves.
+
+SELECT_DEPARTMENTS_SQL = "SELECT id, name FROM departments ORDER BY id"
+
+
+class DepartmentCache:
+    def __init__(self, connection_factory, version_source):
+        self.connection_factory = connection_factory
+        # Callable returning the current 'departments' data version
+        self.version_source = version_source
+        self._lock = threading.Lock()
+        self._version = None
+        self._names = {}
+        self._ids = {}
+
+    def _load(self):
+        connection = self.connection_factory()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(SELECT_DEPARTMENTS_SQL)
+                return cursor.fetchall()
+        finally:
+            connection.close()
+
+    def _current(self):
+        version = self.version_source()
+        with self._lock:
+            if version != self._version:
+                rows = self._load()
+                # Replaced, never mutated, so callers may keep a reference
+                self._names = {row['id']: row['name'] for row in rows}
+                self._ids = {row['name']: row['id'] for row in rows}
+                self._version = version
+            return self._names, self._ids
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    # department_id -> name
+    def names(self):
+        return self._current()[0]
+
+    def name(self, department_id):
+        return self._current()[0].get(department_id)
+
+    # name -> department_id
+    def ids(self):
+        return self._current()[1]
+
+    # Id of a department name, or None if there is no such department
+    def id_for(self, name):
+        return self._current()[1].get(name)
+
+    def rows(self):
+        return [{'id': department_id, 'name': name} for department_id, name in self._current()[0].items()]
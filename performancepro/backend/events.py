@@ -0,0 +1,85 @@
+import queue
+import threading
+
+# In-process fan-out of small change events to Server-Sent Events clients.
+# Writers publish after committing; every connected client has a bounded
+# queue, and a client that falls behind has its backlog dropped and is told
+# to reload instead of slowing down the writers or growing without bound.
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscriber:
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Set when events had to be dropped; the client must resync
+        self.overflowed = False
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.overflowed = False
+
+
+class EventBroadcaster:
+    def __init__(self, max_clients=100, queue_size=100):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._published = 0
+        self._dropped = 0
+        self._rejected = 0
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                self._rejected += 1
+                raise TooManySubscribers('Too many live dashboard connections, please retry shortly')
+            subscriber = Subscriber(self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._published += 1
+        for subscriber in subscribers:
+            if subscriber.overflowed:
+                continue
+            try:
+                subscriber.queue.put_nowait((event, data))
+            except queue.Full:
+                subscriber.overflowed = True
+                with self._lock:
+                    self._dropped += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._subscribers),
+                'max_clients': self.max_clients,
+                'published': self._published,
+                'overflows': self._dropped,
+                'rejected': self._rejected
+            }
+
+
+# One SSE message; data is already JSON encoded
+def format_event(event, data):
+    return f'event: {event}\ndata: {data}\n\n'
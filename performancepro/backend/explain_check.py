@@ -0,0 +1,170 @@
+import re
+
+# GET requests whose SQL is checked. {employee_id} and {review_cursor} are
+# filled in from the database. Unpaged /api/employees is left out on purpose:
+# returning every employee is a full scan by definition, and so is building
+# the in-memory employee search index, hence only review search is checked.
+CHECKED_REQUESTS = [
+    '/api/dashboard',
+    '/api/analytics',
+    '/api/departments',
+    '/api/employees?limit=50',
+    '/api/employees?limit=50&sort=rating&order=desc&after_id={employee_id}',
+    '/api/employees?limit=50&sort=review_count&order=desc',
+    '/api/employees?limit=50&sort=name&name_prefix=J',
+    '/api/employees?limit=50&department={department}',
+    '/api/employees?limit=50&min_rating=4.5',
+    '/api/employees/{employee_id}',
+    '/api/employees/{employee_id}/reviews?limit=20',
+    '/api/employees/{employee_id}/reviews?limit=20&before={review_cursor}',
+    '/api/search?scope=reviews&q=service',
+]
+
+# Small lookup tables that may always be read in full
+SCAN_ALLOWED_TABLES = {'departments', 'data_versions'}
+
+
+# Cursor proxy that remembers every SELECT it runs
+class RecordingCursor:
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def execute(self, query, args=None):
+        if query.lstrip().upper().startswith('SELECT'):
+            self._statements.append((query, args))
+        return self._cursor.execute(query, args)
+
+
+class RecordingConnection:
+    def __init__(self, connection, statements):
+        self._connection = connection
+        self._statements = statements
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self._connection.cursor(*args, **kwargs), self._statements)
+
+
+def fingerprint(query):
+    return re.sub(r'\s+', ' ', query).strip()
+
+
+# Decide whether one row of EXPLAIN output is a full scan. A full index scan
+# is acceptable when the index covers the query or a LIMIT stops it early.
+def full_scan_reason(row, query, ignore_below):
+    table = row.get('table') or ''
+    if table.startswith('<') or table in SCAN_ALLOWED_TABLES:
+        return None
+    if (row.get('rows') or 0) < ignore_below:
+        return None
+    extra = row.get('Extra') or ''
+    if row.get('type') == 'ALL':
+        return f'full table scan of {table}'
+    if row.get('type') == 'index' and 'Using index' not in extra and not re.search(r'\bLIMIT\b', query, re.I):
+        return f'full index scan of {table} ({row.get("key")})'
+    return None
+
+
+def _fill_placeholders(pool):
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT e.id, d.name as department
+                FROM employees e
+                JOIN departments d ON d.id = e.department_id
+                ORDER BY e.review_count DESC
+                LIMIT 1
+            """)
+            employee = cursor.fetchone()
+            if not employee:
+                raise RuntimeError('explain-check needs at least one employee in the database')
+            cursor.execute("""
+                SELECT id, date FROM customer_reviews
+                WHERE employee_id = %s
+                ORDER BY date DESC, id DESC
+                LIMIT 1
+            """, (employee['id'],))
+            review = cursor.fetchone()
+    finally:
+        connection.close()
+    return {
+        'employee_id': employee['id'],
+        'department': employee['department'],
+        'review_cursor': f"{review['date'].isoformat()}:{review['id']}" if review else '9999-12-31:0'
+    }
+
+
+# Issue each checked request against the app as an admin, record the SELECTs
+# the route runs and EXPLAIN them. Returns a list of result dicts, one per
+# statement, each with a 'problems' list that is empty when the plan is fine.
+def run_explain_check(app, pool, ignore_below=1000, before_request=None):
+    placeholders = _fill_placeholders(pool)
+    results = []
+    checkout = pool.connection
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 0
+        session['username'] = 'explain-check'
+        session['role'] = 'admin'
+        session['name'] = 'Explain Check'
+
+    try:
+        for template in CHECKED_REQUESTS:
+            path = template.format(**placeholders)
+            statements = []
+            pool.connection = lambda: RecordingConnection(checkout(), statements)
+            try:
+                if before_request:
+                    before_request()
+                response = client.get(path)
+                # Streamed bodies run their queries while being read
+                response.get_data()
+            finally:
+                pool.connection = checkout
+
+            if response.status_code >= 400:
+                results.append({
+                    'route': path,
+                    'query': None,
+                    'plan': [],
+                    'problems': [f'request failed with status {response.status_code}']
+                })
+                continue
+
+            connection = checkout()
+            try:
+                with connection.cursor() as cursor:
+                    for query, args in statements:
+                        cursor.execute('EXPLAIN ' + query, args)
+                        plan = cursor.fetchall()
+                        problems = [
+                            reason for reason in (full_scan_reason(row, query, ignore_below) for row in plan)
+                            if reason
+                        ]
+                        results.append({
+                            'route': path,
+                            'query': fingerprint(query),
+                            'plan': plan,
+                            'problems': problems
+                        })
+            finally:
+                connection.close()
+    finally:
+        pool.connection = checkout
+    return results
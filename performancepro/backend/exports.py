@@ -0,0 +1,311 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+from queries import tuple_cursor
+from rollups import month_start
+
+logger = logging.getLogger(__name__)
+
+# Full exports of reviews, employees and the monthly rollup. Rows are read
+# with an unbuffered server-side cursor and encoded as they arrive, so an
+# export of any size holds one chunk of output in memory. CSV is streamed
+# straight into the response; XLSX (and CSV too large to wait for) is
+# written to disk by a background job and downloaded afterwards.
+#
+# Each kind lists its columns once and selects them in that order, the
+# department as its id; the same rows feed both formats. Department names
+# come from the per-process department cache instead of a join.
+
+EXPORTS = {
+    'reviews': {
+        'columns': ['id', 'employee_id', 'employee_name', 'department', 'customer_name', 'customer_email',
+                    'rating', 'comment', 'date'],
+        'sql': """
+            SELECT r.id, r.employee_id, e.name as employee_name, e.department_id,
+                   r.customer_name, r.customer_email, r.rating, r.comment, r.date
+            FROM customer_reviews r
+            JOIN employees e ON e.id = r.employee_id
+            WHERE 1 = 1 {filters}
+            ORDER BY r.id
+        """,
+        'start': 'r.date >= %s',
+        'end': 'r.date <= %s'
+    },
+    'employees': {
+        'columns': ['id', 'name', 'department', 'position', 'email', 'phone', 'join_date',
+                    'customer_rating', 'review_count'],
+        'sql': """
+            SELECT id, name, department_id, position, email, phone, join_date, customer_rating, review_count
+            FROM employees
+            WHERE 1 = 1 {filters}
+            ORDER BY id
+        """,
+        'start': 'join_date >= %s',
+        'end': 'join_date <= %s'
+    },
+    'monthly': {
+        'columns': ['year', 'month', 'employee_id', 'employee_name', 'department', 'review_count',
+                    'rating_sum', 'avg_rating'],
+        'sql': """
+            SELECT YEAR(m.period) as year, MONTH(m.period) as month, m.employee_id,
+                   e.name as employee_name, m.department_id, m.review_count, m.rating_sum,
+                   ROUND(m.rating_sum / m.review_count, 2) as avg_rating
+            FROM monthly_ratings m
+            JOIN employees e ON e.id = m.employee_id
+            WHERE m.review_count > 0 {filters}
+            ORDER BY m.period, m.employee_id
+        """,
+        # Months overlapping the range
+        'start': 'm.period >= %s',
+        'end': 'm.period <= %s'
+    }
+}
+
+FORMATS = ('csv', 'xlsx')
+
+# Data rows per worksheet; Excel stops at 1,048,576 rows including the header
+XLSX_SHEET_ROWS = 1048575
+
+JOB_ID_LENGTH = 32
+
+
+def parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+
+def export_query(kind, start=None, end=None):
+    export = EXPORTS[kind]
+    if kind == 'monthly' and start is not None:
+        start = month_start(start)
+    filters = []
+    params = []
+    for clause, value in ((export['start'], start), (export['end'], end)):
+        if value is not None:
+            filters.append(f'AND {clause}')
+            params.append(value)
+    return export['sql'].format(filters=' '.join(filters)), params
+
+
+# Rows of an export as lists in column order. The caller owns the
+# connection; the rows have to be read to the end before it is reused.
+# The cursor is only closed once exhausted: closing an unbuffered cursor
+# early reads every remaining row off the socket, so a caller that stops
+# reading drops the connection instead.
+def export_rows(connection, kind, department_names, start=None, end=None):
+    department = EXPORTS[kind]['columns'].index('department')
+    sql, params = export_query(kind, start, end)
+    cursor = tuple_cursor(connection, stream=True)
+    cursor.execute(sql, params)
+    for row in cursor:
+        row = list(row)
+        row[department] = department_names.get(row[department])
+        yield row
+    cursor.close()
+
+
+# Encode rows as CSV text, yielding chunks of about chunk_size characters
+def csv_chunks(columns, rows, chunk_size=65536):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Encode text chunks as UTF-8, gzip compressed when compress is set
+def encode_chunks(chunks, compress=False):
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write_xlsx(path, columns, rows):
+    # Write-only workbooks stream rows to disk instead of keeping cells
+    workbook = Workbook(write_only=True)
+    sheet = None
+    count = 0
+    for row in rows:
+        if count % XLSX_SHEET_ROWS == 0:
+            sheet = workbook.create_sheet(f'Sheet{count // XLSX_SHEET_ROWS + 1}')
+            sheet.append(columns)
+        sheet.append(row)
+        count += 1
+    if sheet is None:
+        workbook.create_sheet('Sheet1').append(columns)
+    workbook.save(path)
+    return count
+
+
+def write_csv(path, columns, rows):
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for chunk in csv_chunks(columns, counted()):
+            f.write(chunk)
+    return count
+
+
+# Export jobs run on a small thread pool per process and write
+# <id>.<format> plus an <id>.json status file into one directory, so any
+# worker process sharing the directory can report on and serve a job.
+class ExportJobs:
+    def __init__(self, directory, connection_factory, department_names, workers=1, ttl=86400):
+        self.directory = os.path.abspath(directory)
+        self.connection_factory = connection_factory
+        # Callable returning the department_id -> name mapping
+        self.department_names = department_names
+        self.workers = workers
+        # Seconds finished exports are kept
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _pool(self):
+        # Threads do not survive a fork, so each process starts its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _status_path(self, job_id):
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def _write_status(self, status):
+        path = self._status_path(status['id'])
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(status, f)
+        os.replace(temporary, path)
+
+    def start(self, kind, fmt='xlsx', start=None, end=None, owner=None):
+        if kind not in EXPORTS:
+            raise ValueError(f'Unknown export: {kind}')
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+        if fmt == 'xlsx' and Workbook is None:
+            raise RuntimeError('XLSX exports need openpyxl (pip install openpyxl)')
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+        status = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'format': fmt,
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat() if end else None,
+            'owner': owner,
+            'status': 'queued',
+            'rows': None,
+            'size': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None
+        }
+        self._write_status(status)
+        self._pool().submit(self._run, status, start, end)
+        return status
+
+    def _run(self, status, start, end):
+        status = dict(status, status='running')
+        self._write_status(status)
+        path = self.path(status['id'], status['format'])
+        partial = f'{path}.part'
+        columns = EXPORTS[status['kind']]['columns']
+        writer = write_xlsx if status['format'] == 'xlsx' else write_csv
+        try:
+            # Before the checkout: refreshing the names takes a connection
+            department_names = self.department_names()
+            connection = self.connection_factory()
+            finished = False
+            try:
+                rows = export_rows(connection, status['kind'], department_names, start, end)
+                count = writer(partial, columns, rows)
+                finished = True
+            finally:
+                if finished:
+                    connection.close()
+                else:
+                    # Unread rows of the server-side cursor would have to be
+                    # drained first, so drop the connection instead
+                    connection.discard()
+            os.replace(partial, path)
+            status.update(status='done', rows=count, size=os.path.getsize(path))
+        except Exception as e:
+            logger.exception('export %s failed', status['id'])
+            if os.path.exists(partial):
+                os.remove(partial)
+            status.update(status='failed', error=str(e))
+        status['finished_at'] = time.time()
+        self._write_status(status)
+
+    def path(self, job_id, fmt):
+        return os.path.join(self.directory, f'{job_id}.{fmt}')
+
+    # Status of a job, or None for an unknown or malformed id
+    def status(self, job_id):
+        if len(job_id) != JOB_ID_LENGTH or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._status_path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    # Delete exports and status files older than ttl
+    def prune(self):
+        cutoff = time.time() - self.ttl
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    # Download name of a finished export, e.g. reviews-20240131-0915.xlsx
+    @staticmethod
+    def download_name(status):
+        created = datetime.fromtimestamp(status['created_at'])
+        return f"{status['kind']}-{created:%Y%m%d-%H%M}.{status['format']}"
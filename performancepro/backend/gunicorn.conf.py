@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+
+# gunicorn settings for serving the API in production:
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Each worker process runs a pool of request threads. gunicorn's gthread
+# worker parks idle keep-alive connections in its event loop instead of on
+# a thread, so only requests in flight occupy a thread. Live dashboard
+# streams stay in flight while connected and are capped at
+# DASHBOARD_STREAM_MAX_CLIENTS (a quarter of the threads by default). Keep DB_POOL_MAX_SIZE close to
+# WEB_THREADS; a thread waiting for a database connection beyond that gets
+# a 503 after DB_POOL_TIMEOUT seconds.
+
+bind = os.environ.get('WEB_BIND') or '0.0.0.0:8000'
+workers = int(os.environ.get('WEB_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS') or 8)
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS') or 1000)
+keepalive = int(os.environ.get('WEB_KEEPALIVE') or 30)
+timeout = int(os.environ.get('WEB_TIMEOUT') or 60)
+graceful_timeout = 30
+
+# Import the app once in the master so workers fork with it loaded
+preload_app = True
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS') or 10000)
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
+errorlog = '-'
+
+# config.py sizes per-worker resources (bcrypt processes, dashboard
+# streams) from these, so pass them on; set WEB_WORKERS and WEB_THREADS
+# rather than -w and --threads
+os.environ['WEB_WORKERS'] = str(workers)
+os.environ['WEB_THREADS'] = str(threads)
+
+# Sessions kept in one worker's memory are unknown to the others, so with
+# several workers they default to Redis (read by config.py when the app is
+# imported, after this file)
+if workers > 1:
+    os.environ.setdefault('SESSION_BACKEND', 'redis')
+
+
+# Refuse to start with in-memory sessions and several workers, where a
+# login would only be known to the worker that handled it, or with the
+# public development SECRET_KEY and Redis sessions. Then prepare every
+# registered query in the master before workers fork, so a deploy against
+# a schema the code does not match fails at once instead of on the first
+# request (WEB_CHECK_QUERIES=0 skips the check). A database that cannot be
+# reached is logged and the check skipped rather than keeping the server
+# down; requests fail until it is back. Finally build the leaderboard and
+# search index once for every worker to inherit; should that fail, each
+# worker builds them on first use instead.
+def on_starting(server):
+    from config import Config
+
+    if Config.SESSION_BACKEND == 'memory' and server.cfg.workers > 1:
+        server.log.error('SESSION_BACKEND=memory needs WEB_WORKERS=1; use SESSION_BACKEND=redis')
+        raise SystemExit(1)
+    if Config.SECRET_KEY == Config.DEVELOPMENT_SECRET_KEY:
+        if Config.SESSION_BACKEND == 'redis':
+            server.log.error('SECRET_KEY is not set; set it to the same random value on every worker and node')
+            raise SystemExit(1)
+        server.log.error('SECRET_KEY is not set; session cookies are signed with the public development key')
+    if (os.environ.get('WEB_CHECK_QUERIES') or '1') != '0':
+        import pymysql
+        from app import check_queries
+
+        try:
+            problems = check_queries()
+        except pymysql.OperationalError as e:
+            server.log.error('could not reach the database to check the queries; starting without the check: %s', e)
+            problems = []
+        for problem in problems:
+            server.log.error('query %s %s: %s', problem['query'], problem['variant'], problem['error'])
+        if problems:
+            raise SystemExit(1)
+
+    from app import warm_caches
+
+    try:
+        warm_caches()
+    except Exception:
+        server.log.exception('could not build the leaderboard and search index at startup')
+
+
+# Open each worker's minimum database connections right after the fork
+# rather than on its first request, and close them when it exits
+def post_fork(server, worker):
+    from app import db_pool
+
+    db_pool.ensure_started()
+
+
+def worker_exit(server, worker):
+    from app import db_pool
+
+    db_pool.close_all()
@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON encoding for every response. MySQL DECIMAL columns (ratings, SUM()
+# results) are encoded as numbers and dates keep Flask's HTTP date format,
+# in the same pass that serializes the payload, so routes can hand cursor
+# rows straight to jsonify() without copying them first. orjson is used
+# when installed.
+
+
+def _default(o):
+    if isinstance(o, Decimal):
+        return float(o)
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    if orjson is not None:
+        # Dates go through _default so both encoders produce the same output
+        _orjson_options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+        def dumps(self, obj, **kwargs):
+            # orjson output is always compact; pretty-printed debug responses
+            # and other custom arguments use the standard library encoder
+            if kwargs and kwargs != {'separators': (',', ':')}:
+                return super().dumps(obj, **kwargs)
+            options = self._orjson_options | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+            return orjson.dumps(obj, default=_default, option=options).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
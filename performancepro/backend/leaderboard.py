@@ -0,0 +1,282 @@
+import threading
+from bisect import bisect_left, insort
+from decimal import ROUND_CEILING, Decimal
+from itertools import islice
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+from queries import COUNT_RATED, LEADERBOARD_EMPLOYEES, TOP_RATED
+
+# In-process ranking of employees by stored rating, then review count, kept
+# overall and per department. Top-N lists and "rated at least x" counts are
+# a bisect away instead of a sort or a count over the employees table.
+# Ratings are kept as integer tenths (customer_rating is DECIMAL(3,1)) so
+# thresholds compare exactly.
+
+# Sorted list on top of bisect for when sortedcontainers is not installed:
+# lookups stay O(log n), inserts and removals shift the list
+class _SortedKeys:
+    def __init__(self, keys=()):
+        self._keys = sorted(keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        insort(self._keys, key)
+
+    def remove(self, key):
+        del self._keys[bisect_left(self._keys, key)]
+
+    def bisect_left(self, key):
+        return bisect_left(self._keys, key)
+
+    def islice(self, start=None, stop=None):
+        return islice(self._keys, start, stop)
+
+
+def _sorted_keys(keys=()):
+    return SortedList(keys) if SortedList is not None else _SortedKeys(keys)
+
+
+def to_tenths(rating):
+    return int((Decimal(str(rating or 0)) * 10).to_integral_value())
+
+
+# Smallest rating in tenths that satisfies "rating >= min_rating"
+def threshold_tenths(min_rating):
+    return int((Decimal(str(min_rating)) * 10).to_integral_value(rounding=ROUND_CEILING))
+
+
+# Best first: highest rating, then most reviews, then newest employee. The
+# order matches a backward scan of idx_employees_rating, which the SQL
+# fallback uses.
+def _key(employee_id, tenths, review_count):
+    return (-tenths, -review_count, -employee_id)
+
+
+class Leaderboard:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._overall = _sorted_keys()
+        self._departments = {}
+        # employee_id -> (key, department_id, name)
+        self._employees = {}
+        self._rated = 0
+        self._rating_tenths_total = 0
+        self._review_total = 0
+        # 'employees' data version the structure reflects
+        self.version = None
+        self._rebuilding = False
+
+    def __len__(self):
+        return len(self._employees)
+
+    def _insert(self, employee_id, name, department_id, tenths, review_count):
+        key = _key(employee_id, tenths, review_count)
+        self._employees[employee_id] = (key, department_id, name)
+        self._overall.add(key)
+        department = self._departments.get(department_id)
+        if department is None:
+            department = self._departments[department_id] = _sorted_keys()
+        department.add(key)
+        if review_count > 0:
+            self._rated += 1
+            self._rating_tenths_total += tenths
+        self._review_total += review_count
+
+    def _delete(self, employee_id):
+        entry = self._employees.pop(employee_id, None)
+        if entry is None:
+            return None
+        key, department_id, name = entry
+        self._overall.remove(key)
+        self._departments[department_id].remove(key)
+        if not len(self._departments[department_id]):
+            del self._departments[department_id]
+        if key[1] < 0:
+            self._rated -= 1
+            self._rating_tenths_total += key[0]
+        self._review_total += key[1]
+        return entry
+
+    def _advance(self, version):
+        # Current before a write made by this process means current after it
+        if version is not None and self.version == version - 1:
+            self.version = version
+
+    def load(self, rows, version=None):
+        fresh = Leaderboard()
+        keys = []
+        departments = {}
+        for row in rows:
+            tenths = to_tenths(row['customer_rating'])
+            review_count = int(row['review_count'] or 0)
+            key = _key(row['id'], tenths, review_count)
+            fresh._employees[row['id']] = (key, row['department_id'], row['name'])
+            keys.append(key)
+            departments.setdefault(row['department_id'], []).append(key)
+            if review_count > 0:
+                fresh._rated += 1
+                fresh._rating_tenths_total += tenths
+            fresh._review_total += review_count
+        with self._lock:
+            self._overall = _sorted_keys(keys)
+            self._departments = {department_id: _sorted_keys(department_keys)
+                                 for department_id, department_keys in departments.items()}
+            self._employees = fresh._employees
+            self._rated = fresh._rated
+            self._rating_tenths_total = fresh._rating_tenths_total
+            self._review_total = fresh._review_total
+            self.version = version
+
+    def rebuild(self, connection, version=None):
+        with connection.cursor() as cursor:
+            LEADERBOARD_EMPLOYEES.execute(cursor)
+            rows = cursor.fetchall()
+        self.load(rows, version)
+
+    # Rebuild in the background when the 'employees' data version moved;
+    # returns whether the structure matches the given version right now
+    def ensure_current(self, version, connection_factory):
+        with self._lock:
+            if self.version == version:
+                return True
+            if self._rebuilding:
+                return False
+            self._rebuilding = True
+
+        def rebuild():
+            try:
+                connection = connection_factory()
+                try:
+                    self.rebuild(connection, version)
+                finally:
+                    connection.close()
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+
+        threading.Thread(target=rebuild, name='leaderboard-rebuild', daemon=True).start()
+        return False
+
+    # Record an employee's new rating and review count. name and
+    # department_id may be left out for an employee already on the board.
+    def update(self, employee_id, customer_rating, review_count, name=None, department_id=None, version=None):
+        with self._lock:
+            previous = self._delete(employee_id)
+            if previous is not None:
+                name = previous[2] if name is None else name
+                department_id = previous[1] if department_id is None else department_id
+            if department_id is not None:
+                self._insert(employee_id, name, department_id, to_tenths(customer_rating), int(review_count))
+            self._advance(version)
+
+    def remove(self, employee_id, version=None):
+        with self._lock:
+            self._delete(employee_id)
+            self._advance(version)
+
+    # Best rated employees with at least one review, overall or in one
+    # department
+    def top(self, limit, department_id=None):
+        with self._lock:
+            keys = self._overall if department_id is None else self._departments.get(department_id)
+            if keys is None:
+                return []
+            results = []
+            for key in keys.islice(0, limit):
+                if key[1] == 0:
+                    # Unreviewed employees sort last
+                    break
+                _, department, name = self._employees[-key[2]]
+                results.append({
+                    'id': -key[2],
+                    'name': name,
+                    'department_id': department,
+                    'customer_rating': Decimal(-key[0]).scaleb(-1),
+                    'review_count': -key[1]
+                })
+            return results
+
+    # Employees whose stored rating is at least min_rating
+    def count_at_least(self, min_rating, department_id=None):
+        with self._lock:
+            keys = self._overall if department_id is None else self._departments.get(department_id)
+            if keys is None:
+                return 0
+            return keys.bisect_left((-threshold_tenths(min_rating) + 1,))
+
+    # The figures of the dashboard's employee scan
+    def summary(self):
+        with self._lock:
+            total = len(self._employees)
+            at_least = {threshold: self.count_at_least(threshold) for threshold in ('4.5', '3.5', '2.5', '1.5')}
+            return {
+                'total_employees': total,
+                'rated_employees': self._rated,
+                'rating_total': self._rating_tenths_total / 10,
+                'avg_rating': Decimal(self._rating_tenths_total) / self._rated / 10 if self._rated else None,
+                'total_reviews': self._review_total,
+                'five_star': at_least['4.5'],
+                'four_star': at_least['3.5'] - at_least['4.5'],
+                'three_star': at_least['2.5'] - at_least['3.5'],
+                'two_star': at_least['1.5'] - at_least['2.5'],
+                'one_star': total - at_least['1.5']
+            }
+
+    # Compare the structure with the employees table and with the SQL the
+    # in-memory answers replace. Returns a list of mismatches.
+    def check(self, connection, limit=10, thresholds=(4.5, 3.5, 2.5, 1.5)):
+        problems = []
+        with connection.cursor() as cursor:
+            LEADERBOARD_EMPLOYEES.execute(cursor)
+            rows = {row['id']: row for row in cursor.fetchall()}
+            with self._lock:
+                employees = dict(self._employees)
+                top = self.top(limit)
+                counts = {threshold: self.count_at_least(threshold) for threshold in thresholds}
+            for employee_id in rows.keys() - employees.keys():
+                problems.append({'employee_id': employee_id, 'problem': 'missing from leaderboard'})
+            for employee_id in employees.keys() - rows.keys():
+                problems.append({'employee_id': employee_id, 'problem': 'not in database'})
+            for employee_id in rows.keys() & employees.keys():
+                row = rows[employee_id]
+                key, department_id, _ = employees[employee_id]
+                expected = _key(employee_id, to_tenths(row['customer_rating']), int(row['review_count'] or 0))
+                if key != expected or department_id != row['department_id']:
+                    problems.append({
+                        'employee_id': employee_id,
+                        'problem': 'stale entry',
+                        'leaderboard': {'customer_rating': -key[0] / 10, 'review_count': -key[1],
+                                        'department_id': department_id},
+                        'database': {'customer_rating': float(row['customer_rating'] or 0),
+                                     'review_count': int(row['review_count'] or 0),
+                                     'department_id': row['department_id']}
+                    })
+
+            TOP_RATED.execute(cursor, (limit,), columns=('id',), department='')
+            expected_top = [row['id'] for row in cursor.fetchall()]
+            if [entry['id'] for entry in top] != expected_top:
+                problems.append({'problem': 'top list differs', 'leaderboard': [entry['id'] for entry in top],
+                                 'database': expected_top})
+            for threshold, count in counts.items():
+                COUNT_RATED.execute(cursor, (threshold,), department='')
+                expected_count = cursor.fetchone()['count']
+                if count != expected_count:
+                    problems.append({'problem': f'count of rating >= {threshold} differs',
+                                     'leaderboard': count, 'database': expected_count})
+        return problems
+
+    def stats(self):
+        with self._lock:
+            return {
+                'employees': len(self._employees),
+                'departments': len(self._departments),
+                'version': self.version,
+                'rebuilding': self._rebuilding,
+                'backend': 'sortedcontainers' if SortedList is not None else 'bisect'
+            }
@@ -0,0 +1,265 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+
+# Request and SQL instrumentation exported in the Prometheus text format
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_logger = logging.getLogger('performancepro.slow_query')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in sorted(values.items()):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                cumulative += count
+                yield self.name + '_bucket', labels + (('le', _format_value(float(bound))),), cumulative
+            yield self.name + '_sum', labels, counts[-1]
+            yield self.name + '_count', labels, cumulative
+
+
+# Metric computed at scrape time from a callback returning
+# [(labels_tuple, value), ...]
+class CallbackMetric:
+    def __init__(self, name, documentation, type, callback):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in self.callback():
+            yield self.name, tuple(labels), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, type, callback):
+        return self.register(CallbackMetric(name, documentation, type, callback))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Normalize SQL so statements that differ only in literals or whitespace
+# share one fingerprint
+def fingerprint(sql):
+    sql = re.sub(r"'(?:[^'\\]|\\.)*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'%s|%\(\w+\)s', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?+)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def _operation(sql):
+    match = re.match(r'\s*(\w+)', sql)
+    operation = match.group(1).upper() if match else ''
+    return operation if operation in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') else 'OTHER'
+
+
+def _route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return 'none'
+
+
+# Cursor proxy that times execute()/executemany() and counts affected rows
+class TimedCursor:
+    def __init__(self, cursor, instrumentation):
+        self._cursor = cursor
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def _timed(self, method, query, args):
+        started_at = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            self._instrumentation.observe_query(query, time.perf_counter() - started_at, self._cursor.rowcount)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+
+class Instrumentation:
+    def __init__(self, registry=None, slow_query_ms=None):
+        self.registry = registry or MetricsRegistry()
+        self.slow_query_ms = slow_query_ms
+        self.request_duration = self.registry.histogram(
+            'performancepro_request_duration_seconds',
+            'Time spent handling a request, by route.',
+            ('route', 'method', 'status')
+        )
+        self.request_sql_duration = self.registry.histogram(
+            'performancepro_request_sql_duration_seconds',
+            'Time a request spent waiting on SQL, by route.',
+            ('route', 'method')
+        )
+        self.query_duration = self.registry.histogram(
+            'performancepro_sql_query_duration_seconds',
+            'Time spent executing a single SQL statement.',
+            ('route', 'operation')
+        )
+        self.query_rows = self.registry.counter(
+            'performancepro_sql_rows_total',
+            'Rows returned or affected by SQL statements.',
+            ('route', 'operation')
+        )
+        self.slow_queries = self.registry.counter(
+            'performancepro_sql_slow_queries_total',
+            'Statements slower than the slow query threshold.',
+            ('route',)
+        )
+
+    # endpoint=None leaves serving metrics_view() to the app, e.g. behind
+    # its own authentication
+    def init_app(self, app, endpoint='/metrics'):
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if endpoint is not None:
+            app.add_url_rule(endpoint, 'metrics', self.metrics_view)
+
+    def wrap_cursor(self, cursor):
+        return TimedCursor(cursor, self)
+
+    def observe_query(self, sql, seconds, rows):
+        route = _route()
+        operation = _operation(sql)
+        self.query_duration.observe(seconds, route=route, operation=operation)
+        if rows and rows > 0:
+            self.query_rows.inc(rows, route=route, operation=operation)
+        if has_request_context() and 'sql_seconds' in g:
+            g.sql_seconds += seconds
+        if self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries.inc(route=route)
+            slow_query_logger.warning(
+                'slow query %.1fms rows=%s route=%s sql=%s',
+                seconds * 1000, rows, route, fingerprint(sql)
+            )
+
+    def _start_request(self):
+        g.request_started_at = time.perf_counter()
+        g.sql_seconds = 0.0
+
+    def _finish_request(self, response):
+        started_at = g.pop('request_started_at', None)
+        if started_at is None:
+            return response
+        total = time.perf_counter() - started_at
+        route = _route()
+        self.request_duration.observe(total, route=route, method=request.method, status=str(response.status_code))
+        self.request_sql_duration.observe(g.sql_seconds, route=route, method=request.method)
+        # Lets the browser's network panel split database time from the rest
+        response.headers['Server-Timing'] = (
+            f'db;dur={g.sql_seconds * 1000:.1f}, app;dur={(total - g.sql_seconds) * 1000:.1f}'
+        )
+        return response
+
+    def metrics_view(self):
+        return Response(self.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,60 @@
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'migrations')
+
+# Migration files are named NNNN_description.sql and applied in order
+MIGRATION_FILE_PATTERN = re.compile(r'^\d{4}_[\w-]+\.sql$')
+
+
+def available_migrations(directory=MIGRATIONS_DIR):
+    return [
+        (filename[:-len('.sql')], os.path.join(directory, filename))
+        for filename in sorted(os.listdir(directory))
+        if MIGRATION_FILE_PATTERN.match(filename)
+    ]
+
+
+def applied_migrations(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+# Split a migration file into statements. Migrations keep to plain DDL/DML,
+# so full-line "--" comments and statement-ending semicolons are all that
+# needs handling.
+def split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def pending_migrations(connection, directory=MIGRATIONS_DIR):
+    with connection.cursor() as cursor:
+        applied = applied_migrations(cursor)
+    connection.commit()
+    return [(version, path) for version, path in available_migrations(directory) if version not in applied]
+
+
+# Apply every pending migration and record it in schema_migrations. MySQL
+# commits DDL implicitly, so a failing migration is not rolled back; fix the
+# cause and run it again. Returns the versions that were applied.
+def migrate(connection, directory=MIGRATIONS_DIR, on_apply=None):
+    applied = []
+    for version, path in pending_migrations(connection, directory):
+        if on_apply:
+            on_apply(version)
+        with open(path) as migration_file:
+            statements = split_statements(migration_file.read())
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+        connection.commit()
+        applied.append(version)
+    return applied
@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+
+class HashQueueFull(Exception):
+    pass
+
+
+# Worker functions run in the hashing processes. They report when they
+# started so the caller can tell queue wait apart from hashing time.
+def _hash_password(password, rounds):
+    started_at = time.time()
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)), started_at
+
+
+def _check_password(password, hashed):
+    started_at = time.time()
+    return bcrypt.checkpw(password, hashed), started_at
+
+
+class _Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_seconds': round(self.total, 6),
+            'avg_seconds': round(self.total / self.count, 6) if self.count else 0.0,
+            'max_seconds': round(self.max, 6)
+        }
+
+
+# Runs bcrypt on a bounded pool of worker processes so slow hashes use every
+# core and never tie up request threads' CPU. At most workers + max_queue
+# jobs are outstanding; further requests fail fast with HashQueueFull.
+# With workers=0 hashing runs inline on the calling thread.
+class PasswordHasher:
+    def __init__(self, rounds=12, workers=None, max_queue=32, observer=None):
+        self.rounds = rounds
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._outstanding = 0
+        self._rejected = 0
+        self._hash_timing = _Timing()
+        self._wait_timing = _Timing()
+        # Optional callable(operation, queue_wait, duration) fed every timing
+        self.observer = observer
+
+    def _get_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            # Worker processes are started lazily and per process, so a
+            # forked server worker never shares its parent's pool
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            submitted_at = time.time()
+            result, started_at = fn(*args)
+            self._record(fn, submitted_at, started_at)
+            return result
+
+        with self._lock:
+            if self._outstanding >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise HashQueueFull('Too many password operations in progress, please retry shortly')
+            self._outstanding += 1
+            executor = self._get_executor()
+        try:
+            submitted_at = time.time()
+            result, started_at = executor.submit(fn, *args).result()
+            self._record(fn, submitted_at, started_at)
+            return result
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+
+    def _record(self, fn, submitted_at, started_at):
+        finished_at = time.time()
+        wait = max(0.0, started_at - submitted_at)
+        duration = finished_at - max(started_at, submitted_at)
+        with self._lock:
+            self._wait_timing.observe(wait)
+            self._hash_timing.observe(duration)
+        if self.observer is not None:
+            self.observer('hash' if fn is _hash_password else 'check', wait, duration)
+
+    def hash(self, password):
+        return self._run(_hash_password, password.encode('utf-8'), self.rounds).decode('utf-8')
+
+    def check(self, password, hashed):
+        return self._run(_check_password, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    # True when a stored hash uses a different work factor than configured
+    def needs_rehash(self, hashed):
+        match = re.match(r'^\$2[abxy]?\$(\d{2})\$', hashed)
+        return not match or int(match.group(1)) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'outstanding': self._outstanding,
+                'rejected': self._rejected,
+                'hash': self._hash_timing.as_dict(),
+                'queue_wait': self._wait_timing.as_dict()
+            }
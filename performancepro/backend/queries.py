@@ -0,0 +1,394 @@
+import re
+from operator import itemgetter
+
+import pymysql
+
+# Read queries of the API routes and of the in-process caches behind them,
+# each defined once with the columns it returns, plus the single-row
+# lookups and writes routes run inside their write transactions. List
+# endpoints read rows as plain tuples (tuple_cursor) and turn them into
+# response objects with a decoder in a single pass, instead of building a
+# dict per row with DictCursor and then patching every row in Python
+# loops. Single-row lookups keep the connection's DictCursor.
+#
+# Every query and its declared variants are formatted when this module is
+# imported. validate() prepares each of them on the database server, which
+# catches renamed columns and tables before a request does; run it with
+# `flask --app app check-queries` (gunicorn does at startup).
+
+QUERIES = {}
+
+# SQL texts cached per query; ?fields= and filter combinations come from
+# the query string, so further combinations are formatted on every use
+MAX_CACHED_TEXTS = 256
+
+# Rows decoded and encoded to JSON at a time by encode_rows()
+ENCODE_CHUNK_SIZE = 100
+
+
+class Query:
+    __slots__ = ('name', 'columns', 'template', 'variants', '_texts')
+
+    def __init__(self, name, columns, template, variants=({},)):
+        self.name = name
+        # Output name -> SQL expression, in select order
+        self.columns = dict(column if isinstance(column, tuple) else (column, column) for column in columns)
+        # SQL with a {columns} slot for the select list and any other
+        # {slots} filled in per call
+        self.template = template
+        # Values of the other slots that warm() and validate() format
+        self.variants = variants
+        self._texts = {}
+
+    # SQL for a subset of the columns (default all) and values of the other
+    # slots
+    def text(self, columns=None, **parts):
+        key = (columns, tuple(sorted(parts.items())))
+        text = self._texts.get(key)
+        if text is None:
+            select = ', '.join(
+                name if self.columns[name] == name else f'{self.columns[name]} as {name}'
+                for name in (columns or self.columns)
+            )
+            text = self.template.format(columns=select, **parts)
+            if len(self._texts) < MAX_CACHED_TEXTS:
+                self._texts[key] = text
+        return text
+
+    def execute(self, cursor, params=None, columns=None, **parts):
+        cursor.execute(self.text(columns, **parts), params)
+        return cursor
+
+
+def register(name, columns, template, variants=({},)):
+    query = QUERIES[name] = Query(name, columns, template, variants)
+    return query
+
+
+# Cursor returning rows as tuples in select order, unbuffered when stream
+# is set
+def tuple_cursor(connection, stream=False):
+    return connection.cursor(pymysql.cursors.SSCursor if stream else pymysql.cursors.Cursor)
+
+
+def initials(name):
+    return ''.join([part[0].upper() for part in name.split()[:2]])
+
+
+# Fields holding a department name, read as a department id
+DEPARTMENT_NAME_FIELDS = ('department', 'department_name')
+
+
+# Decoder turning a tuple of the given columns into the JSON object of an
+# employee with the requested fields: department ids become names (read
+# from department_id when the field itself was not selected) and a missing
+# avatar becomes the initials of the name
+def employee_decoder(columns, fields, department_names):
+    position = {column: index for index, column in enumerate(columns)}
+    plain = [field for field in fields if field not in DEPARTMENT_NAME_FIELDS and field != 'avatar']
+    # itemgetter of one index returns the value itself, not a tuple
+    pick = itemgetter(*[position[field] for field in plain]) if len(plain) > 1 else None
+    single = position[plain[0]] if len(plain) == 1 else None
+    named = [(field, position.get(field, position.get('department_id'))) for field in fields
+             if field in DEPARTMENT_NAME_FIELDS]
+    avatar = position['avatar'] if 'avatar' in fields else None
+    name = position.get('name')
+
+    def decode(row):
+        if pick is not None:
+            employee = dict(zip(plain, pick(row)))
+        elif single is not None:
+            employee = {plain[0]: row[single]}
+        else:
+            employee = {}
+        for field, index in named:
+            employee[field] = department_names.get(row[index])
+        if avatar is not None:
+            employee['avatar'] = row[avatar] or initials(row[name])
+        return employee
+
+    return decode
+
+
+# JSON array of decoded rows as a stream of text chunks for a response
+# body. Rows are decoded and encoded ENCODE_CHUNK_SIZE at a time, so neither
+# every response object nor the whole body exist at once next to the
+# tuples. dumps is the app's JSON encoder.
+def encode_rows(dumps, rows, decode, chunk_size=ENCODE_CHUNK_SIZE):
+    separator = '['
+    for start in range(0, len(rows), chunk_size):
+        chunk = dumps([decode(row) for row in rows[start:start + chunk_size]], separators=(',', ':'))
+        yield separator + chunk[1:-1]
+        separator = ','
+    yield ']' if rows else '[]'
+
+
+# Format every declared variant of every query up front
+def warm():
+    for query in QUERIES.values():
+        for parts in query.variants:
+            query.text(**parts)
+
+
+def _prepared_form(text):
+    # pymysql's %s placeholders and %% escapes as server-side ? and %
+    return re.sub(r'%([s%])', lambda match: '?' if match.group(1) == 's' else '%', text)
+
+
+# Prepare every declared variant of every query on the server without
+# running it. Returns a list of failures.
+def validate(connection):
+    problems = []
+    with connection.cursor() as cursor:
+        for query in QUERIES.values():
+            for parts in query.variants:
+                try:
+                    cursor.execute("PREPARE performancepro_check FROM %s", (_prepared_form(query.text(**parts)),))
+                    cursor.execute("DEALLOCATE PREPARE performancepro_check")
+                except pymysql.MySQLError as e:
+                    problems.append({'query': query.name, 'variant': parts, 'error': str(e)})
+    return problems
+
+
+USER_LOGIN = register('user_login', ['id', 'username', 'password', 'role', 'name'], """
+    SELECT {columns} FROM users WHERE username = %s
+""")
+
+USER_ID_BY_USERNAME = register('user_id_by_username', ['id'], """
+    SELECT {columns} FROM users WHERE username = %s
+""")
+
+USER_ID_BY_EMAIL = register('user_id_by_email', ['id'], """
+    SELECT {columns} FROM users WHERE email = %s
+""")
+
+# Employee-level stats and rating distribution in a single scan, used
+# while the leaderboard is catching up
+DASHBOARD_STATS = register('dashboard_stats', [
+    ('total_employees', 'COUNT(*)'),
+    ('avg_rating', 'AVG(CASE WHEN review_count > 0 THEN customer_rating END)'),
+    ('rated_employees', 'SUM(CASE WHEN review_count > 0 THEN 1 ELSE 0 END)'),
+    ('rating_total', 'SUM(CASE WHEN review_count > 0 THEN customer_rating ELSE 0 END)'),
+    ('total_reviews', 'SUM(review_count)'),
+    ('five_star', 'SUM(CASE WHEN customer_rating >= 4.5 THEN 1 ELSE 0 END)'),
+    ('four_star', 'SUM(CASE WHEN customer_rating >= 3.5 AND customer_rating < 4.5 THEN 1 ELSE 0 END)'),
+    ('three_star', 'SUM(CASE WHEN customer_rating >= 2.5 AND customer_rating < 3.5 THEN 1 ELSE 0 END)'),
+    ('two_star', 'SUM(CASE WHEN customer_rating >= 1.5 AND customer_rating < 2.5 THEN 1 ELSE 0 END)'),
+    ('one_star', 'SUM(CASE WHEN customer_rating < 1.5 THEN 1 ELSE 0 END)')
+], """
+    SELECT {columns} FROM employees
+""")
+
+# GET /api/employees. Every field ?fields= can ask for; department and
+# department_name are read as the id and named from the department cache.
+EMPLOYEE_LIST = register('employee_list', [
+    ('id', 'e.id'),
+    ('name', 'e.name'),
+    ('department', 'e.department_id'),
+    ('department_id', 'e.department_id'),
+    ('position', 'e.position'),
+    ('email', 'e.email'),
+    ('phone', 'e.phone'),
+    ('join_date', 'e.join_date'),
+    ('avatar', 'e.avatar'),
+    ('customer_rating', 'e.customer_rating'),
+    ('review_count', 'e.review_count'),
+    ('department_name', 'e.department_id')
+], """
+    SELECT {columns}
+    FROM employees e
+    {where}
+    ORDER BY {order_by}
+    {limit}
+""", variants=(
+    {'where': '', 'order_by': 'e.id ASC', 'limit': ''},
+    {'where': 'WHERE e.department_id = %s AND e.customer_rating >= %s',
+     'order_by': 'e.customer_rating DESC, e.id DESC', 'limit': 'LIMIT %s'}
+))
+
+# Value of the ?sort= column for the employee ?after_id= points at; the
+# columns are named after the sorts
+EMPLOYEE_SORT_ANCHOR = register('employee_sort_anchor', [
+    ('id', 'e.id'),
+    ('name', 'e.name'),
+    ('rating', 'e.customer_rating'),
+    ('review_count', 'e.review_count')
+], """
+    SELECT {columns} FROM employees e WHERE e.id = %s
+""")
+
+EMPLOYEE_EXISTS = register('employee_exists', ['id'], """
+    SELECT {columns} FROM employees WHERE id = %s
+""")
+
+EMPLOYEE_ID_BY_EMAIL = register('employee_id_by_email', ['id'], """
+    SELECT {columns} FROM employees WHERE email = %s
+""")
+
+EMPLOYEE_DETAILS = register('employee_details', [
+    'id', 'name', 'department_id', 'position', 'email', 'phone', 'join_date', 'avatar',
+    'customer_rating', 'review_count', 'rating_sum'
+], """
+    SELECT {columns} FROM employees WHERE id = %s
+""")
+
+# An employee's rating, locking the row until the transaction ends
+EMPLOYEE_RATING_FOR_UPDATE = register('employee_rating_for_update', ['customer_rating', 'review_count'], """
+    SELECT {columns} FROM employees WHERE id = %s FOR UPDATE
+""")
+
+# An employee's months of the rating rollup from the given month on
+EMPLOYEE_ROLLUP_MONTHS = register('employee_rollup_months', [
+    ('year', 'YEAR(period)'),
+    ('month', 'MONTH(period)'),
+    'rating_sum',
+    'review_count'
+], """
+    SELECT {columns}
+    FROM monthly_ratings
+    WHERE employee_id = %s AND period >= %s
+""")
+
+# Every employee with what the leaderboard ranks them by
+LEADERBOARD_EMPLOYEES = register('leaderboard_employees', [
+    'id', 'name', 'department_id', 'customer_rating', 'review_count'
+], """
+    SELECT {columns} FROM employees
+""")
+
+# Every employee with the fields the search index tokenizes
+SEARCH_INDEX_EMPLOYEES = register('search_index_employees', [
+    ('id', 'e.id'),
+    ('name', 'e.name'),
+    ('position', 'e.position'),
+    ('department', 'd.name'),
+    ('email', 'e.email')
+], """
+    SELECT {columns}
+    FROM employees e
+    JOIN departments d ON d.id = e.department_id
+""")
+
+REVIEW_BEFORE_SQL = "AND (date < %s OR (date = %s AND id < %s))"
+
+# Newest-first page of an employee's reviews, keyed on (date, id)
+REVIEW_PAGE = register('review_page', [
+    'id', 'employee_id', 'customer_name', 'customer_email', 'rating', 'comment', 'date'
+], """
+    SELECT {columns}
+    FROM customer_reviews
+    WHERE employee_id = %s {before}
+    ORDER BY date DESC, id DESC
+    LIMIT %s
+""", variants=({'before': ''}, {'before': REVIEW_BEFORE_SQL}))
+
+REVIEW_STREAM = register('review_stream', [
+    'id', 'employee_id', 'customer_name', 'customer_email', 'rating', 'comment', 'date'
+], """
+    SELECT {columns}
+    FROM customer_reviews
+    WHERE employee_id = %s {before}
+    ORDER BY date DESC, id DESC
+""", variants=({'before': ''}, {'before': REVIEW_BEFORE_SQL}))
+
+# Average rating of the reviewed employees of each department
+DEPARTMENT_RATINGS = register('department_ratings', [
+    ('department_id', 'e.department_id'),
+    ('avg_rating', 'AVG(e.customer_rating)')
+], """
+    SELECT {columns}
+    FROM employees e
+    WHERE e.review_count > 0
+    GROUP BY e.department_id
+""")
+
+# Best rated employees with at least one review, overall or in one
+# department
+TOP_RATED = register('top_rated', ['id', 'name', 'department_id', 'customer_rating', 'review_count'], """
+    SELECT {columns}
+    FROM employees
+    WHERE review_count > 0 {department}
+    ORDER BY customer_rating DESC, review_count DESC, id DESC
+    LIMIT %s
+""", variants=({'department': ''}, {'department': 'AND department_id = %s'}))
+
+COUNT_RATED = register('count_rated', [('count', 'COUNT(*)')], """
+    SELECT {columns} FROM employees WHERE customer_rating >= %s {department}
+""", variants=({'department': ''}, {'department': 'AND department_id = %s'}))
+
+# Reviews whose comment matches a boolean mode FULLTEXT query, best first.
+# The query is passed twice: once for the score and once for the filter.
+SEARCH_REVIEWS = register('search_reviews', [
+    ('id', 'r.id'),
+    ('employee_id', 'r.employee_id'),
+    ('employee_name', 'e.name'),
+    ('customer_name', 'r.customer_name'),
+    ('rating', 'r.rating'),
+    ('comment', 'r.comment'),
+    ('date', 'r.date'),
+    ('score', 'MATCH(r.comment) AGAINST (%s IN BOOLEAN MODE)')
+], """
+    SELECT {columns}
+    FROM customer_reviews r
+    JOIN employees e ON e.id = r.employee_id
+    WHERE MATCH(r.comment) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY score DESC, r.id DESC
+    LIMIT %s
+""")
+
+# Average rating and review count per month from the monthly rollup
+RATING_TREND = register('rating_trend', [
+    ('year', 'YEAR(period)'),
+    ('month', 'MONTH(period)'),
+    ('avg_rating', 'SUM(rating_sum) / SUM(review_count)'),
+    ('review_count', 'SUM(review_count)')
+], """
+    SELECT {columns}
+    FROM monthly_ratings
+    WHERE period >= %s
+    GROUP BY period
+    ORDER BY period
+""")
+
+# Employees found by the search index, read by primary key
+SEARCH_EMPLOYEES = register('search_employees', [
+    ('id', 'e.id'),
+    ('name', 'e.name'),
+    ('department_id', 'e.department_id'),
+    ('position', 'e.position'),
+    ('email', 'e.email'),
+    ('avatar', 'e.avatar'),
+    ('customer_rating', 'e.customer_rating'),
+    ('review_count', 'e.review_count')
+], """
+    SELECT {columns}
+    FROM employees e
+    WHERE e.id IN ({placeholders})
+""", variants=({'placeholders': '%s'}, {'placeholders': '%s, %s'}))
+
+# Store a password hash; statements without a result have no columns
+USER_PASSWORD_UPDATE = register('user_password_update', [], """
+    UPDATE users SET password = %s WHERE id = %s
+""")
+
+USER_INSERT = register('user_insert', [], """
+    INSERT INTO users (name, username, email, password, role)
+    VALUES (%s, %s, %s, %s, %s)
+""")
+
+EMPLOYEE_INSERT = register('employee_insert', [], """
+    INSERT INTO employees (name, department_id, position, email, phone, join_date, avatar)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+""")
+
+# Reviews go with the employee (ON DELETE CASCADE)
+EMPLOYEE_DELETE = register('employee_delete', [], """
+    DELETE FROM employees WHERE id = %s
+""")
+
+REVIEW_INSERT = register('review_insert', [], """
+    INSERT INTO customer_reviews (employee_id, customer_name, customer_email, rating, comment, date)
+    VALUES (%s, %s, %s, %s, %s, %s)
+""")
+
+warm()
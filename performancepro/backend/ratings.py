@@ -0,0 +1,114 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Employees keep a running rating_sum and review_count next to the stored
+# customer_rating, so a new review is folded in with O(1) work instead of
+# re-aggregating every review the employee has ever received.
+#
+# MySQL applies single-table SET assignments left to right, so
+# customer_rating below is computed from the already updated sum and count.
+APPLY_RATING_DELTA_SQL = """
+    UPDATE employees
+    SET
+        rating_sum = rating_sum + %s,
+        review_count = review_count + %s,
+        customer_rating = CASE
+            WHEN review_count > 0 THEN ROUND(rating_sum / review_count, 1)
+            ELSE 0.0
+        END
+    WHERE id = %s
+"""
+
+# Rebuild one employee's stored values from customer_reviews
+RECOMPUTE_RATING_SQL = """
+    UPDATE employees
+    SET
+        rating_sum = (
+            SELECT COALESCE(SUM(rating), 0)
+            FROM customer_reviews
+            WHERE employee_id = %s
+        ),
+        review_count = (
+            SELECT COUNT(*)
+            FROM customer_reviews
+            WHERE employee_id = %s
+        ),
+        customer_rating = CASE
+            WHEN review_count > 0 THEN ROUND(rating_sum / review_count, 1)
+            ELSE 0.0
+        END
+    WHERE id = %s
+"""
+
+DRIFT_QUERY_SQL = """
+    SELECT
+        e.id,
+        e.rating_sum,
+        e.review_count,
+        e.customer_rating,
+        COALESCE(r.rating_sum, 0) as actual_sum,
+        COALESCE(r.review_count, 0) as actual_count
+    FROM employees e
+    LEFT JOIN (
+        SELECT employee_id, SUM(rating) as rating_sum, COUNT(*) as review_count
+        FROM customer_reviews
+        GROUP BY employee_id
+    ) r ON r.employee_id = e.id
+"""
+
+
+# Add rating_sum/review_count to an employee inside the caller's transaction.
+# Returns False when the employee does not exist.
+def apply_rating_delta(cursor, employee_id, rating_sum, review_count):
+    cursor.execute(APPLY_RATING_DELTA_SQL, (rating_sum, review_count, employee_id))
+    return cursor.rowcount > 0
+
+
+def apply_review(cursor, employee_id, rating):
+    return apply_rating_delta(cursor, employee_id, rating, 1)
+
+
+# Average rounded the same way MySQL computes ROUND(rating_sum /
+# review_count, 1): the quotient of two integers first gets 4 decimals
+# (div_precision_increment), and that value is rounded to one
+def expected_rating(rating_sum, review_count):
+    if not review_count:
+        return Decimal('0.0')
+    average = Decimal(int(rating_sum)) / Decimal(int(review_count))
+    average = average.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
+    return average.quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+# Compare stored ratings with customer_reviews and optionally repair them.
+# Returns a list of drifted employees with their stored and actual values.
+def reconcile_ratings(connection, fix=True):
+    drift = []
+    with connection.cursor() as cursor:
+        cursor.execute(DRIFT_QUERY_SQL)
+        for row in cursor.fetchall():
+            actual_rating = expected_rating(row['actual_sum'], row['actual_count'])
+            stored_rating = Decimal(row['customer_rating'] or 0)
+            if (int(row['rating_sum']) != int(row['actual_sum'])
+                    or int(row['review_count']) != int(row['actual_count'])
+                    or stored_rating != actual_rating):
+                drift.append({
+                    'employee_id': row['id'],
+                    'stored': {
+                        'rating_sum': int(row['rating_sum']),
+                        'review_count': int(row['review_count']),
+                        'customer_rating': float(stored_rating)
+                    },
+                    'actual': {
+                        'rating_sum': int(row['actual_sum']),
+                        'review_count': int(row['actual_count']),
+                        'customer_rating': float(actual_rating)
+                    }
+                })
+
+        if fix and drift:
+            cursor.executemany(RECOMPUTE_RATING_SQL, [
+                (item['employee_id'], item['employee_id'], item['employee_id'])
+                for item in drift
+            ])
+    if fix:
+        connection.commit()
+    return drift
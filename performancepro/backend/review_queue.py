@@ -0,0 +1,348 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+
+import pymysql
+
+from bulk_import import INSERT_REVIEWS_SQL, apply_review_totals
+from data_versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+# Write-behind ingestion of customer reviews. A validated review is
+# appended to a local SQLite file and acknowledged straight away; a
+# background batcher in each server process claims groups of pending
+# reviews and writes them to MySQL with one multi-row INSERT, one rating
+# update per affected employee and one commit per group.
+#
+# Every worker process of a server shares the same queue file. A batch is
+# claimed under a random id, and that id is recorded in MySQL in the same
+# transaction as the reviews. A claim left behind by a crashed process is
+# taken over after claim_timeout seconds, and the id tells whether its
+# reviews had already been committed, so none is written twice.
+#
+# A review MySQL refuses (a constraint or a value that does not fit) would
+# fail every retry of its batch and hold up the queue behind it. Such a
+# batch is written again one review at a time, and the refused reviews are
+# moved to a dead_reviews table in the queue file with the error. So are
+# queued payloads that can no longer be decoded into a review.
+
+QUEUE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pending_reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        payload TEXT NOT NULL,
+        enqueued_at REAL NOT NULL,
+        batch_id TEXT,
+        claimed_at REAL
+    )
+"""
+
+QUEUE_INDEX = "CREATE INDEX IF NOT EXISTS idx_pending_reviews_batch ON pending_reviews (batch_id)"
+
+DEAD_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS dead_reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        payload TEXT NOT NULL,
+        enqueued_at REAL NOT NULL,
+        error TEXT NOT NULL,
+        failed_at REAL NOT NULL
+    )
+"""
+
+RECORD_BATCH_SQL = "INSERT INTO review_ingest_batches (batch_id, review_count) VALUES (%s, %s)"
+
+# Batch ids only matter while a claim can still be taken over
+PRUNE_BATCHES_SQL = "DELETE FROM review_ingest_batches WHERE flushed_at < NOW() - INTERVAL 1 DAY"
+
+
+# The INSERT_REVIEWS_SQL row of one queued payload. Raises ValueError,
+# KeyError or TypeError when the payload is not a well-formed review.
+def decode_review(payload):
+    review = json.loads(payload)
+    return (
+        review['employee_id'],
+        review['customer_name'],
+        review['customer_email'],
+        review['rating'],
+        review['comment'],
+        date.fromisoformat(review['date'])
+    )
+
+
+class ReviewQueue:
+    def __init__(self, path, connection_factory, flush_size=500, flush_interval=1.0, claim_timeout=60.0,
+                 on_flush=None):
+        self.path = path
+        self.connection_factory = connection_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.claim_timeout = claim_timeout
+        # Optional callable(flushed_reviews, delays) run after each commit
+        self.on_flush = on_flush
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._unflushed = 0
+        self._next_prune = 0.0
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.dead = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error = None
+
+    def _db(self):
+        # sqlite3 connections may not be shared between threads or
+        # processes, so each thread of each process opens its own
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # WAL lets enqueues proceed while a batcher reads the queue
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(QUEUE_SCHEMA)
+            db.execute(QUEUE_INDEX)
+            db.execute(DEAD_SCHEMA)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    # Start this process's batcher unless it is running. Safe to call on
+    # every request: the thread is started lazily and again after a fork.
+    def ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            self._unflushed = 0
+            self._thread = threading.Thread(target=self._run, name='review-queue', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    # Durably append one validated review (a dict with employee_id,
+    # customer_name, customer_email, rating, comment and date)
+    def enqueue(self, review):
+        self.ensure_started()
+        payload = json.dumps(review, default=str)
+        self._db().execute(
+            "INSERT INTO pending_reviews (payload, enqueued_at) VALUES (?, ?)",
+            (payload, time.time())
+        )
+        with self._lock:
+            self.enqueued += 1
+            self._unflushed += 1
+            full = self._unflushed >= self.flush_size
+        if full:
+            self._wakeup.set()
+
+    def _claim(self):
+        # Take over one stale batch if there is one, otherwise claim up to
+        # flush_size unclaimed reviews under a new batch id
+        now = time.time()
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                "SELECT batch_id FROM pending_reviews WHERE batch_id IS NOT NULL AND claimed_at < ? LIMIT 1",
+                (now - self.claim_timeout,)
+            ).fetchone()
+            if row is not None:
+                batch_id, recovered = row[0], True
+                db.execute("UPDATE pending_reviews SET claimed_at = ? WHERE batch_id = ?", (now, batch_id))
+            else:
+                batch_id, recovered = uuid.uuid4().hex, False
+                db.execute("""
+                    UPDATE pending_reviews SET batch_id = ?, claimed_at = ?
+                    WHERE id IN (SELECT id FROM pending_reviews WHERE batch_id IS NULL ORDER BY id LIMIT ?)
+                """, (batch_id, now, self.flush_size))
+            rows = db.execute(
+                "SELECT payload, enqueued_at FROM pending_reviews WHERE batch_id = ? ORDER BY id",
+                (batch_id,)
+            ).fetchall()
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return batch_id, recovered, rows
+
+    def _abandon(self, batch_id):
+        # Keep the batch id but make the claim stale, so the retry first
+        # checks whether the failed commit went through after all
+        self._db().execute("UPDATE pending_reviews SET claimed_at = 0 WHERE batch_id = ?", (batch_id,))
+
+    # Remove a written batch from the queue, moving its refused reviews
+    # (payload, enqueued_at, error) to dead_reviews
+    def _delete(self, batch_id, refused=()):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            failed_at = time.time()
+            db.executemany(
+                "INSERT INTO dead_reviews (payload, enqueued_at, error, failed_at) VALUES (?, ?, ?, ?)",
+                [(payload, enqueued_at, error, failed_at) for payload, enqueued_at, error in refused]
+            )
+            db.execute("DELETE FROM pending_reviews WHERE batch_id = ?", (batch_id,))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    # One transaction: drop reviews of employees deleted since they were
+    # queued, insert the rest, fold them into ratings and rollups. With
+    # one_by_one every review is inserted behind its own savepoint, and
+    # those MySQL refuses are left out. Returns the written rows and
+    # (position, error) for each refused review.
+    def _write(self, connection, batch_id, values, one_by_one=False):
+        employee_ids = sorted({row[0] for row in values})
+        with connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(employee_ids))
+            cursor.execute(
+                f"SELECT id, department_id FROM employees WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE",
+                employee_ids
+            )
+            existing = {row['id']: row['department_id'] for row in cursor.fetchall()}
+            kept = [(position, row) for position, row in enumerate(values) if row[0] in existing]
+            refused = []
+            if one_by_one:
+                values = []
+                for position, row in kept:
+                    cursor.execute("SAVEPOINT queued_review")
+                    try:
+                        cursor.execute(INSERT_REVIEWS_SQL, row)
+                        values.append(row)
+                    except (pymysql.IntegrityError, pymysql.DataError) as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT queued_review")
+                        refused.append((position, str(e)))
+            else:
+                values = [row for _, row in kept]
+                if values:
+                    cursor.executemany(INSERT_REVIEWS_SQL, values)
+        if values:
+            apply_review_totals(connection, values, existing)
+        with connection.cursor() as cursor:
+            cursor.execute(RECORD_BATCH_SQL, (batch_id, len(values)))
+            if values:
+                bump_versions(cursor, 'employees', 'reviews')
+        connection.commit()
+        return values, refused
+
+    # Claim and write one batch; returns how many queued reviews it took
+    def flush_once(self):
+        batch_id, recovered, claimed = self._claim()
+        if not claimed:
+            return 0
+        # A payload that cannot be decoded would fail every retry, so it is
+        # refused here like a review MySQL refuses
+        positions, values, refused = [], [], []
+        for position, (payload, _) in enumerate(claimed):
+            try:
+                values.append(decode_review(payload))
+                positions.append(position)
+            except (ValueError, KeyError, TypeError) as e:
+                refused.append((position, f'undecodable payload: {e!r}'))
+        connection = self.connection_factory()
+        started_at = time.monotonic()
+        try:
+            if recovered:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1 FROM review_ingest_batches WHERE batch_id = %s", (batch_id,))
+                    already_written = cursor.fetchone() is not None
+                if already_written:
+                    # The previous owner committed but died before cleaning up
+                    self._delete(batch_id)
+                    return len(claimed)
+            try:
+                written, refused_by_mysql = self._write(connection, batch_id, values) if values else ([], [])
+            except (pymysql.IntegrityError, pymysql.DataError) as e:
+                logger.warning('batch %s was refused (%s); writing its reviews one at a time', batch_id, e)
+                connection.rollback()
+                written, refused_by_mysql = self._write(connection, batch_id, values, one_by_one=True)
+        except Exception as e:
+            connection.rollback()
+            self._abandon(batch_id)
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+            raise
+        finally:
+            connection.close()
+        refused += [(positions[position], error) for position, error in refused_by_mysql]
+        refused = [(claimed[position][0], claimed[position][1], error) for position, error in sorted(refused)]
+        for _, _, error in refused:
+            logger.error('moved a queued review to dead_reviews: %s', error)
+        self._delete(batch_id, refused)
+
+        flushed_at = time.time()
+        delays = [flushed_at - enqueued_at for _, enqueued_at in claimed]
+        with self._lock:
+            self.flushed += len(written)
+            self.dead += len(refused)
+            self.dropped += len(claimed) - len(written) - len(refused)
+            self.batches += 1
+            self._unflushed = max(0, self._unflushed - len(claimed))
+        logger.debug('flushed %d queued reviews in %.3fs', len(written), time.monotonic() - started_at)
+        if self.on_flush is not None:
+            self.on_flush(written, delays)
+        return len(claimed)
+
+    def _prune(self):
+        if time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + 3600
+        connection = self.connection_factory()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(PRUNE_BATCHES_SQL)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _run(self):
+        while True:
+            try:
+                # Keep going while full batches are waiting
+                while self.flush_once() >= self.flush_size:
+                    pass
+                self._prune()
+            except Exception:
+                logger.exception('flushing queued reviews failed; retrying in %ss', self.flush_interval)
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+    # Reviews waiting in the queue file and the age of the oldest one, for
+    # every process sharing it
+    def lag(self):
+        count, oldest = self._db().execute("SELECT COUNT(*), MIN(enqueued_at) FROM pending_reviews").fetchone()
+        return count, (time.time() - oldest) if oldest is not None else 0.0
+
+    # Reviews moved to dead_reviews, by every process sharing the file
+    def dead_letters(self):
+        return self._db().execute("SELECT COUNT(*) FROM dead_reviews").fetchone()[0]
+
+    def stats(self):
+        pending, lag_seconds = self.lag()
+        dead_letters = self.dead_letters()
+        with self._lock:
+            return {
+                'pending': pending,
+                'lag_seconds': round(lag_seconds, 3),
+                'dead_letters': dead_letters,
+                'enqueued': self.enqueued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'dead': self.dead,
+                'batches': self.batches,
+                'failures': self.failures,
+                'last_error': self.last_error,
+                'flush_size': self.flush_size,
+                'flush_interval': self.flush_interval
+            }
@@ -0,0 +1,75 @@
+from datetime import date
+
+from queries import RATING_TREND
+
+# monthly_ratings holds one row per (month, employee) with the rating sum and
+# count of the reviews received that month, so trend charts aggregate a few
+# rows per month instead of every review. period is the first of the month.
+
+# Callers pass the employee's department id in, rather than this statement
+# looking it up, so pymysql's executemany can send a whole batch as one
+# multi-row INSERT
+APPLY_ROLLUP_SQL = """
+    INSERT INTO monthly_ratings (period, employee_id, department_id, rating_sum, review_count)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        rating_sum = rating_sum + VALUES(rating_sum),
+        review_count = review_count + VALUES(review_count)
+"""
+
+REBUILD_ROLLUP_SQL = """
+    INSERT INTO monthly_ratings (period, employee_id, department_id, rating_sum, review_count)
+    SELECT
+        DATE_FORMAT(r.date, '%Y-%m-01'),
+        r.employee_id,
+        e.department_id,
+        SUM(r.rating),
+        COUNT(*)
+    FROM customer_reviews r
+    JOIN employees e ON e.id = r.employee_id
+    GROUP BY DATE_FORMAT(r.date, '%Y-%m-01'), r.employee_id, e.department_id
+"""
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+# First day of the oldest month in a window of `months` calendar months
+# ending with the current one
+def trend_start(months, today=None):
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - (months - 1)
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+# Add reviews to an employee's month inside the caller's transaction
+def apply_to_rollup(cursor, employee_id, department_id, review_date, rating_sum, review_count=1):
+    cursor.execute(APPLY_ROLLUP_SQL, (
+        month_start(review_date), employee_id, department_id, rating_sum, review_count
+    ))
+
+
+# Recreate monthly_ratings from customer_reviews in one transaction; readers
+# keep seeing the previous contents until it commits
+def rebuild_rollups(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM monthly_ratings")
+        cursor.execute(REBUILD_ROLLUP_SQL)
+        rows = cursor.rowcount
+    connection.commit()
+    return rows
+
+
+# Average rating per month for the last `months` calendar months
+def rating_trend(cursor, months=6):
+    RATING_TREND.execute(cursor, (trend_start(months),))
+    return [
+        {
+            'year': row['year'],
+            'month': row['month'],
+            'avg_rating': float(row['avg_rating']),
+            'review_count': int(row['review_count'])
+        }
+        for row in cursor.fetchall()
+    ]
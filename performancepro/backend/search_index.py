@@ -0,0 +1,275 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from heapq import nlargest
+from itertools import islice
+from operator import itemgetter
+
+from queries import SEARCH_INDEX_EMPLOYEES, SEARCH_REVIEWS
+
+# In-process inverted index over employee names, positions, departments and
+# emails. Every token maps to the employees containing it with a per-field
+# weight, and a sorted token list turns prefix lookups into a bisect, so
+# ranked search and autocomplete take a few milliseconds at 100k employees
+# without touching MySQL. Matching rows are then hydrated by primary key.
+
+# Field weights: a hit in the name counts more than one in the email
+FIELD_WEIGHTS = (('name', 3.0), ('position', 2.0), ('department', 1.5), ('email', 1.0))
+
+# Query tokens shorter than this only match whole tokens, so one letter
+# does not expand to most of the index
+MIN_PREFIX_LENGTH = 2
+
+# A prefix expands to at most this many index tokens (the alphabetically
+# first ones), which bounds the cost of prefixes such as 'user1'
+MAX_PREFIX_EXPANSIONS = 200
+
+EXACT_MATCH_BONUS = 2.0
+
+# Recent results kept per process; any change to the index clears them
+RESULT_CACHE_SIZE = 256
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+# Only the part of an email before the @ is indexed; the domain is the same
+# for almost everyone and would match every employee
+def email_tokens(email):
+    return tokenize((email or '').split('@', 1)[0])
+
+
+def query_tokenize(query):
+    if '@' in (query or ''):
+        return email_tokens(query)
+    return tokenize(query)
+
+
+class EmployeeSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # token -> {employee_id: weight}
+        self._postings = {}
+        # token -> {weight: {employee_id: None}}, so the best matches of a
+        # single token can be read without scanning all of its postings
+        self._ranked = {}
+        self._tokens = []
+        # employee_id -> (summary dict, tokens)
+        self._documents = {}
+        self.version = None
+        self._rebuilding = False
+        # (query, limit) -> results, least recently used first
+        self._results = OrderedDict()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _add(self, row, keep_sorted=True):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in (email_tokens if field == 'email' else tokenize)(row.get(field)):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if keep_sorted:
+                    insort(self._tokens, token)
+            postings[row['id']] = weight
+            self._ranked.setdefault(token, {}).setdefault(weight, {})[row['id']] = None
+        summary = {field: row.get(field) for field in ('id', 'name', 'position', 'department')}
+        self._documents[row['id']] = (summary, tuple(weights))
+
+    def _remove(self, employee_id):
+        document = self._documents.pop(employee_id, None)
+        if document is None:
+            return
+        for token in document[1]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            weight = postings.pop(employee_id, None)
+            ranked = self._ranked[token]
+            if weight is not None:
+                ranked[weight].pop(employee_id, None)
+                if not ranked[weight]:
+                    del ranked[weight]
+            if not postings:
+                del self._postings[token]
+                del self._ranked[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+
+    def _advance(self, version):
+        # An index that was current before a write made by this process is
+        # current after applying it, and needs no rebuild
+        if version is not None and self.version == version - 1:
+            self.version = version
+
+    def add(self, row, version=None):
+        with self._lock:
+            self._remove(row['id'])
+            self._add(row)
+            self._results.clear()
+            self._advance(version)
+
+    def remove(self, employee_id, version=None):
+        with self._lock:
+            self._remove(employee_id)
+            self._results.clear()
+            self._advance(version)
+
+    # Replace the whole index with rows from the employees table
+    def load(self, rows, version=None):
+        fresh = EmployeeSearchIndex()
+        for row in rows:
+            fresh._add(row, keep_sorted=False)
+        tokens = sorted(fresh._postings)
+        with self._lock:
+            self._postings, self._ranked = fresh._postings, fresh._ranked
+            self._tokens, self._documents = tokens, fresh._documents
+            self._results.clear()
+            self.version = version
+
+    def rebuild(self, connection, version=None):
+        with connection.cursor() as cursor:
+            SEARCH_INDEX_EMPLOYEES.execute(cursor)
+            rows = cursor.fetchall()
+        self.load(rows, version)
+
+    # Bring the index up to date with the given data version. The first
+    # build happens inline; later ones run in the background while the
+    # current index keeps answering.
+    def ensure_current(self, version, connection_factory):
+        with self._lock:
+            if self.version == version or self._rebuilding:
+                return
+            first_build = self.version is None
+            self._rebuilding = True
+
+        def rebuild():
+            try:
+                connection = connection_factory()
+                try:
+                    self.rebuild(connection, version)
+                finally:
+                    connection.close()
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+
+        if first_build:
+            rebuild()
+        else:
+            threading.Thread(target=rebuild, name='search-index-rebuild', daemon=True).start()
+
+    def _expand(self, token, prefix):
+        # Index tokens a query token matches: itself, plus longer tokens
+        # when it may be a prefix
+        if not prefix or len(token) < MIN_PREFIX_LENGTH:
+            return [token] if token in self._postings else []
+        start = bisect_left(self._tokens, token)
+        matches = []
+        for candidate in islice(self._tokens, start, start + MAX_PREFIX_EXPANSIONS):
+            if not candidate.startswith(token):
+                break
+            matches.append(candidate)
+        return matches
+
+    # Ranked (employee_id, score) pairs matching every query token. The
+    # last token is treated as a prefix, so results update while the user
+    # types. Results are cached until the index changes.
+    def search(self, query, limit=20):
+        query_tokens = query_tokenize(query)
+        if not query_tokens:
+            return []
+        key = (' '.join(query_tokens), limit)
+        with self._lock:
+            results = self._results.get(key)
+            if results is None:
+                results = self._search(query_tokens, limit)
+                self._results[key] = results
+                while len(self._results) > RESULT_CACHE_SIZE:
+                    self._results.popitem(last=False)
+            else:
+                self._results.move_to_end(key)
+            return list(results)
+
+    # Scoring starts from the rarest token and only looks up the remaining
+    # candidates in the other tokens' postings
+    def _search(self, query_tokens, limit):
+        expansions = []
+        for position, token in enumerate(query_tokens):
+            candidates = self._expand(token, prefix=position == len(query_tokens) - 1)
+            if not candidates:
+                return []
+            matches = [(candidate, EXACT_MATCH_BONUS if candidate == token else 1.0)
+                       for candidate in candidates]
+            expansions.append((sum(len(self._postings[candidate]) for candidate in candidates), matches))
+        expansions.sort(key=itemgetter(0))
+
+        if len(expansions) == 1:
+            return self._top_single(expansions[0][1], limit)
+
+        scores = {}
+        for candidate, bonus in expansions[0][1]:
+            for employee_id, weight in self._postings[candidate].items():
+                if weight * bonus > scores.get(employee_id, 0.0):
+                    scores[employee_id] = weight * bonus
+        for _, matches in expansions[1:]:
+            best = {}
+            for candidate, bonus in matches:
+                postings = self._postings[candidate]
+                for employee_id in scores.keys() & postings.keys():
+                    if postings[employee_id] * bonus > best.get(employee_id, 0.0):
+                        best[employee_id] = postings[employee_id] * bonus
+            if not best:
+                return []
+            scores = {employee_id: scores[employee_id] + weight for employee_id, weight in best.items()}
+        return nlargest(limit, scores.items(), key=itemgetter(1))
+
+    def _top_single(self, matches, limit):
+        # With one query token an employee's score is its best weight for
+        # any matching index token, so only the first `limit` employees of
+        # each index token's highest weights can make the top `limit`
+        scores = {}
+        for candidate, bonus in matches:
+            taken = 0
+            for weight, employee_ids in sorted(self._ranked[candidate].items(), reverse=True):
+                for employee_id in islice(employee_ids, limit - taken):
+                    if weight * bonus > scores.get(employee_id, 0.0):
+                        scores[employee_id] = weight * bonus
+                taken += min(len(employee_ids), limit - taken)
+                if taken >= limit:
+                    break
+        return nlargest(limit, scores.items(), key=itemgetter(1))
+
+    # Employee summaries for a search-as-you-type box, served from memory
+    def autocomplete(self, query, limit=10):
+        results = self.search(query, limit)
+        with self._lock:
+            return [dict(self._documents[employee_id][0]) for employee_id, _ in results
+                    if employee_id in self._documents]
+
+
+# Review comments are searched with MySQL's FULLTEXT index instead: there
+# are far too many to keep in every process. Words are combined with AND
+# and each may be a prefix. InnoDB ignores words shorter than
+# innodb_ft_min_token_size (3 by default).
+def fulltext_query(query, min_length=3):
+    words = [token for token in tokenize(query) if len(token) >= min_length]
+    return ' '.join(f'+{word}*' for word in words)
+
+
+def search_reviews(cursor, query, limit=20):
+    terms = fulltext_query(query)
+    if not terms:
+        return []
+    SEARCH_REVIEWS.execute(cursor, (terms, terms, limit))
+    reviews = cursor.fetchall()
+    for review in reviews:
+        review['score'] = round(float(review['score']), 4)
+    return reviews
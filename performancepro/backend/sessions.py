@@ -0,0 +1,250 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Server-side sessions. The cookie only carries a signed, random session id;
+# the session data lives in a store shared by every worker (Redis, or an
+# in-process stand-in for a single process). A small LRU in each process
+# answers most lookups, so login_required and the role checks never leave
+# the process for a hot session.
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        # Set by regenerate() so the previous id can be deleted on save
+        self.replaced_sid = None
+
+    # Move the session to a new id, e.g. after login, so an id obtained
+    # before authenticating cannot be reused afterwards
+    def regenerate(self):
+        if not self.new and self.replaced_sid is None:
+            self.replaced_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+# Session store kept in this process. Sessions are lost on restart and are
+# not shared between worker processes; use RedisSessionStore for that.
+class MemorySessionStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._user_sessions = {}
+        self._next_sweep = 0.0
+
+    def _sweep(self, now):
+        # Drop expired sessions that were never read again, once a minute
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + 60
+        for sid in [sid for sid, (_, _, expires_at) in self._sessions.items() if expires_at <= now]:
+            self._remove(sid)
+
+    def _remove(self, sid):
+        entry = self._sessions.pop(sid, None)
+        if entry is not None and entry[1] is not None:
+            sids = self._user_sessions.get(entry[1])
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._user_sessions[entry[1]]
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                self._remove(sid)
+                return None
+            return entry[0]
+
+    def set(self, sid, payload, user_id, ttl):
+        with self._lock:
+            now = time.monotonic()
+            self._sweep(now)
+            self._remove(sid)
+            self._sessions[sid] = (payload, user_id, now + ttl)
+            if user_id is not None:
+                self._user_sessions.setdefault(user_id, set()).add(sid)
+
+    def delete(self, sid):
+        with self._lock:
+            self._remove(sid)
+
+    # Delete every session of a user; returns their ids
+    def delete_user(self, user_id):
+        with self._lock:
+            sids = list(self._user_sessions.get(user_id, ()))
+            for sid in sids:
+                self._remove(sid)
+            return sids
+
+
+# Session store in Redis, shared by every worker and node. Each user has a
+# set of their session ids so all of them can be revoked at once.
+class RedisSessionStore:
+    def __init__(self, url, prefix='performancepro:'):
+        if redis is None:
+            raise RuntimeError('SESSION_BACKEND=redis requires the redis package (pip install redis)')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, sid):
+        return f'{self.prefix}session:{sid}'
+
+    def _user_key(self, user_id):
+        return f'{self.prefix}user_sessions:{user_id}'
+
+    def get(self, sid):
+        payload = self.client.get(self._key(sid))
+        return payload.decode('utf-8') if payload is not None else None
+
+    def set(self, sid, payload, user_id, ttl):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(sid), payload, ex=int(ttl))
+        if user_id is not None:
+            pipe.sadd(self._user_key(user_id), sid)
+            pipe.expire(self._user_key(user_id), int(ttl))
+        pipe.execute()
+
+    def delete(self, sid):
+        self.client.delete(self._key(sid))
+
+    def delete_user(self, user_id):
+        sids = [sid.decode('utf-8') for sid in self.client.smembers(self._user_key(user_id))]
+        if sids:
+            self.client.delete(*[self._key(sid) for sid in sids])
+        self.client.delete(self._user_key(user_id))
+        return sids
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, lifetime=43200, local_cache_size=10000, local_cache_ttl=5.0):
+        self.store = store
+        self.lifetime = lifetime
+        self.local_cache_size = local_cache_size
+        # Seconds a session read from the shared store is trusted locally.
+        # A revocation made by another process takes effect within this time.
+        self.local_cache_ttl = local_cache_ttl
+        self._lock = threading.Lock()
+        # sid -> (data, cached_at), least recently used first
+        self._local = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='performancepro-session')
+
+    def _cache_get(self, sid):
+        with self._lock:
+            entry = self._local.get(sid)
+            if entry is None or time.monotonic() - entry[1] >= self.local_cache_ttl:
+                self._local.pop(sid, None)
+                self.misses += 1
+                return None
+            self._local.move_to_end(sid)
+            self.hits += 1
+            return entry[0]
+
+    def _cache_set(self, sid, data):
+        if self.local_cache_size <= 0:
+            return
+        with self._lock:
+            self._local[sid] = (dict(data), time.monotonic())
+            self._local.move_to_end(sid)
+            while len(self._local) > self.local_cache_size:
+                self._local.popitem(last=False)
+
+    def _cache_drop(self, *sids):
+        with self._lock:
+            for sid in sids:
+                self._local.pop(sid, None)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('utf-8')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self._cache_get(sid)
+                if data is None:
+                    payload = self.store.get(sid)
+                    if payload is not None:
+                        data = self.serializer.loads(payload)
+                        self._cache_set(sid, data)
+                if data is not None:
+                    return ServerSideSession(dict(data), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.replaced_sid is not None:
+            self.store.delete(session.replaced_sid)
+            self._cache_drop(session.replaced_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                self._cache_drop(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.modified:
+            return
+
+        self.store.set(session.sid, self.serializer.dumps(dict(session)), session.get('user_id'), self.lifetime)
+        self._cache_set(session.sid, session)
+        response.vary.add('Cookie')
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode('utf-8')).decode('utf-8'),
+            max_age=self.lifetime if session.permanent else None,
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    # Log a user out everywhere; returns how many sessions were revoked
+    def revoke_user(self, user_id):
+        sids = self.store.delete_user(user_id)
+        self._cache_drop(*sids)
+        return len(sids)
+
+    def stats(self):
+        with self._lock:
+            local = len(self._local)
+            hits, misses = self.hits, self.misses
+        return {
+            'store': type(self.store).__name__,
+            'local_cached': local,
+            'local_hits': hits,
+            'local_misses': misses,
+            'lifetime_seconds': self.lifetime
+        }
@@ -0,0 +1,8 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The connection pool, password hashing workers and in-process caches are
+# created per process on first use, so the app can be imported once in the
+# gunicorn master (preload_app) and forked into workers safely.
+from app import app
+
+__all__ = ['app']
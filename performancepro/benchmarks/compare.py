@@ -0,0 +1,80 @@
+"""Compare two loadtest.py result files route by route.
+
+Prints throughput and latency percentiles side by side and exits with
+status 1 when any route's p95 got slower by more than --threshold percent,
+so it can gate a change in CI.
+
+    python benchmarks/compare.py results/before.json results/after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def change(before, after):
+    if before is None or after is None or before == 0:
+        return None
+    return (after - before) / before * 100
+
+
+def format_change(value):
+    return '' if value is None else f'{value:+.1f}%'
+
+
+# Print both runs side by side; returns the routes whose p95 regressed
+# by more than threshold percent
+def print_comparison(before, after, threshold=10.0):
+    print(f"before: {before.get('commit')} {before.get('label') or ''}".rstrip())
+    print(f"after:  {after.get('commit')} {after.get('label') or ''}".rstrip())
+    if before.get('workload') != after.get('workload') or before.get('users') != after.get('users'):
+        print('warning: results come from different workloads or user counts')
+    print()
+
+    header = f"{'route':<40}" + ''.join(f'{metric:>26}' for metric in METRICS)
+    print(header)
+    print('-' * len(header))
+
+    regressions = []
+    routes = [('total', before['total'], after['total'])] + [
+        (route, before['routes'].get(route), after['routes'].get(route))
+        for route in sorted(set(before['routes']) | set(after['routes']))
+    ]
+    for route, old, new in routes:
+        if old is None or new is None:
+            print(f"{route:<40}{'only in ' + ('after' if old is None else 'before'):>26}")
+            continue
+        cells = []
+        for metric in METRICS:
+            delta = change(old[metric], new[metric])
+            cells.append(f'{old[metric]} -> {new[metric]} {format_change(delta)}')
+            if metric == 'p95_ms' and route != 'total' and delta is not None and delta > threshold:
+                regressions.append((route, delta))
+        print(f'{route:<40}' + ''.join(f'{cell:>26}' for cell in cells))
+
+    if regressions:
+        print()
+        for route, delta in regressions:
+            print(f'p95 regression: {route} {delta:+.1f}%')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Allowed p95 regression per route, in percent.')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if print_comparison(before, after, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
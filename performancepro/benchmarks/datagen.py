@@ -0,0 +1,201 @@
+"""Seeded synthetic dataset generator for the PerformancePro benchmarks.
+
+Loads departments, employees, reviews and benchmark users into the
+database configured in backend/config.py (DB_* environment variables).
+Employees and reviews go through the same bulk import code as
+``flask import-employees``/``import-reviews``, so ratings and monthly
+rollups stay consistent. The same seed always produces the same data.
+
+    python benchmarks/datagen.py --employees 100000 --reviews 10000000 --reset
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import bcrypt  # noqa: E402
+import pymysql  # noqa: E402
+
+from bulk_import import import_employees, import_reviews  # noqa: E402
+from config import Config  # noqa: E402
+from data_versions import touch_versions  # noqa: E402
+
+BENCH_PASSWORD = 'benchpass'
+BENCH_EMAIL_DOMAIN = 'bench.example'
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas',
+               'Sarah', 'Charles', 'Karen', 'Priya', 'Wei', 'Amara', 'Mateo', 'Yuki', 'Omar', 'Elena']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+              'Jackson', 'Martin', 'Lee', 'Patel', 'Chen', 'Okafor', 'Silva', 'Tanaka', 'Haddad']
+POSITIONS = ['Associate', 'Senior Associate', 'Specialist', 'Team Lead', 'Manager', 'Analyst',
+             'Representative', 'Consultant', 'Engineer', 'Coordinator']
+COMMENT_WORDS = ['helpful', 'quick', 'friendly', 'professional', 'slow', 'knowledgeable', 'patient',
+                 'rude', 'excellent', 'average', 'clear', 'thorough', 'late', 'responsive', 'great']
+# Ratings skew positive, like real review data
+RATING_WEIGHTS = [(1, 5), (2, 7), (3, 15), (4, 33), (5, 40)]
+
+
+# Binary stream over an iterator of text lines, so generated rows can be fed
+# to the bulk importer without writing them to disk first
+class LineStream(io.RawIOBase):
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._lines).encode('utf-8')
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def connect():
+    return pymysql.connect(
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def reset(connection):
+    with connection.cursor() as cursor:
+        # Reviews and monthly rollups go with their employees (ON DELETE CASCADE)
+        cursor.execute("DELETE FROM employees WHERE email LIKE %s", (f'%@{BENCH_EMAIL_DOMAIN}',))
+        cursor.execute("DELETE FROM users WHERE email LIKE %s", (f'%@{BENCH_EMAIL_DOMAIN}',))
+        cursor.execute("DELETE FROM departments WHERE name LIKE 'Bench %%'")
+    connection.commit()
+    # Running servers drop their cached views of the deleted data
+    touch_versions(connection, 'departments', 'employees', 'reviews', 'users', 'directory')
+
+
+def create_departments(connection, count):
+    names = [f'Bench {index:03d}' for index in range(count)]
+    with connection.cursor() as cursor:
+        cursor.executemany("INSERT IGNORE INTO departments (name) VALUES (%s)", names)
+    connection.commit()
+    touch_versions(connection, 'departments')
+    return names
+
+
+def create_users(connection, admins, customers, rounds):
+    hashed = bcrypt.hashpw(BENCH_PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    rows = [(f'Bench Admin {i}', f'bench_admin_{i}', f'bench_admin_{i}@{BENCH_EMAIL_DOMAIN}', hashed, 'admin')
+            for i in range(admins)]
+    rows += [(f'Bench Customer {i}', f'bench_customer_{i}', f'bench_customer_{i}@{BENCH_EMAIL_DOMAIN}', hashed,
+              'customer') for i in range(customers)]
+    with connection.cursor() as cursor:
+        cursor.executemany("""
+            INSERT IGNORE INTO users (name, username, email, password, role)
+            VALUES (%s, %s, %s, %s, %s)
+        """, rows)
+    connection.commit()
+
+
+def employee_lines(rng, count, departments, start):
+    for index in range(start, start + count):
+        yield json.dumps({
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'department': rng.choice(departments),
+            'position': rng.choice(POSITIONS),
+            'email': f'bench-{index}@{BENCH_EMAIL_DOMAIN}',
+            'phone': f'+1 (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+            'join_date': (date(2015, 1, 1) + timedelta(days=rng.randint(0, 3650))).isoformat()
+        }) + '\n'
+
+
+def review_lines(rng, count, employee_ids, days):
+    ratings = [rating for rating, _ in RATING_WEIGHTS]
+    weights = [weight for _, weight in RATING_WEIGHTS]
+    # A few employees receive most reviews (Pareto distributed popularity)
+    popularity = list(accumulate(rng.paretovariate(1.2) for _ in employee_ids))
+    today = date.today()
+    for _ in range(count):
+        yield json.dumps({
+            'employee_id': rng.choices(employee_ids, cum_weights=popularity)[0],
+            'customer_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'customer_email': f'customer-{rng.randint(0, 10 ** 6)}@example.com',
+            'rating': rng.choices(ratings, weights=weights)[0],
+            'comment': ' '.join(rng.choices(COMMENT_WORDS, k=rng.randint(0, 12))),
+            'date': (today - timedelta(days=rng.randint(0, days))).isoformat()
+        }) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--reviews', type=int, default=500000)
+    parser.add_argument('--days', type=int, default=730, help='Spread review dates over this many past days.')
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--bcrypt-rounds', type=int, default=Config.BCRYPT_ROUNDS)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--reset', action='store_true', help='Delete previously generated benchmark data first.')
+    parser.add_argument('--output', help='Write generation statistics as JSON to this file.')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    connection = connect()
+    stats = {'seed': args.seed}
+    try:
+        if args.reset:
+            started = time.monotonic()
+            reset(connection)
+            stats['reset_seconds'] = round(time.monotonic() - started, 3)
+
+        departments = create_departments(connection, args.departments)
+        create_users(connection, args.admins, args.customers, args.bcrypt_rounds)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) as count FROM employees WHERE email LIKE %s",
+                           (f'%@{BENCH_EMAIL_DOMAIN}',))
+            existing = cursor.fetchone()['count']
+        report = import_employees(connection, LineStream(employee_lines(rng, args.employees, departments, existing)),
+                                  'ndjson', batch_size=args.batch_size)
+        stats['employees'] = report.as_dict()
+        print(f"employees: {report.inserted} inserted at {stats['employees']['rows_per_second']} rows/s")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM employees WHERE email LIKE %s ORDER BY id", (f'%@{BENCH_EMAIL_DOMAIN}',))
+            employee_ids = [row['id'] for row in cursor.fetchall()]
+        connection.commit()
+
+        report = import_reviews(connection, LineStream(review_lines(rng, args.reviews, employee_ids, args.days)),
+                                'ndjson', batch_size=args.batch_size)
+        stats['reviews'] = report.as_dict()
+        print(f"reviews: {report.inserted} inserted at {stats['reviews']['rows_per_second']} rows/s")
+    finally:
+        connection.close()
+
+    for section in ('employees', 'reviews'):
+        if section in stats:
+            stats[section].pop('errors', None)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(stats, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""Scripted HTTP load driver for the PerformancePro API.
+
+Runs a workload against a running server with a number of concurrent
+virtual users, each with its own session, and reports throughput and
+p50/p95/p99 latency per route as JSON. Expects the users created by
+datagen.py (bench_admin_N / bench_customer_N).
+
+    python benchmarks/loadtest.py --workload mixed --users 32 --duration 60 --output results/mixed.json
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from datagen import BENCH_PASSWORD
+
+
+class Client:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    # route is the label results are grouped under, e.g. GET /api/employees/<id>
+    def request(self, method, path, route=None, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header('Content-Type', 'application/json')
+        started_at = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                payload = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            payload = b''
+            status = 0
+        self.recorder.record(route or f'{method} {path}', status, time.perf_counter() - started_at)
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+    def login(self, username, role):
+        status, _ = self.request('POST', '/api/login', body={
+            'username': username, 'password': BENCH_PASSWORD, 'role': role
+        })
+        return status == 200
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    def record(self, route, status, seconds):
+        if not self.recording:
+            return
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+            if status == 0 or status >= 500 or status == 429:
+                self.errors[route] += 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, errors, statuses, elapsed):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed > 0 else None,
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else None,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 2) if values else None,
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2) if values else None,
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2) if values else None,
+        'max_ms': round(values[-1] * 1000, 2) if values else None
+    }
+
+
+# Workload steps. Each takes (client, context, rng) and performs one user
+# action, which may be several requests.
+
+def browse_employees(client, context, rng):
+    client.request('GET', '/api/employees?fields=id,name,position,avatar,customer_rating,review_count&limit=50',
+                   route='GET /api/employees')
+
+
+def view_employee(client, context, rng):
+    employee_id = rng.choice(context['employee_ids'])
+    status, employee = client.request('GET', f'/api/employees/{employee_id}', route='GET /api/employees/<id>')
+    cursor = employee.get('reviews_next_cursor') if status == 200 and employee else None
+    if cursor and rng.random() < 0.3:
+        client.request('GET', f'/api/employees/{employee_id}/reviews?before={cursor}',
+                       route='GET /api/employees/<id>/reviews')
+
+
+def poll_dashboard(client, context, rng):
+    client.request('GET', '/api/dashboard')
+    if rng.random() < 0.2:
+        client.request('GET', '/api/analytics')
+
+
+def login_again(client, context, rng):
+    client.login(f'bench_customer_{rng.randrange(context["customers"])}', 'customer')
+
+
+def post_review(client, context, rng):
+    client.request('POST', '/api/reviews', body={
+        'employee_id': rng.choice(context['employee_ids']),
+        'customer_name': 'Load Test',
+        'customer_email': 'loadtest@example.com',
+        'rating': rng.randint(1, 5),
+        'comment': 'Submitted by the load test'
+    })
+
+
+# name -> (role of the virtual users, [(weight, step), ...], think time in seconds)
+WORKLOADS = {
+    'dashboard': ('admin', [(1, poll_dashboard)], 0.0),
+    'browse': ('customer', [(3, browse_employees), (7, view_employee)], 0.0),
+    'login-storm': ('customer', [(1, login_again)], 0.0),
+    'review-burst': ('customer', [(1, post_review)], 0.0),
+    'mixed': ('mixed', [(20, browse_employees), (50, view_employee), (15, poll_dashboard),
+                        (10, post_review), (5, login_again)], 0.05),
+}
+
+
+def virtual_user(index, args, context, recorder, deadline, request_budget):
+    rng = random.Random(args.seed * 1000 + index)
+    role, steps, think_time = WORKLOADS[args.workload]
+    if args.think_time is not None:
+        think_time = args.think_time
+    client = Client(args.base_url, recorder)
+    if role == 'admin' or (role == 'mixed' and index % 5 == 0):
+        admin = True
+        client.login(f'bench_admin_{index % context["admins"]}', 'admin')
+    else:
+        admin = False
+        client.login(f'bench_customer_{index % context["customers"]}', 'customer')
+
+    weights = [weight for weight, _ in steps]
+    functions = [step for _, step in steps]
+    while time.monotonic() < deadline and request_budget.take():
+        step = rng.choices(functions, weights=weights)[0]
+        # Only customers may post reviews and only admins see the dashboard
+        if role == 'mixed' and step in (post_review, login_again) and admin:
+            step = poll_dashboard
+        elif role == 'mixed' and step is poll_dashboard and not admin:
+            step = view_employee
+        step(client, context, rng)
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+
+
+class Budget:
+    def __init__(self, total):
+        self._lock = threading.Lock()
+        self.remaining = total
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_context(args):
+    client = Client(args.base_url, Recorder())
+    if not client.login('bench_admin_0', 'admin'):
+        sys.exit('Could not log in as bench_admin_0; load the benchmark dataset with datagen.py first')
+    status, employees = client.request('GET', '/api/employees?fields=id&limit=500')
+    if status != 200 or not employees:
+        sys.exit('No employees found; load the benchmark dataset with datagen.py first')
+    return {
+        'employee_ids': [employee['id'] for employee in employees],
+        'admins': args.admins,
+        'customers': args.customers
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--workload', choices=sorted(WORKLOADS), default='mixed')
+    parser.add_argument('--users', type=int, default=16, help='Concurrent virtual users.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run after warm-up.')
+    parser.add_argument('--requests', type=int, help='Stop after this many user actions instead.')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of unrecorded warm-up (duration runs only).')
+    parser.add_argument('--think-time', type=float,
+                        help="Mean seconds a user idles between actions; overrides the workload's default.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--admins', type=int, default=5, help='Benchmark admins created by datagen.py.')
+    parser.add_argument('--customers', type=int, default=200, help='Benchmark customers created by datagen.py.')
+    parser.add_argument('--label', help='Free-form label stored with the results.')
+    parser.add_argument('--output', help='Write results as JSON to this file instead of stdout.')
+    return parser
+
+
+def run(args):
+    context = load_context(args)
+    recorder = Recorder()
+    budget = Budget(args.requests)
+    # A fixed request count is measured in full, without warm-up
+    warmup = 0 if args.requests is not None else args.warmup
+    deadline = time.monotonic() + warmup + (args.duration if args.requests is None else float('inf'))
+    # Thousands of mostly idle users need small thread stacks
+    threading.stack_size(512 * 1024)
+    threads = [
+        threading.Thread(target=virtual_user, args=(index, args, context, recorder, deadline, budget), daemon=True)
+        for index in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    recorder.recording = True
+    started_at = time.monotonic()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started_at
+    recorder.recording = False
+
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    all_statuses = defaultdict(int)
+    for statuses in recorder.statuses.values():
+        for status, count in statuses.items():
+            all_statuses[status] += count
+    return {
+        'commit': git_commit(),
+        'label': args.label,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'base_url': args.base_url,
+        'workload': args.workload,
+        'users': args.users,
+        'think_time': args.think_time,
+        'seed': args.seed,
+        'elapsed_seconds': round(elapsed, 3),
+        'total': summarize(all_latencies, sum(recorder.errors.values()), all_statuses, elapsed),
+        'routes': {
+            route: summarize(values, recorder.errors[route], recorder.statuses[route], elapsed)
+            for route, values in sorted(recorder.latencies.items())
+        }
+    }
+
+
+def main():
+    args = build_parser().parse_args()
+    output = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""Micro-benchmark of the row handling behind GET /api/employees.
+
+First, fetch and decode: the rows are fetched through pymysql's own
+DictCursor and Cursor (tuple_cursor) classes from a stand-in connection
+whose result holds a tuple per row, as pymysql's protocol layer leaves it,
+and turned into response objects:
+
+- DictCursor: a dict per row, patched in place by the loops the route
+  used to run;
+- tuple_cursor: the tuples as fetched, decoded ENCODE_CHUNK_SIZE rows at a
+  time by the one-pass decoder, as encode_rows does.
+
+Memory is the tracemalloc peak from reading the result to the last
+decoded row, including the row tuples themselves, which both paths build.
+
+Then the response body, over rows already fetched, in three paths:
+
+- dict: the DictCursor route (a dict per row, then loops filling in the
+  avatar and department names and dropping helper columns, then one JSON
+  encoding of the whole list);
+- dict-streamed: the same dicts built and patched one row at a time and
+  encoded in chunks by queries.encode_rows;
+- tuple: rows kept as tuples and turned into response objects by the
+  one-pass decoder, encoded in chunks the same way.
+
+dict against dict-streamed shows what chunked encoding saves; dict-streamed
+against tuple isolates the row format. Memory is the tracemalloc peak
+above the already fetched tuples, which every path holds, while the body
+is produced and handed on chunk by chunk as a server writes it out.
+
+Rows are synthetic tuples shaped like pymysql's, so no database is needed.
+
+    python benchmarks/row_decoding.py --rows 100000
+    python benchmarks/row_decoding.py --rows 100000 --fields id,name,avatar,department
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import pymysql  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from json_provider import FastJSONProvider  # noqa: E402
+from queries import (  # noqa: E402
+    DEPARTMENT_NAME_FIELDS, EMPLOYEE_LIST, ENCODE_CHUNK_SIZE, employee_decoder, encode_rows, tuple_cursor
+)
+
+DEPARTMENTS = {department_id: f'Department {department_id}' for department_id in range(1, 21)}
+
+
+def make_rows(count, columns, seed=42):
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    values = {
+        'id': lambda i: i,
+        'name': lambda i: f'Employee{i} Surname{i % 97}',
+        'department': lambda i: rng.randint(1, 20),
+        'department_id': lambda i: rng.randint(1, 20),
+        'position': lambda i: rng.choice(['Associate', 'Specialist', 'Team Lead', 'Manager']),
+        'email': lambda i: f'employee{i}@example.com',
+        'phone': lambda i: None if i % 3 else f'+1-555-{i % 10000:04d}',
+        'join_date': lambda i: start + timedelta(days=i % 3000),
+        # Most rows have no stored avatar and fall back to initials
+        'avatar': lambda i: '' if i % 10 else 'AV',
+        'customer_rating': lambda i: Decimal(rng.randint(10, 50)).scaleb(-1),
+        'review_count': lambda i: rng.randint(0, 500),
+        'department_name': lambda i: rng.randint(1, 20)
+    }
+    return [tuple(values[column](i) for column in columns) for i in range(1, count + 1)]
+
+
+# What pymysql's MySQLResult holds once a result set has been read
+class FakeResult:
+    def __init__(self, columns, rows):
+        self.fields = [FakeField(column) for column in columns]
+        self.description = tuple((column, None, None, None, None, None, None) for column in columns)
+        self.rows = rows
+        self.affected_rows = len(rows)
+        self.warning_count = 0
+        self.insert_id = 0
+        self.has_next = False
+
+
+class FakeField:
+    def __init__(self, name):
+        self.name = name
+        self.table_name = 'e'
+
+
+# Connection whose every query reads the same rows, building their tuples
+# afresh like the protocol layer does
+class FakeConnection:
+    def __init__(self, columns, count):
+        self.columns = columns
+        self.count = count
+        self._result = None
+
+    def cursor(self, cursorclass=pymysql.cursors.DictCursor):
+        return cursorclass(self)
+
+    def query(self, sql):
+        self._result = FakeResult(self.columns, make_rows(self.count, self.columns))
+
+
+# The route before the query registry: the connection's DictCursor, rows
+# patched in place. Returns the cursor too, which keeps its result (and
+# the tuples behind the dicts) while the route is still in its block.
+def fetch_dict(connection, columns, fields):
+    cursor = connection.cursor(pymysql.cursors.DictCursor)
+    cursor.execute(EMPLOYEE_LIST.text(columns, **EMPLOYEE_LIST.variants[0]))
+    employees = cursor.fetchall()
+    patch_employees(employees, columns, fields)
+    return cursor, employees
+
+
+def fetch_tuple(connection, columns, fields):
+    cursor = tuple_cursor(connection)
+    cursor.execute(EMPLOYEE_LIST.text(columns, **EMPLOYEE_LIST.variants[0]))
+    rows = cursor.fetchall()
+    decode = employee_decoder(columns, fields, DEPARTMENTS)
+    for start in range(0, len(rows), ENCODE_CHUNK_SIZE):
+        [decode(row) for row in rows[start:start + ENCODE_CHUNK_SIZE]]
+    return cursor, rows
+
+
+# Avatar initials, department names and dropped helper columns, filled in
+# by loops over every row
+def patch_employees(employees, columns, fields):
+    if 'avatar' in fields:
+        for emp in employees:
+            if not emp['avatar']:
+                name_parts = emp['name'].split()
+                emp['avatar'] = ''.join([part[0].upper() for part in name_parts[:2]])
+    name_fields = [field for field in DEPARTMENT_NAME_FIELDS if field in fields]
+    if name_fields:
+        for emp in employees:
+            for field in name_fields:
+                emp[field] = DEPARTMENTS.get(emp[field])
+    extra = [column for column in ('id', 'name') if column in columns and column not in fields]
+    if extra:
+        for emp in employees:
+            for column in extra:
+                del emp[column]
+
+
+# The DictCursor route's response: dict rows patched in place, then one
+# JSON encoding of the whole list
+def dict_path(app, columns, fields, rows):
+    employees = [dict(zip(columns, row)) for row in rows]
+    patch_employees(employees, columns, fields)
+    return [app.json.dumps(employees, separators=(',', ':'))]
+
+
+# The same dict per row and the same patching, done row by row and
+# encoded in chunks like the tuple path
+def streamed_dict_path(app, columns, fields, rows):
+    avatar = 'avatar' in fields
+    name_fields = [field for field in DEPARTMENT_NAME_FIELDS if field in fields]
+    extra = [column for column in ('id', 'name') if column in columns and column not in fields]
+
+    def decode(row):
+        emp = dict(zip(columns, row))
+        if avatar and not emp['avatar']:
+            name_parts = emp['name'].split()
+            emp['avatar'] = ''.join([part[0].upper() for part in name_parts[:2]])
+        for field in name_fields:
+            emp[field] = DEPARTMENTS.get(emp[field])
+        for column in extra:
+            del emp[column]
+        return emp
+
+    return encode_rows(app.json.dumps, rows, decode)
+
+
+def tuple_path(app, columns, fields, rows):
+    return encode_rows(app.json.dumps, rows, employee_decoder(columns, fields, DEPARTMENTS))
+
+
+# Encode each chunk as the WSGI server would before sending it, keeping
+# only its size
+def consume(chunks):
+    return sum(len(chunk.encode('utf-8')) for chunk in chunks)
+
+
+# tracemalloc peak of one call of run and its fastest time over repeat calls
+def measure(run, rows, repeat):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = run()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    del result
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    seconds = min(timings)
+    return {
+        'peak_bytes': peak,
+        'peak_bytes_per_row': round(peak / rows, 1),
+        'seconds': round(seconds, 4),
+        'microseconds_per_row': round(seconds / rows * 1e6, 3)
+    }
+
+
+def print_results(title, results, names):
+    print(title)
+    print(f"{'path':<15}{'peak MiB':>12}{'bytes/row':>12}{'ms':>10}{'us/row':>10}")
+    for name in names:
+        result = results[name]
+        print(f"{name:<15}{result['peak_bytes'] / 2 ** 20:>12.1f}{result['peak_bytes_per_row']:>12.1f}"
+              f"{result['seconds'] * 1000:>10.1f}{result['microseconds_per_row']:>10.2f}")
+
+
+def print_change(results, baseline, name, change):
+    memory = results[name]['peak_bytes'] / max(results[baseline]['peak_bytes'], 1) - 1
+    time_taken = results[name]['seconds'] / results[baseline]['seconds'] - 1
+    print(f'{change} ({baseline} -> {name}): peak memory {memory:+.0%}, time {time_taken:+.0%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--fields', help='Comma separated ?fields= value; all fields when omitted.')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per path; the fastest is reported.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    fields = [field.strip() for field in args.fields.split(',')] if args.fields else list(EMPLOYEE_LIST.columns)
+    columns = tuple(dict.fromkeys(['id'] + fields + (['name'] if 'avatar' in fields else [])))
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    rows = make_rows(args.rows, columns)
+
+    results = {'rows': args.rows, 'fields': fields, 'encoder': 'orjson' if hasattr(FastJSONProvider, '_orjson_options')
+               else 'json'}
+
+    connection = FakeConnection(columns, args.rows)
+    fetches = (('DictCursor', fetch_dict), ('tuple_cursor', fetch_tuple))
+    results['fetch'] = {}
+    for name, fetch in fetches:
+        results['fetch'][name] = measure(lambda: fetch(connection, columns, fields), args.rows, args.repeat)
+
+    paths = (('dict', dict_path), ('dict-streamed', streamed_dict_path), ('tuple', tuple_path))
+    bodies = {}
+    for name, path in paths:
+        bodies[name] = ''.join(path(app, columns, fields, rows))
+        results[name] = measure(lambda: consume(path(app, columns, fields, rows)), args.rows, args.repeat)
+    expected = json.loads(bodies['dict'])
+    if any(json.loads(body) != expected for body in bodies.values()):
+        raise SystemExit('the paths produced different responses')
+
+    print(f"{args.rows} rows, fields: {','.join(fields)}, encoder: {results['encoder']}")
+    print_results('fetch and decode', results['fetch'], [name for name, _ in fetches])
+    print_change(results['fetch'], 'DictCursor', 'tuple_cursor', 'tuple rows')
+    print()
+    print_results('response body', results, [name for name, _ in paths])
+    print_change(results, 'dict', 'dict-streamed', 'chunked encoding')
+    print_change(results, 'dict-streamed', 'tuple', 'tuple rows')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
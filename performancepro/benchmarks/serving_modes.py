@@ -0,0 +1,87 @@
+"""Benchmark the development server against the gunicorn production setup.
+
+Starts each serving mode in turn on a local port, runs the same
+loadtest.py workload against it and prints the two result sets side by
+side. The default workload models many mostly idle dashboard clients.
+
+    python benchmarks/serving_modes.py --users 1000 --think-time 5 --duration 60 --output-dir results/
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from compare import print_comparison
+from loadtest import build_parser, run
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# name -> command line; {port} is filled in per run
+MODES = {
+    'flask-dev': [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', '{port}',
+                  '--with-threads', '--no-reload', '--no-debugger'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '127.0.0.1:{port}',
+                 'wsgi:app'],
+}
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/api/departments', timeout=1)
+            return
+        except urllib.error.HTTPError:
+            # 401 means the app is up and answering
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {base_url} did not start within {timeout}s')
+
+
+def run_mode(mode, args):
+    command = [part.format(port=args.port) for part in MODES[mode]]
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        args.base_url = f'http://127.0.0.1:{args.port}'
+        wait_until_ready(args.base_url)
+        args.label = mode
+        return run(args)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = build_parser()
+    parser.description = __doc__
+    parser.set_defaults(workload='dashboard', users=500, think_time=5.0, duration=60)
+    parser.add_argument('--port', type=int, default=8055)
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['flask-dev', 'gunicorn'])
+    parser.add_argument('--output-dir', help='Write each mode\'s results to <dir>/<mode>.json.')
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        print(f'running {args.workload} against {mode} ...', file=sys.stderr)
+        results[mode] = run_mode(mode, args)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            with open(os.path.join(args.output_dir, f'{mode}.json'), 'w') as f:
+                json.dump(results[mode], f, indent=2)
+
+    if len(args.modes) == 2:
+        print_comparison(results[args.modes[0]], results[args.modes[1]])
+    else:
+        for mode in args.modes:
+            print(mode, json.dumps(results[mode]['total']))
+
+
+if __name__ == '__main__':
+    main()
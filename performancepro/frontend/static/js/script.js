@@ -4,6 +4,23 @@ let currentPage = 'dashboard';
 let selectedRating = 0;
 let allEmployees = []; // Store all employees for validation
 let chartInstances = {}; // Store chart instances to destroy them later
+let responseCache = new Map(); // GET endpoint -> { etag, body, headers } for conditional requests
+let dashboardState = null; // Last dashboard payload, patched by live events
+let dashboardStream = null; // EventSource for /api/stream/dashboard
+let dashboardStreamRetry = null;
+let searchTimers = {}; // table body id -> pending search timeout
+
+// Employees requested per page by the employee tables and rating cards
+const EMPLOYEE_PAGE_SIZE = 50;
+
+// Employee tables with a search box: table body id -> { input, render }
+const EMPLOYEE_TABLES = {
+    employeeTableBody: { input: 'searchEmployees', render: renderEmployeeRow },
+    adminEmployeeTableBody: { input: 'searchAdminEmployees', render: renderAdminEmployeeRow }
+};
+
+// Shortest term /api/search matches (MIN_PREFIX_LENGTH in search_index.py)
+const SEARCH_MIN_TERM_LENGTH = 2;
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -80,7 +97,8 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // API Helper Functions
-async function apiRequest(endpoint, method = 'GET', data = null) {
+// Resolves to the parsed body, or to { body, headers } when withHeaders is set
+async function apiRequest(endpoint, method = 'GET', data = null, withHeaders = false) {
     const options = {
         method: method,
         headers: {
@@ -92,12 +110,25 @@ async function apiRequest(endpoint, method = 'GET', data = null) {
         options.body = JSON.stringify(data);
     }
     
+    // Revalidate GETs we already have a body for; the server answers 304
+    // without re-running its queries when nothing changed. The browser's
+    // own cache is bypassed so the 304 reaches this code.
+    const cached = method === 'GET' ? responseCache.get(endpoint) : null;
+    if (cached) {
+        options.headers['If-None-Match'] = cached.etag;
+        options.cache = 'no-store';
+    }
+    
     try {
         console.log(`Making API request to: ${endpoint}`, options);
         const response = await fetch(endpoint, options);
         
         console.log(`Response status: ${response.status}`);
         
+        if (response.status === 304 && cached) {
+            return withHeaders ? { body: cached.body, headers: cached.headers } : cached.body;
+        }
+        
         // Check if the response is JSON
         const contentType = response.headers.get('content-type');
         if (!contentType || !contentType.includes('application/json')) {
@@ -123,7 +154,12 @@ async function apiRequest(endpoint, method = 'GET', data = null) {
             throw new Error(result.error || `API request failed with status ${response.status}`);
         }
         
-        return result;
+        const etag = response.headers.get('ETag');
+        if (method === 'GET' && etag) {
+            responseCache.set(endpoint, { etag: etag, body: result, headers: response.headers });
+        }
+        
+        return withHeaders ? { body: result, headers: response.headers } : result;
     } catch (error) {
         // Only log errors that are not "Admin access required"
         if (error.message !== 'Admin access required') {
@@ -172,6 +208,7 @@ async function handleLogin(e) {
             currentUser = result.user;
             console.log('Current user set to:', currentUser);
             console.log('Current user details:', JSON.stringify(currentUser));
+            responseCache.clear();
             localStorage.setItem('currentUser', JSON.stringify(currentUser));
             showToast('Login successful!', 'success');
             showDashboard();
@@ -278,6 +315,8 @@ function logout() {
         .then(() => {
             localStorage.removeItem('currentUser');
             currentUser = null;
+            responseCache.clear();
+            disconnectDashboardStream();
             document.getElementById('dashboard').style.display = 'none';
             document.getElementById('loginPage').style.display = 'flex';
             document.getElementById('loginForm').reset();
@@ -334,14 +373,13 @@ async function loadDashboardData() {
     try {
         const data = await apiRequest('/api/dashboard');
         
-        // Update dashboard stats
-        document.getElementById('totalEmployees').textContent = data.total_employees;
-        document.getElementById('avgCustomerRating').textContent = data.avg_customer_rating;
-        document.getElementById('totalReviews').textContent = data.total_reviews;
-        document.getElementById('topRated').textContent = data.top_rated;
+        // Keep a private copy; live events patch it in place
+        dashboardState = JSON.parse(JSON.stringify(data));
+        renderDashboardStats(dashboardState);
         
         // Initialize charts
-        initializeCharts(data.rating_distribution, data.monthly_ratings);
+        initializeCharts(dashboardState.rating_distribution, dashboardState.monthly_ratings);
+        connectDashboardStream();
     } catch (error) {
         // Only log errors that are not "Admin access required"
         if (error.message !== 'Admin access required') {
@@ -350,6 +388,151 @@ async function loadDashboardData() {
     }
 }
 
+function renderDashboardStats(data) {
+    document.getElementById('totalEmployees').textContent = data.total_employees;
+    document.getElementById('avgCustomerRating').textContent = data.avg_customer_rating;
+    document.getElementById('totalReviews').textContent = data.total_reviews;
+    document.getElementById('topRated').textContent = data.top_rated;
+}
+
+// Live dashboard: the server pushes small deltas as data changes, and the
+// stats and charts are patched in place instead of reloading everything
+function connectDashboardStream() {
+    if (dashboardStream || typeof EventSource === 'undefined') {
+        return;
+    }
+    clearTimeout(dashboardStreamRetry);
+    
+    let opened = false;
+    dashboardStream = new EventSource('/api/stream/dashboard');
+    dashboardStream.onopen = function() {
+        // After an automatic reconnect, catch up on anything missed
+        if (opened) {
+            loadDashboardData();
+        }
+        opened = true;
+    };
+    dashboardStream.onerror = function() {
+        // A closed stream (e.g. the server is at its client limit) is not
+        // retried by the browser; try again later while on the dashboard
+        if (dashboardStream && dashboardStream.readyState === EventSource.CLOSED) {
+            dashboardStream = null;
+            dashboardStreamRetry = setTimeout(() => {
+                if (currentPage === 'dashboard') {
+                    connectDashboardStream();
+                }
+            }, 30000);
+        }
+    };
+    dashboardStream.addEventListener('review', event => applyDashboardEvent(applyReviewEvent, event));
+    dashboardStream.addEventListener('employee_added', event => applyDashboardEvent(applyEmployeeAddedEvent, event));
+    dashboardStream.addEventListener('employee_deleted', event => applyDashboardEvent(applyEmployeeDeletedEvent, event));
+    dashboardStream.addEventListener('refresh', () => loadDashboardData());
+}
+
+function disconnectDashboardStream() {
+    clearTimeout(dashboardStreamRetry);
+    if (dashboardStream) {
+        dashboardStream.close();
+        dashboardStream = null;
+    }
+}
+
+function applyDashboardEvent(apply, event) {
+    if (!dashboardState) {
+        return;
+    }
+    apply(dashboardState, JSON.parse(event.data));
+    dashboardState.avg_customer_rating = dashboardState.rated_employees
+        ? Math.round(dashboardState.rating_total / dashboardState.rated_employees * 10) / 10
+        : 0;
+    dashboardState.top_rated = dashboardState.rating_distribution.five_star;
+    renderDashboardStats(dashboardState);
+    updateDashboardCharts(dashboardState);
+    // The cached /api/dashboard body is out of date now
+    responseCache.delete('/api/dashboard');
+}
+
+// Same buckets as the dashboard query
+function ratingBucket(rating) {
+    if (rating >= 4.5) return 'five_star';
+    if (rating >= 3.5) return 'four_star';
+    if (rating >= 2.5) return 'three_star';
+    if (rating >= 1.5) return 'two_star';
+    return 'one_star';
+}
+
+function applyReviewEvent(state, event) {
+    state.total_reviews += 1;
+    state.rating_distribution[ratingBucket(event.previous_rating)] -= 1;
+    state.rating_distribution[ratingBucket(event.customer_rating)] += 1;
+    if (event.review_count === 1) {
+        state.rated_employees += 1;
+        state.rating_total += event.customer_rating;
+    } else {
+        state.rating_total += event.customer_rating - event.previous_rating;
+    }
+    
+    const month = state.monthly_ratings.find(item => item.year === event.year && item.month === event.month);
+    if (month) {
+        month.avg_rating = (month.avg_rating * month.review_count + event.rating) / (month.review_count + 1);
+        month.review_count += 1;
+    } else {
+        // First review of a new month; keep the six most recent months
+        state.monthly_ratings.push({ year: event.year, month: event.month, avg_rating: event.rating, review_count: 1 });
+        state.monthly_ratings = state.monthly_ratings.slice(-6);
+    }
+}
+
+function applyEmployeeAddedEvent(state, event) {
+    state.total_employees += 1;
+    state.rating_distribution.one_star += 1;
+}
+
+function applyEmployeeDeletedEvent(state, event) {
+    state.total_employees -= 1;
+    state.total_reviews -= event.review_count;
+    state.rating_distribution[ratingBucket(event.customer_rating)] -= 1;
+    if (event.review_count > 0) {
+        state.rated_employees -= 1;
+        state.rating_total -= event.customer_rating;
+    }
+    
+    event.months.forEach(removed => {
+        const month = state.monthly_ratings.find(item => item.year === removed.year && item.month === removed.month);
+        if (!month) {
+            return;
+        }
+        const remaining = month.review_count - removed.review_count;
+        if (remaining > 0) {
+            month.avg_rating = (month.avg_rating * month.review_count - removed.rating_sum) / remaining;
+            month.review_count = remaining;
+        } else {
+            state.monthly_ratings.splice(state.monthly_ratings.indexOf(month), 1);
+        }
+    });
+}
+
+function updateDashboardCharts(state) {
+    const distribution = state.rating_distribution;
+    if (chartInstances.distributionChart) {
+        chartInstances.distributionChart.data.datasets[0].data = [
+            distribution.five_star || 0,
+            distribution.four_star || 0,
+            distribution.three_star || 0,
+            distribution.two_star || 0,
+            distribution.one_star || 0
+        ];
+        chartInstances.distributionChart.update('none');
+    }
+    if (chartInstances.monthlyChart) {
+        const monthNames = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+        chartInstances.monthlyChart.data.labels = state.monthly_ratings.map(item => monthNames[item.month - 1]);
+        chartInstances.monthlyChart.data.datasets[0].data = state.monthly_ratings.map(item => item.avg_rating);
+        chartInstances.monthlyChart.update('none');
+    }
+}
+
 function initializeCharts(ratingDistribution, monthlyRatings) {
     // Destroy existing charts before creating new ones
     Object.keys(chartInstances).forEach(key => {
@@ -454,66 +637,176 @@ function initializeCharts(ratingDistribution, monthlyRatings) {
 }
 
 // Employee Functions
+// Fetch one page of /api/employees; nextAfterId is null on the last page
+async function fetchEmployeePage(query, afterId = null, limit = EMPLOYEE_PAGE_SIZE) {
+    let endpoint = `/api/employees?limit=${limit}`;
+    if (query) {
+        endpoint += `&${query}`;
+    }
+    if (afterId !== null) {
+        endpoint += `&after_id=${encodeURIComponent(afterId)}`;
+    }
+    const { body, headers } = await apiRequest(endpoint, 'GET', null, true);
+    return { employees: body, nextAfterId: headers.get('X-Next-After-Id') };
+}
+
+// Fill a table body or grid with the first page of employees (or append
+// the page after afterId) and show its "Load more" button while more remain
+async function loadEmployeePage(containerId, query, render, afterId = null) {
+    const { employees, nextAfterId } = await fetchEmployeePage(query, afterId);
+    const container = document.getElementById(containerId);
+    if (container) {
+        if (afterId === null) {
+            container.innerHTML = "";
+        }
+        employees.forEach(employee => container.appendChild(render(employee)));
+    }
+    updateLoadMoreEmployees(containerId, query, render, nextAfterId);
+    if (EMPLOYEE_TABLES[containerId]) {
+        // Apply the table's search to the new rows
+        searchEmployeeTable(containerId);
+    }
+    return employees;
+}
+
+// Show the "Load more" button under an employee list while pages remain
+function updateLoadMoreEmployees(containerId, query, render, nextAfterId) {
+    const button = document.getElementById(`${containerId}More`);
+    if (!button) {
+        return;
+    }
+    if (!nextAfterId) {
+        button.style.display = 'none';
+        button.onclick = null;
+        return;
+    }
+    button.style.display = 'inline-block';
+    button.onclick = async () => {
+        try {
+            const employees = await loadEmployeePage(containerId, query, render, nextAfterId);
+            if (containerId !== 'customerRatingGrid') {
+                allEmployees = allEmployees.concat(employees);
+            }
+        } catch (error) {
+            console.error('Error loading more employees:', error);
+        }
+    };
+}
+
+function renderEmployeeRow(employee) {
+    // Ensure customer_rating is a number
+    const customerRating = parseFloat(employee.customer_rating) || 0;
+    const reviewCount = parseInt(employee.review_count) || 0;
+    
+    const row = document.createElement('tr');
+    row.dataset.employeeId = employee.id;
+    row.innerHTML = `
+        <td>
+            <div class="employee-info">
+                <div class="employee-avatar">${employee.avatar}</div>
+                <div>
+                    <div style="font-weight: 600;">${employee.name}</div>
+                    <div style="font-size: 0.875rem; color: var(--text-secondary);">ID: ${employee.id}</div>
+                </div>
+            </div>
+        </td>
+        <td>${employee.department}</td>
+        <td>${employee.position}</td>
+        <td>
+            <div style="display: flex; align-items: center; gap: 0.5rem;">
+                <div class="rating-stars">
+                    ${generateStars(customerRating)}
+                </div>
+                <span class="rating-badge ${getRatingClass(customerRating)}">
+                    ${customerRating.toFixed(1)}
+                </span>
+            </div>
+        </td>
+        <td>${reviewCount}</td>
+        <td>
+            <button class="btn" style="padding: 0.5rem 1rem; background-color: var(--primary-color); color: white;" onclick="viewEmployeeDetails(${employee.id})">
+                <i class="fas fa-eye"></i> View
+            </button>
+        </td>
+    `;
+    return row;
+}
+
+function renderAdminEmployeeRow(employee) {
+    // Ensure customer_rating is a number
+    const customerRating = parseFloat(employee.customer_rating) || 0;
+    const reviewCount = parseInt(employee.review_count) || 0;
+    
+    const row = document.createElement('tr');
+    row.dataset.employeeId = employee.id;
+    row.innerHTML = `
+        <td>
+            <div class="employee-info">
+                <div class="employee-avatar">${employee.avatar}</div>
+                <div>
+                    <div style="font-weight: 600;">${employee.name}</div>
+                    <div style="font-size: 0.875rem; color: var(--text-secondary);">${employee.email}</div>
+                </div>
+            </div>
+        </td>
+        <td>${employee.department}</td>
+        <td>${employee.position}</td>
+        <td>
+            <div style="display: flex; align-items: center; gap: 0.5rem;">
+                <div class="rating-stars">
+                    ${generateStars(customerRating)}
+                </div>
+                <span class="rating-badge ${getRatingClass(customerRating)}">
+                    ${customerRating.toFixed(1)}
+                </span>
+            </div>
+        </td>
+        <td>${reviewCount}</td>
+        <td>
+            <button class="btn" style="padding: 0.5rem 1rem; background-color: var(--info-color); color: white; margin-right: 0.5rem;" onclick="viewEmployeeDetails(${employee.id})">
+                <i class="fas fa-eye"></i> View
+            </button>
+            <button class="btn" style="padding: 0.5rem 1rem; background-color: var(--danger-color); color: white;" onclick="deleteEmployee(${employee.id})">
+                <i class="fas fa-trash"></i> Delete
+            </button>
+        </td>
+    `;
+    return row;
+}
+
 async function loadEmployees() {
     try {
         // This endpoint is now accessible to both admins and customers
-        const employees = await apiRequest('/api/employees');
-        allEmployees = employees; // Store for validation
-        
-        const tbody = document.getElementById('employeeTableBody');
-        if (tbody) {
-            tbody.innerHTML = "";
-
-            employees.forEach(employee => {
-                // Ensure customer_rating is a number
-                const customerRating = parseFloat(employee.customer_rating) || 0;
-                const reviewCount = parseInt(employee.review_count) || 0;
-                
-                const row = document.createElement('tr');
-                row.innerHTML = `
-                    <td>
-                        <div class="employee-info">
-                            <div class="employee-avatar">${employee.avatar}</div>
-                            <div>
-                                <div style="font-weight: 600;">${employee.name}</div>
-                                <div style="font-size: 0.875rem; color: var(--text-secondary);">ID: ${employee.id}</div>
-                            </div>
-                        </div>
-                    </td>
-                    <td>${employee.department}</td>
-                    <td>${employee.position}</td>
-                    <td>
-                        <div style="display: flex; align-items: center; gap: 0.5rem;">
-                            <div class="rating-stars">
-                                ${generateStars(customerRating)}
-                            </div>
-                            <span class="rating-badge ${getRatingClass(customerRating)}">
-                                ${customerRating.toFixed(1)}
-                            </span>
-                        </div>
-                    </td>
-                    <td>${reviewCount}</td>
-                    <td>
-                        <button class="btn" style="padding: 0.5rem 1rem; background-color: var(--primary-color); color: white;" onclick="viewEmployeeDetails(${employee.id})">
-                            <i class="fas fa-eye"></i> View
-                        </button>
-                    </td>
-                `;
-                tbody.appendChild(row);
-            });
-        }
+        allEmployees = await loadEmployeePage('employeeTableBody', '', renderEmployeeRow); // Store for validation
+    } catch (error) {
+        console.error('Error loading employees:', error);
+        showToast('Failed to load employees', 'error');
+    }
+}
 
-        // Populate employee select for rating form
-        const employeeSelect = document.getElementById('rateEmployeeSelect');
-        if (employeeSelect) {
-            employeeSelect.innerHTML = '<option value="">Choose an employee...</option>';
-            employees.forEach(employee => {
-                const option = document.createElement('option');
-                option.value = employee.id;
-                option.textContent = `${employee.name} - ${employee.position}`;
-                employeeSelect.appendChild(option);
-            });
-        }
+// Fill the employee select of the rating form, reading every employee's
+// name and position a page at a time
+async function loadRateEmployeeOptions() {
+    const employeeSelect = document.getElementById('rateEmployeeSelect');
+    if (!employeeSelect) {
+        return;
+    }
+    try {
+        const options = [];
+        let afterId = null;
+        do {
+            const page = await fetchEmployeePage('fields=id,name,position&sort=name', afterId, 500);
+            options.push(...page.employees);
+            afterId = page.nextAfterId;
+        } while (afterId);
+        
+        employeeSelect.innerHTML = '<option value="">Choose an employee...</option>';
+        options.forEach(employee => {
+            const option = document.createElement('option');
+            option.value = employee.id;
+            option.textContent = `${employee.name} - ${employee.position}`;
+            employeeSelect.appendChild(option);
+        });
     } catch (error) {
         console.error('Error loading employees:', error);
         showToast('Failed to load employees', 'error');
@@ -522,54 +815,7 @@ async function loadEmployees() {
 
 async function loadAdminEmployees() {
     try {
-        const employees = await apiRequest('/api/employees');
-        allEmployees = employees; // Store for validation
-        
-        const tbody = document.getElementById('adminEmployeeTableBody');
-        if (tbody) {
-            tbody.innerHTML = "";
-
-            employees.forEach(employee => {
-                // Ensure customer_rating is a number
-                const customerRating = parseFloat(employee.customer_rating) || 0;
-                const reviewCount = parseInt(employee.review_count) || 0;
-                
-                const row = document.createElement('tr');
-                row.innerHTML = `
-                    <td>
-                        <div class="employee-info">
-                            <div class="employee-avatar">${employee.avatar}</div>
-                            <div>
-                                <div style="font-weight: 600;">${employee.name}</div>
-                                <div style="font-size: 0.875rem; color: var(--text-secondary);">${employee.email}</div>
-                            </div>
-                        </div>
-                    </td>
-                    <td>${employee.department}</td>
-                    <td>${employee.position}</td>
-                    <td>
-                        <div style="display: flex; align-items: center; gap: 0.5rem;">
-                            <div class="rating-stars">
-                                ${generateStars(customerRating)}
-                            </div>
-                            <span class="rating-badge ${getRatingClass(customerRating)}">
-                                ${customerRating.toFixed(1)}
-                            </span>
-                        </div>
-                    </td>
-                    <td>${reviewCount}</td>
-                    <td>
-                        <button class="btn" style="padding: 0.5rem 1rem; background-color: var(--info-color); color: white; margin-right: 0.5rem;" onclick="viewEmployeeDetails(${employee.id})">
-                            <i class="fas fa-eye"></i> View
-                        </button>
-                        <button class="btn" style="padding: 0.5rem 1rem; background-color: var(--danger-color); color: white;" onclick="deleteEmployee(${employee.id})">
-                            <i class="fas fa-trash"></i> Delete
-                        </button>
-                    </td>
-                `;
-                tbody.appendChild(row);
-            });
-        }
+        allEmployees = await loadEmployeePage('adminEmployeeTableBody', '', renderAdminEmployeeRow); // Store for validation
     } catch (error) {
         console.error('Error loading admin employees:', error);
         showToast('Failed to load admin employees', 'error');
@@ -739,20 +985,16 @@ async function viewEmployeeDetails(employeeId) {
                 </div>
 
                 <h4 style="margin-bottom: 1rem;">Customer Reviews</h4>
-                ${reviews.length > 0 ? reviews.map(review => `
-                    <div class="customer-review">
-                        <div class="review-header">
-                            <span class="reviewer-name">${review.customer_name}</span>
-                            <span class="review-date">${formatDate(review.date)}</span>
-                        </div>
-                        <div class="review-rating">
-                            ${generateStars(parseFloat(review.rating) || 0)}
-                        </div>
-                        <p class="review-comment">${review.comment || 'No comment provided.'}</p>
-                    </div>
-                `).join('') : '<p style="color: var(--text-secondary);">No customer reviews available.</p>'}
+                <div id="employeeReviewList">
+                    ${reviews.length > 0 ? reviews.map(renderReview).join('') : '<p style="color: var(--text-secondary);">No customer reviews available.</p>'}
+                </div>
+                <button id="loadMoreReviewsBtn" class="btn" style="display: none; margin-top: 1rem; padding: 0.5rem 1rem; background-color: var(--primary-color); color: white;">
+                    Load more reviews
+                </button>
             `;
 
+            updateLoadMoreReviews(employee.id, data.reviews_next_cursor);
+
             console.log('Modal content updated, showing modal...');
             showModal('employeeModal');
         } else {
@@ -765,6 +1007,49 @@ async function viewEmployeeDetails(employeeId) {
     }
 }
 
+function renderReview(review) {
+    return `
+        <div class="customer-review">
+            <div class="review-header">
+                <span class="reviewer-name">${review.customer_name}</span>
+                <span class="review-date">${formatDate(review.date)}</span>
+            </div>
+            <div class="review-rating">
+                ${generateStars(parseFloat(review.rating) || 0)}
+            </div>
+            <p class="review-comment">${review.comment || 'No comment provided.'}</p>
+        </div>
+    `;
+}
+
+// Show the "Load more reviews" button while older reviews remain
+function updateLoadMoreReviews(employeeId, nextCursor) {
+    const button = document.getElementById('loadMoreReviewsBtn');
+    if (!button) {
+        return;
+    }
+    if (!nextCursor) {
+        button.style.display = 'none';
+        button.onclick = null;
+        return;
+    }
+    button.style.display = 'inline-block';
+    button.onclick = () => loadMoreReviews(employeeId, nextCursor);
+}
+
+async function loadMoreReviews(employeeId, cursor) {
+    try {
+        const data = await apiRequest(`/api/employees/${employeeId}/reviews?before=${encodeURIComponent(cursor)}`);
+        const list = document.getElementById('employeeReviewList');
+        if (list) {
+            list.insertAdjacentHTML('beforeend', data.reviews.map(renderReview).join(''));
+        }
+        updateLoadMoreReviews(employeeId, data.next_cursor);
+    } catch (error) {
+        console.error('Error loading more reviews:', error);
+    }
+}
+
 // Customer Rating Functions
 async function handleCustomerRatingSubmit(e) {
     e.preventDefault();
@@ -813,43 +1098,41 @@ async function handleCustomerRatingSubmit(e) {
     }
 }
 
+function renderRatingCard(employee) {
+    // Ensure customer_rating is a number
+    const customerRating = parseFloat(employee.customer_rating) || 0;
+    const reviewCount = parseInt(employee.review_count) || 0;
+    
+    const card = document.createElement('div');
+    card.className = 'employee-rating-card';
+    card.innerHTML = `
+        <div class="employee-rating-header">
+            <div class="employee-avatar">${employee.avatar}</div>
+            <div class="employee-rating-info">
+                <h4>${employee.name}</h4>
+                <p>${employee.position}</p>
+            </div>
+        </div>
+        <div class="rating-stars">
+            ${generateStars(customerRating)}
+        </div>
+        <div class="rating-stats">
+            <span class="rating-count">${reviewCount} reviews</span>
+            <span class="rating-badge ${getRatingClass(customerRating)}">${customerRating.toFixed(1)}</span>
+        </div>
+        <button class="rate-btn" onclick="viewEmployeeDetails(${employee.id})">
+            View Details
+        </button>
+    `;
+    return card;
+}
+
 async function loadCustomerRatings() {
     try {
-        // This endpoint should now be accessible to both admins and customers
-        const employees = await apiRequest('/api/employees');
-        const grid = document.getElementById('customerRatingGrid');
-        if (grid) {
-            grid.innerHTML = "";
-
-            employees.forEach(employee => {
-                // Ensure customer_rating is a number
-                const customerRating = parseFloat(employee.customer_rating) || 0;
-                const reviewCount = parseInt(employee.review_count) || 0;
-                
-                const card = document.createElement('div');
-                card.className = 'employee-rating-card';
-                card.innerHTML = `
-                    <div class="employee-rating-header">
-                        <div class="employee-avatar">${employee.avatar}</div>
-                        <div class="employee-rating-info">
-                            <h4>${employee.name}</h4>
-                            <p>${employee.position}</p>
-                        </div>
-                    </div>
-                    <div class="rating-stars">
-                        ${generateStars(customerRating)}
-                    </div>
-                    <div class="rating-stats">
-                        <span class="rating-count">${reviewCount} reviews</span>
-                        <span class="rating-badge ${getRatingClass(customerRating)}">${customerRating.toFixed(1)}</span>
-                    </div>
-                    <button class="rate-btn" onclick="viewEmployeeDetails(${employee.id})">
-                        View Details
-                    </button>
-                `;
-                grid.appendChild(card);
-            });
-        }
+        // This endpoint should now be accessible to both admins and customers.
+        // The rating cards only need a few columns, so ask for just those.
+        await loadEmployeePage('customerRatingGrid', 'fields=id,name,position,avatar,customer_rating,review_count',
+                               renderRatingCard);
         
         // Show rate button only for customers
         const rateBtn = document.getElementById('rateEmployeeBtn');
@@ -1107,6 +1390,11 @@ function navigateToPage(page) {
         activeNavItem.classList.add('active');
     }
 
+    // The live dashboard stream is only needed while the dashboard is shown
+    if (page !== 'dashboard') {
+        disconnectDashboardStream();
+    }
+
     // Show selected content
     currentPage = page;
     switch(page) {
@@ -1180,28 +1468,61 @@ function switchAdminTab(tabName) {
 }
 
 function filterEmployees() {
-    const searchTerm = document.getElementById('searchEmployees').value.toLowerCase();
-    const rows = document.querySelectorAll('#employeeTableBody tr');
-
-    rows.forEach(row => {
-        const text = row.textContent.toLowerCase();
-        row.style.display = text.includes(searchTerm) ? '' : 'none';
-    });
+    searchEmployeeTable('employeeTableBody');
 }
 
 function filterAdminEmployees() {
-    const searchTerm = document.getElementById('searchAdminEmployees').value.toLowerCase();
-    const rows = document.querySelectorAll('#adminEmployeeTableBody tr');
+    searchEmployeeTable('adminEmployeeTableBody');
+}
+
+// Filter a table's loaded rows by their text. While further pages are not
+// loaded yet, also ask /api/search once typing pauses and add the matching
+// employees the table does not have yet, marked as search results.
+function searchEmployeeTable(tbodyId) {
+    const table = EMPLOYEE_TABLES[tbodyId];
+    const tbody = document.getElementById(tbodyId);
+    const input = document.getElementById(table.input);
+    if (!tbody || !input) {
+        return;
+    }
+    const searchTerm = input.value.trim().toLowerCase();
 
-    rows.forEach(row => {
-        const text = row.textContent.toLowerCase();
-        row.style.display = text.includes(searchTerm) ? '' : 'none';
+    tbody.querySelectorAll('tr[data-search-result]').forEach(row => row.remove());
+    tbody.querySelectorAll('tr').forEach(row => {
+        row.style.display = row.textContent.toLowerCase().includes(searchTerm) ? '' : 'none';
     });
+
+    clearTimeout(searchTimers[tbodyId]);
+    const moreButton = document.getElementById(`${tbodyId}More`);
+    const allLoaded = !moreButton || moreButton.style.display === 'none';
+    if (allLoaded || searchTerm.length < SEARCH_MIN_TERM_LENGTH) {
+        return;
+    }
+    searchTimers[tbodyId] = setTimeout(async () => {
+        try {
+            const results = await apiRequest(`/api/search?scope=employees&limit=100&q=${encodeURIComponent(searchTerm)}`);
+            // Ignore answers to a term the user has typed past
+            if (input.value.trim().toLowerCase() !== searchTerm) {
+                return;
+            }
+            const loaded = new Set(Array.from(tbody.querySelectorAll('tr'), row => row.dataset.employeeId));
+            results.employees.forEach(employee => {
+                if (loaded.has(String(employee.id))) {
+                    return;
+                }
+                const row = table.render(employee);
+                row.dataset.searchResult = 'true';
+                tbody.appendChild(row);
+            });
+        } catch (error) {
+            console.error('Error searching employees:', error);
+        }
+    }, 200);
 }
 
 function showRateEmployeeModal() {
     // Refresh employee list before showing modal
-    loadEmployees();
+    loadRateEmployeeOptions();
     showModal('rateEmployeeModal');
 }
 
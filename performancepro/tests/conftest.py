@@ -0,0 +1,215 @@
+import os
+import re
+import sys
+import tempfile
+
+import pymysql
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+# Settings the app reads at import: hash inline, no pool reaper thread, read
+# data versions on every request and keep exports out of the source tree
+os.environ.setdefault('BCRYPT_WORKERS', '0')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('DB_POOL_REAP_INTERVAL', '0')
+os.environ.setdefault('DB_POOL_TIMEOUT', '0.2')
+os.environ.setdefault('DATA_VERSION_REFRESH', '0')
+os.environ.setdefault('EXPORT_DIR', os.path.join(tempfile.mkdtemp(), 'exports'))
+
+TUPLE_CURSORS = (pymysql.cursors.Cursor, pymysql.cursors.SSCursor)
+STREAMING_CURSORS = (pymysql.cursors.SSCursor, pymysql.cursors.SSDictCursor)
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+# Stand-in for MySQL. Statements are answered by the first handler whose
+# pattern matches the whitespace-normalized SQL; a handler is a list of
+# rows (dicts in select order) or a callable(params) returning rows or
+# raising. data_versions and departments are answered built in.
+class FakeDatabase:
+    def __init__(self):
+        self.versions = {'departments': 1, 'employees': 1, 'reviews': 1, 'users': 1, 'directory': 1}
+        self.departments = {1: 'Engineering', 2: 'Marketing', 3: 'Sales'}
+        self.handlers = []
+        self.statements = []
+        self.connections = []
+
+    def on(self, pattern, answer):
+        self.handlers.insert(0, (re.compile(pattern, re.I), answer))
+
+    def executed(self, pattern):
+        return [(sql, params) for sql, params in self.statements if re.search(pattern, sql, re.I)]
+
+    def answer(self, sql, params):
+        sql = normalize(sql)
+        self.statements.append((sql, params))
+        for pattern, answer in self.handlers:
+            if pattern.search(sql):
+                return answer(params) if callable(answer) else answer
+        if sql.startswith('SELECT name, version FROM data_versions'):
+            return [{'name': name, 'version': version} for name, version in self.versions.items()]
+        if sql.startswith('SELECT version FROM data_versions'):
+            return [{'version': self.versions.get(params[0], 0)}]
+        if sql.startswith('UPDATE data_versions'):
+            for name in params:
+                self.versions[name] = self.versions.get(name, 0) + 1
+            return []
+        if sql.startswith('SELECT id, name FROM departments'):
+            return [{'id': department_id, 'name': name} for department_id, name in self.departments.items()]
+        return []
+
+    def connect(self):
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+
+class FakeCursor:
+    def __init__(self, connection, cursorclass):
+        self.connection = connection
+        self.as_tuples = cursorclass in TUPLE_CURSORS
+        self.streaming = cursorclass in STREAMING_CURSORS
+        self.rows = []
+        self.position = 0
+        self.rowcount = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def execute(self, sql, params=None):
+        rows = self.connection.db.answer(sql, params)
+        self.rows = [tuple(row.values()) if self.as_tuples else dict(row) for row in rows]
+        self.position = 0
+        self.rowcount = len(self.rows)
+        return self.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        count = 0
+        for params in seq_of_params:
+            count += self.execute(sql, params)
+        self.rowcount = count
+        return count
+
+    def fetchone(self):
+        if self.position >= len(self.rows):
+            return None
+        self.position += 1
+        return self.rows[self.position - 1]
+
+    def fetchall(self):
+        rows = self.rows[self.position:]
+        self.position = len(self.rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            self.connection.rows_streamed += 1
+            yield row
+
+    def close(self):
+        if self.streaming and not self.closed:
+            # Closing an unbuffered cursor reads its remaining rows
+            self.connection.rows_drained += len(self.rows) - self.position
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.open = True
+        self.commits = 0
+        self.rollbacks = 0
+        self.rows_streamed = 0
+        self.rows_drained = 0
+
+    def cursor(self, cursorclass=None):
+        return FakeCursor(self, cursorclass)
+
+    def ping(self, reconnect=False):
+        if not self.open:
+            raise pymysql.err.InterfaceError('closed')
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDatabase()
+
+
+# The app module with its pool connected to fake_db and every per-process
+# cache emptied
+@pytest.fixture
+def app_module(fake_db, monkeypatch):
+    import app as app_module
+
+    pool = app_module.db_pool
+    monkeypatch.setattr(pool, '_open', fake_db.connect)
+    monkeypatch.setattr(pool, '_reaper_pid', None)
+    with pool._lock:
+        pool._reset_state()
+    app_module.dashboard_cache.invalidate()
+    app_module.data_versions.invalidate()
+    app_module.departments.invalidate()
+    # Empty but current, so no test starts a background rebuild unless it
+    # moves the employees or directory versions
+    app_module.leaderboard.load([], fake_db.versions['employees'])
+    app_module.search_index.load([], fake_db.versions['directory'])
+    app_module.app.config['TESTING'] = True
+    yield app_module
+    assert pool.stats()['in_use'] == 0, 'a test left a database connection checked out'
+
+
+# Pool of a single connection: a route that asks for a second one while
+# holding the first waits until the pool times out
+@pytest.fixture
+def single_connection_pool(app_module, monkeypatch):
+    pool = app_module.db_pool
+    monkeypatch.setattr(pool, 'min_size', 1)
+    monkeypatch.setattr(pool, 'max_size', 1)
+    with pool._lock:
+        pool._reset_state()
+    return pool
+
+
+def login(client, user_id=1, role='admin'):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['username'] = f'{role}{user_id}'
+        session['role'] = role
+        session['name'] = f'{role.title()} {user_id}'
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    login(client, role='admin')
+    return client
+
+
+@pytest.fixture
+def customer_client(client):
+    login(client, user_id=2, role='customer')
+    return client
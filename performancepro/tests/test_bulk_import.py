@@ -0,0 +1,88 @@
+import io
+import json
+
+import pymysql
+import pytest
+
+from bulk_import import import_employees, import_reviews
+from rollups import APPLY_ROLLUP_SQL
+
+
+def ndjson(*rows):
+    return io.BytesIO(''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8'))
+
+
+def employee(number, **fields):
+    return dict({'name': f'Employee {number}', 'department': 'Sales', 'position': 'Clerk',
+                 'email': f'employee{number}@example.com', 'join_date': '2024-01-15'}, **fields)
+
+
+def review(number, employee_id=1, **fields):
+    return dict({'employee_id': employee_id, 'customer_name': f'Customer {number}',
+                 'customer_email': f'customer{number}@example.com', 'rating': 4, 'date': '2024-03-02'}, **fields)
+
+
+@pytest.fixture
+def connection(fake_db):
+    return fake_db.connect()
+
+
+def inserted_rows(fake_db, table):
+    return [params for sql, params in fake_db.executed(f'^INSERT INTO {table} ')]
+
+
+def test_too_long_values_are_row_errors(fake_db, connection):
+    report = import_employees(connection, ndjson(
+        employee(1), employee(2, name='x' * 101), employee(3, phone='1' * 21), employee(4, avatar='ABCDEFGHIJK')
+    ), 'ndjson').as_dict()
+    assert report['inserted'] == 1
+    assert [error['line'] for error in report['errors']] == [2, 3, 4]
+    assert report['errors'][0]['error'] == 'name must be at most 100 characters'
+    assert len(inserted_rows(fake_db, 'employees')) == 1
+
+
+@pytest.mark.parametrize('error', [pymysql.IntegrityError, pymysql.DataError])
+def test_failed_batch_is_retried_row_by_row(fake_db, connection, error):
+    def insert(params):
+        if params[3] == 'employee2@example.com':
+            raise error(1406, 'Data too long for column')
+        return []
+
+    fake_db.on(r'^INSERT INTO employees ', insert)
+    report = import_employees(connection, ndjson(employee(1), employee(2), employee(3)), 'ndjson').as_dict()
+    assert report['inserted'] == 2
+    assert report['failed'] == 1
+    assert report['errors'][0]['line'] == 2
+    assert connection.rollbacks == 1
+    assert connection.commits == 1
+
+
+def test_other_database_errors_fail_the_import(fake_db, connection):
+    def insert(params):
+        raise pymysql.OperationalError(2013, 'Lost connection')
+
+    fake_db.on(r'^INSERT INTO employees ', insert)
+    with pytest.raises(pymysql.OperationalError):
+        import_employees(connection, ndjson(employee(1)), 'ndjson')
+
+
+def test_review_import_folds_batches_into_ratings_and_rollups(fake_db, connection):
+    fake_db.on(r'^SELECT id, department_id FROM employees WHERE id IN',
+               [{'id': 1, 'department_id': 3}, {'id': 2, 'department_id': 1}])
+    report = import_reviews(connection, ndjson(
+        review(1), review(2, rating=2), review(3, employee_id=2), review(4, employee_id=9),
+        review(5, customer_email='c' * 101)
+    ), 'ndjson').as_dict()
+    assert report['inserted'] == 3
+    assert {error['line']: error['error'] for error in report['errors']} == {
+        4: 'Employee not found',
+        5: 'customer_email must be at most 100 characters'
+    }
+    rollups = [params for sql, params in fake_db.executed(r'^INSERT INTO monthly_ratings ')]
+    assert [(params[1], params[2], params[3], params[4]) for params in rollups] == [(1, 3, 6, 2), (2, 1, 4, 1)]
+
+
+def test_batched_statements_can_be_sent_as_one_insert():
+    # pymysql's executemany only rewrites statements whose VALUES are plain
+    # placeholders into one multi-row INSERT
+    assert pymysql.cursors.RE_INSERT_VALUES.match(APPLY_ROLLUP_SQL)
@@ -0,0 +1,63 @@
+def trend_queries(fake_db):
+    return len(fake_db.executed(r'FROM monthly_ratings\s+WHERE period >= %s'))
+
+
+def test_unchanged_dashboard_is_answered_with_304(admin_client, fake_db):
+    response = admin_client.get('/api/dashboard')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = admin_client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert trend_queries(fake_db) == 1
+
+
+def test_cached_dashboard_keeps_its_etag(admin_client, fake_db):
+    first = admin_client.get('/api/dashboard')
+    second = admin_client.get('/api/dashboard')
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert second.get_json() == first.get_json()
+    assert trend_queries(fake_db) == 1
+
+
+def test_write_in_another_process_changes_etag_and_rebuilds(admin_client, fake_db):
+    etag = admin_client.get('/api/dashboard').headers['ETag']
+    # Another worker committed a review
+    fake_db.versions['reviews'] += 1
+
+    response = admin_client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    # The payload cached for the old versions is not served under the new ETag
+    assert trend_queries(fake_db) == 2
+
+
+def test_local_write_invalidates(app_module, admin_client, fake_db):
+    etag = admin_client.get('/api/dashboard').headers['ETag']
+    fake_db.versions['employees'] += 1
+    app_module.leaderboard.load([], fake_db.versions['employees'])
+    app_module.data_changed()
+
+    response = admin_client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert trend_queries(fake_db) == 2
+
+
+def test_etag_depends_on_the_query_string(customer_client, fake_db):
+    first = customer_client.get('/api/employees?limit=1').headers['ETag']
+    second = customer_client.get('/api/employees?limit=2').headers['ETag']
+    assert first != second
+
+
+def test_data_versions_are_read_once_per_refresh(app_module, fake_db, monkeypatch):
+    versions = app_module.data_versions
+    monkeypatch.setattr(versions, 'refresh_interval', 60)
+    versions.invalidate()
+    assert versions.get('employees', 'reviews') == (1, 1)
+    fake_db.versions['employees'] += 1
+    assert versions.get('employees') == (1,)
+    versions.invalidate()
+    assert versions.get('employees') == (2,)
+    assert len(fake_db.executed(r'^SELECT name, version FROM data_versions')) == 2
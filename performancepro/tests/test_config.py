@@ -0,0 +1,88 @@
+import importlib
+import os
+import runpy
+from unittest import mock
+
+import pymysql
+import pytest
+
+import config
+
+GUNICORN_CONF = os.path.join(os.path.dirname(config.__file__), 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def load_config(monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+
+    def load(**env):
+        for name in ('WEB_WORKERS', 'BCRYPT_WORKERS', 'SESSION_BACKEND', 'SECRET_KEY'):
+            monkeypatch.delenv(name, raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(config).Config
+
+    yield load
+    monkeypatch.undo()
+    importlib.reload(config)
+
+
+# A single-process server hashes on every CPU; gunicorn's default
+# 2 * CPUs + 1 workers get one hashing process each
+@pytest.mark.parametrize('env, bcrypt_workers', [
+    ({}, 8),
+    ({'WEB_WORKERS': '2'}, 4),
+    ({'WEB_WORKERS': '17'}, 1),
+    ({'WEB_WORKERS': '17', 'BCRYPT_WORKERS': '3'}, 3)
+])
+def test_bcrypt_workers_share_the_cpus_between_server_workers(load_config, env, bcrypt_workers):
+    assert load_config(**env).BCRYPT_WORKERS == bcrypt_workers
+
+
+class FakeServer:
+    def __init__(self, workers):
+        self.cfg = type('Cfg', (), {'workers': workers})()
+        self.errors = []
+        self.log = self
+
+    def error(self, message, *args):
+        self.errors.append(message % args)
+
+
+# Settings of gunicorn.conf.py for the given WEB_WORKERS, without keeping
+# the variables it exports
+@pytest.fixture
+def gunicorn_conf(monkeypatch):
+    monkeypatch.delenv('WEB_CHECK_QUERIES', raising=False)
+
+    def load(workers):
+        with mock.patch.dict(os.environ, WEB_WORKERS=str(workers)):
+            return runpy.run_path(GUNICORN_CONF)
+
+    return load
+
+
+def test_gunicorn_refuses_the_development_secret_key_with_redis_sessions(gunicorn_conf, load_config):
+    settings = gunicorn_conf(workers=4)
+    assert load_config(WEB_WORKERS='4', SESSION_BACKEND='redis').SECRET_KEY == config.Config.DEVELOPMENT_SECRET_KEY
+
+    server = FakeServer(workers=4)
+    with pytest.raises(SystemExit):
+        settings['on_starting'](server)
+    assert 'SECRET_KEY is not set' in server.errors[0]
+
+
+def test_gunicorn_starts_without_the_query_check_when_the_database_is_down(app_module, gunicorn_conf, load_config,
+                                                                          monkeypatch):
+    def check_queries():
+        raise pymysql.OperationalError(2003, "Can't connect to MySQL server on 'localhost'")
+
+    monkeypatch.setattr(app_module, 'check_queries', check_queries)
+    monkeypatch.setattr(app_module, 'warm_caches', lambda: None)
+    settings = gunicorn_conf(workers=1)
+    load_config(SECRET_KEY='not the development key', SESSION_BACKEND='memory')
+
+    server = FakeServer(workers=1)
+    settings['on_starting'](server)
+    assert len(server.errors) == 1
+    assert "starting without the check: (2003, \"Can't connect" in server.errors[0]
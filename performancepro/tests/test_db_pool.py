@@ -0,0 +1,175 @@
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def pool(fake_db):
+    pool = ConnectionPool({}, min_size=1, max_size=2, timeout=0.1, reap_interval=0)
+    pool._open = fake_db.connect
+    return pool
+
+
+def test_checkout_and_release(pool, fake_db):
+    connection = pool.connection()
+    assert pool.stats()['in_use'] == 1
+    connection.close()
+    stats = pool.stats()
+    assert stats['in_use'] == 0
+    assert stats['idle'] == 1
+    # Returned connections are rolled back and handed out again
+    assert fake_db.connections[0].rollbacks == 1
+    pool.connection().close()
+    assert pool.stats()['created'] == 1
+
+
+def test_close_twice_releases_once(pool):
+    connection = pool.connection()
+    connection.close()
+    connection.close()
+    assert pool.stats()['in_use'] == 0
+    assert pool.stats()['idle'] == 1
+
+
+def test_exhausted_pool_times_out(pool):
+    first, second = pool.connection(), pool.connection()
+    with pytest.raises(PoolTimeout):
+        pool.connection()
+    assert pool.stats()['timeouts'] == 1
+    first.close()
+    second.close()
+
+
+def test_waiter_gets_released_connection(pool):
+    pool.timeout = 2
+    first, second = pool.connection(), pool.connection()
+    threading.Timer(0.05, first.close).start()
+    third = pool.connection()
+    assert pool.stats()['in_use'] == 2
+    second.close()
+    third.close()
+
+
+def test_discard_frees_the_slot(pool, fake_db):
+    connection = pool.connection()
+    connection.discard()
+    assert not fake_db.connections[0].open
+    stats = pool.stats()
+    assert (stats['in_use'], stats['idle'], stats['size']) == (0, 0, 0)
+
+
+def test_dead_connection_is_replaced_on_checkout(pool, fake_db):
+    pool.connection().close()
+    fake_db.connections[0].open = False
+    connection = pool.connection()
+    assert connection._raw is fake_db.connections[1]
+    connection.close()
+
+
+def test_fill_opens_min_size(pool):
+    pool.min_size = 2
+    pool.fill()
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['created']) == (2, 2, 2)
+
+
+def test_prune_closes_idle_connections_above_min_size(pool, fake_db):
+    first, second = pool.connection(), pool.connection()
+    first.close()
+    second.close()
+    pool.idle_timeout = 0.01
+    time.sleep(0.02)
+    pool.prune()
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['recycled']) == (1, 1, 1)
+    assert sum(not connection.open for connection in fake_db.connections) == 1
+
+
+def test_prune_replaces_connections_past_their_lifetime(pool, fake_db):
+    pool.connection().close()
+    pool.max_lifetime = 0.01
+    time.sleep(0.02)
+    pool.prune()
+    assert pool.stats()['size'] == 0
+    pool.max_lifetime = 3600
+    pool.fill()
+    assert pool.stats()['idle'] == 1
+    assert len(fake_db.connections) == 2
+
+
+def test_slow_close_does_not_hold_up_checkouts(pool, fake_db):
+    first, second = pool.connection(), pool.connection()
+    first.close()
+    second.close()
+    # The socket of the expired connection takes its time to close
+    closing, unblock = threading.Event(), threading.Event()
+    stale = fake_db.connections[0]
+
+    def slow_close():
+        closing.set()
+        unblock.wait(1)
+        stale.open = False
+
+    stale.close = slow_close
+    pool.idle_timeout = 0.01
+    time.sleep(0.02)
+    pruner = threading.Thread(target=pool.prune)
+    pruner.start()
+    try:
+        assert closing.wait(1)
+        started = time.monotonic()
+        pool.connection().close()
+        assert pool.stats()['in_use'] == 0
+        assert time.monotonic() - started < 0.5
+    finally:
+        unblock.set()
+        pruner.join()
+    assert not stale.open
+
+
+def test_close_all_closes_idle_and_returned_connections(pool, fake_db):
+    first, second = pool.connection(), pool.connection()
+    first.close()
+    pool.close_all()
+    assert not fake_db.connections[0].open
+    # Still checked out while closing; closed when it comes back
+    second.close()
+    assert not fake_db.connections[1].open
+    assert pool.stats()['size'] == 0
+
+
+def test_ensure_started_fills_once_per_process(pool, fake_db):
+    pool.min_size = 2
+    pool.ensure_started()
+    pool.ensure_started()
+    assert len(fake_db.connections) == 2
+    assert pool.stats()['idle'] == 2
+
+
+def test_ensure_started_survives_a_database_outage(pool):
+    def refuse():
+        raise OSError('connection refused')
+
+    pool._open = refuse
+    pool.ensure_started()
+    assert pool.stats()['size'] == 0
+
+
+def test_reaper_prunes_and_refills(pool, fake_db):
+    pool.max_lifetime = 0.05
+    pool.reap_interval = 0.02
+    pool.ensure_started()
+    time.sleep(0.2)
+    pool.close_all()
+    # The first connection expired and was replaced in the background
+    assert len(fake_db.connections) >= 2
+    assert not fake_db.connections[0].open
+
+
+def test_app_opens_min_size_connections_on_first_request(app_module, admin_client):
+    stats = admin_client.get('/api/pool').get_json()
+    assert stats['idle'] == app_module.Config.DB_POOL_MIN_SIZE
+    assert stats['in_use'] == 0
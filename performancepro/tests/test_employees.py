@@ -0,0 +1,176 @@
+import re
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+EMPLOYEES = [
+    {'id': employee_id, 'name': name, 'department_id': department_id, 'position': 'Engineer',
+     'email': f'{name.split()[0].lower()}@example.com', 'phone': None, 'join_date': date(2020, 1, employee_id),
+     'avatar': avatar, 'customer_rating': Decimal(rating), 'review_count': reviews}
+    for employee_id, name, department_id, avatar, rating, reviews in (
+        (1, 'Ada Lovelace', 1, '', '4.5', 10),
+        (2, 'Grace Hopper', 2, 'GH', '4.0', 8),
+        (3, 'Alan Turing', 3, None, '3.5', 2),
+        (4, 'Edsger Dijkstra', 1, '', '0.0', 0)
+    )
+]
+
+
+# Answer the employee list query from EMPLOYEES with the columns it
+# selects, as many rows as its LIMIT asks for
+def serve_employees(fake_db, employees=EMPLOYEES):
+    def answer(params):
+        sql = fake_db.statements[-1][0]
+        select = re.match(r'SELECT (.*?) FROM employees', sql).group(1)
+        columns = [column.split()[-1] for column in select.split(', ')]
+        source = {'department': 'department_id', 'department_name': 'department_id'}
+        rows = [{column: employee[source.get(column, column)] for column in columns} for employee in employees]
+        return rows[:params[-1]] if 'LIMIT' in sql else rows
+
+    fake_db.on(r'FROM employees e (WHERE .*)?ORDER BY', answer)
+
+
+def list_query(fake_db):
+    return fake_db.executed(r'FROM employees e (WHERE .*)?ORDER BY')[-1]
+
+
+def test_unpaged_list_has_no_cursor(customer_client, fake_db):
+    serve_employees(fake_db)
+    response = customer_client.get('/api/employees')
+    assert response.status_code == 200
+    assert [employee['id'] for employee in response.get_json()] == [1, 2, 3, 4]
+    assert 'X-Next-After-Id' not in response.headers
+    assert 'LIMIT' not in list_query(fake_db)[0]
+
+
+def test_page_reads_one_extra_row_for_the_cursor(customer_client, fake_db):
+    serve_employees(fake_db)
+    response = customer_client.get('/api/employees?limit=2')
+    assert [employee['id'] for employee in response.get_json()] == [1, 2]
+    assert response.headers['X-Next-After-Id'] == '2'
+    assert list_query(fake_db)[1] == [3]
+
+
+def test_last_full_page_has_no_cursor(customer_client, fake_db):
+    serve_employees(fake_db, EMPLOYEES[2:])
+    response = customer_client.get('/api/employees?limit=2&after_id=2')
+    assert [employee['id'] for employee in response.get_json()] == [3, 4]
+    assert 'X-Next-After-Id' not in response.headers
+    sql, params = list_query(fake_db)
+    assert 'WHERE e.id > %s' in sql
+    assert params == [2, 3]
+
+
+def test_page_after_the_end_is_empty(customer_client, fake_db):
+    serve_employees(fake_db, [])
+    response = customer_client.get('/api/employees?limit=2&after_id=4')
+    assert response.status_code == 200
+    assert response.get_json() == []
+    assert 'X-Next-After-Id' not in response.headers
+
+
+def test_descending_pages_go_below_the_cursor(customer_client, fake_db):
+    serve_employees(fake_db, EMPLOYEES[:2][::-1])
+    customer_client.get('/api/employees?limit=2&order=desc&after_id=3')
+    sql, params = list_query(fake_db)
+    assert 'WHERE e.id < %s' in sql
+    assert 'ORDER BY e.id DESC' in sql
+    assert params == [3, 3]
+
+
+def test_sorted_pages_resume_after_the_anchor_employee(customer_client, fake_db):
+    fake_db.on(r'FROM employees e WHERE e.id = %s', [{'rating': Decimal('4.0')}])
+    serve_employees(fake_db, EMPLOYEES[2:])
+    customer_client.get('/api/employees?limit=2&sort=rating&order=desc&after_id=2')
+    sql, params = list_query(fake_db)
+    assert '(e.customer_rating < %s OR (e.customer_rating = %s AND e.id < %s))' in sql
+    assert 'ORDER BY e.customer_rating DESC, e.id DESC' in sql
+    assert params == [Decimal('4.0'), Decimal('4.0'), 2, 3]
+
+
+def test_sorted_page_after_a_missing_employee_is_rejected(customer_client, fake_db):
+    response = customer_client.get('/api/employees?limit=2&sort=name&after_id=99')
+    assert response.status_code == 400
+    assert 'after_id' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('query', [
+    'limit=0', 'limit=501', 'limit=ten', 'after_id=x', 'sort=email', 'order=up', 'fields=id,salary'
+])
+def test_invalid_parameters_are_rejected(customer_client, query):
+    response = customer_client.get(f'/api/employees?{query}')
+    assert response.status_code == 400
+
+
+def test_fields_limit_the_response(customer_client, fake_db):
+    serve_employees(fake_db)
+    employees = customer_client.get('/api/employees?fields=name,position').get_json()
+    assert employees[0] == {'name': 'Ada Lovelace', 'position': 'Engineer'}
+    # id is read for the cursor but not returned
+    assert list_query(fake_db)[0].startswith('SELECT e.id as id, e.name as name, e.position as position FROM')
+
+
+def test_avatar_without_name_reads_the_name_for_initials(customer_client, fake_db):
+    serve_employees(fake_db)
+    employees = customer_client.get('/api/employees?fields=id,avatar').get_json()
+    assert employees == [{'id': 1, 'avatar': 'AL'}, {'id': 2, 'avatar': 'GH'}, {'id': 3, 'avatar': 'AT'},
+                         {'id': 4, 'avatar': 'ED'}]
+
+
+def test_department_fields_are_named_from_the_cache(customer_client, fake_db):
+    serve_employees(fake_db)
+    employees = customer_client.get('/api/employees?fields=id,department,department_name,department_id').get_json()
+    assert employees[1] == {'id': 2, 'department': 'Marketing', 'department_name': 'Marketing',
+                            'department_id': 2}
+
+
+def test_every_field_by_default(customer_client, fake_db):
+    serve_employees(fake_db)
+    employee = customer_client.get('/api/employees').get_json()[0]
+    assert employee == {
+        'id': 1, 'name': 'Ada Lovelace', 'department': 'Engineering', 'department_id': 1, 'position': 'Engineer',
+        'email': 'ada@example.com', 'phone': None, 'join_date': employee['join_date'], 'avatar': 'AL',
+        'customer_rating': employee['customer_rating'], 'review_count': 10, 'department_name': 'Engineering'
+    }
+    assert float(employee['customer_rating']) == 4.5
+
+
+# Refreshing the department cache or checking that the leaderboard is
+# current takes a connection, so it has to happen before the request
+# checks out its own
+@pytest.mark.parametrize('path', ['/api/employees', '/api/employees/1', '/api/analytics',
+                                  '/api/leaderboard?min_rating=4'])
+def test_caches_are_resolved_before_taking_a_connection(app_module, admin_client, fake_db,
+                                                            single_connection_pool, path):
+    serve_employees(fake_db)
+    fake_db.on(r'FROM employees WHERE id = %s', EMPLOYEES[:1])
+    app_module.departments.invalidate()
+    app_module.data_versions.invalidate()
+    response = admin_client.get(path)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('path', ['/api/employees', '/api/employees/1', '/api/analytics',
+                                  '/api/leaderboard'])
+def test_renamed_department_changes_etag(app_module, admin_client, fake_db, path):
+    serve_employees(fake_db)
+    fake_db.on(r'FROM employees WHERE id = %s', EMPLOYEES[:1])
+    etag = admin_client.get(path).headers['ETag']
+    fake_db.departments[1] = 'Research'
+    fake_db.versions['departments'] += 1
+    app_module.data_versions.invalidate()
+
+    response = admin_client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    if path.startswith('/api/employees'):
+        assert 'Research' in response.get_data(as_text=True)
+
+
+def test_route_writes_are_checked_with_the_read_queries(app_module, fake_db):
+    assert app_module.validate_queries(fake_db.connect()) == []
+    prepared = [params[0] for sql, params in fake_db.executed(r'^PREPARE ')]
+    for statement in ('INSERT INTO employees', 'DELETE FROM employees', 'INSERT INTO customer_reviews',
+                      'INSERT INTO users', 'UPDATE users SET password'):
+        assert any(statement in text for text in prepared), statement
@@ -0,0 +1,71 @@
+import pytest
+
+from exports import ExportJobs
+
+
+def test_export_job_resolves_departments_before_taking_a_connection(app_module, fake_db, single_connection_pool,
+                                                                    tmp_path):
+    fake_db.on(r'FROM employees\s+WHERE 1 = 1', [
+        {'id': 1, 'name': 'Ada Lovelace', 'department_id': 2, 'position': 'Engineer', 'email': 'ada@example.com',
+         'phone': None, 'join_date': '2020-01-01', 'customer_rating': 4.5, 'review_count': 10}
+    ])
+    app_module.departments.invalidate()
+    app_module.data_versions.invalidate()
+    jobs = ExportJobs(str(tmp_path), single_connection_pool.connection, app_module.departments.names)
+    job_id = 'a' * 32
+    jobs._run({'id': job_id, 'kind': 'employees', 'format': 'csv'}, None, None)
+    status = jobs.status(job_id)
+    assert status['status'] == 'done', status['error']
+    assert status['rows'] == 1
+    with open(jobs.path(job_id, 'csv')) as f:
+        assert 'Ada Lovelace,Marketing,' in f.read()
+
+
+EMPLOYEE_ROWS = [
+    {'id': employee_id, 'name': f'Employee {employee_id}', 'department_id': 1, 'position': 'Engineer',
+     'email': f'employee{employee_id}@example.com', 'phone': None, 'join_date': '2020-01-01',
+     'customer_rating': 4.5, 'review_count': 10}
+    for employee_id in range(1, 6)
+]
+
+
+@pytest.fixture
+def export_db(fake_db):
+    fake_db.on(r'FROM employees\s+WHERE 1 = 1', EMPLOYEE_ROWS)
+    return fake_db
+
+
+# Responses are closed as a WSGI server closes them once they are sent
+def test_csv_export_returns_the_connection(app_module, admin_client, export_db):
+    with admin_client.get('/api/export/employees') as response:
+        assert response.status_code == 200
+        lines = response.get_data(as_text=True).splitlines()
+    assert lines[0].startswith('id,name,department,')
+    assert len(lines) == len(EMPLOYEE_ROWS) + 1
+    stats = app_module.db_pool.stats()
+    assert stats['in_use'] == 0
+    assert stats['idle'] == stats['size'] == app_module.Config.DB_POOL_MIN_SIZE
+
+
+def test_head_of_csv_export_returns_the_connection(app_module, admin_client, export_db):
+    with admin_client.head('/api/export/employees') as response:
+        assert response.status_code == 200
+        assert response.get_data() == b''
+    assert app_module.db_pool.stats()['in_use'] == 0
+
+
+def test_abandoned_csv_export_drops_the_connection(app_module, admin_client, export_db, monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'EXPORT_CHUNK_SIZE', 1)
+    response = admin_client.get('/api/export/employees')
+    next(iter(response.response))
+    assert app_module.db_pool.stats()['in_use'] == 1
+    # The client disconnects after the first chunk
+    response.close()
+    stats = app_module.db_pool.stats()
+    assert stats['in_use'] == 0
+    assert stats['size'] == app_module.Config.DB_POOL_MIN_SIZE - 1
+    streamed = [connection for connection in export_db.connections if connection.rows_streamed]
+    assert len(streamed) == 1 and not streamed[0].open
+    # The unread rows were left on the socket, not drained
+    assert streamed[0].rows_streamed < len(EMPLOYEE_ROWS)
+    assert streamed[0].rows_drained == 0
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import pytest
+
+from leaderboard import Leaderboard
+
+EMPLOYEES = [
+    {'id': employee_id, 'name': f'Employee {employee_id}', 'department_id': department_id,
+     'customer_rating': Decimal(rating), 'review_count': reviews}
+    for employee_id, department_id, rating, reviews in (
+        (1, 1, '4.5', 10),
+        (2, 1, '4.0', 8),
+        (3, 2, '4.0', 3),
+        (4, 2, '3.9', 2),
+        (5, 3, '0.0', 0)
+    )
+]
+
+
+@pytest.fixture
+def board():
+    board = Leaderboard()
+    board.load(EMPLOYEES, 1)
+    return board
+
+
+@pytest.mark.parametrize('min_rating, department_id, count', [
+    (4, None, 3),
+    (4.0, None, 3),
+    ('4.01', None, 1),
+    (3.95, None, 3),
+    (3.9, None, 4),
+    (5, None, 0),
+    (0, None, 5),
+    (4, 2, 1),
+    (4, 9, 0)
+])
+def test_count_at_least_is_inclusive(board, min_rating, department_id, count):
+    assert board.count_at_least(min_rating, department_id) == count
+
+
+def test_count_at_least_follows_updates(board):
+    board.update(4, Decimal('4.2'), 3)
+    assert board.count_at_least(4) == 4
+    assert board.count_at_least(4, 2) == 2
+    board.remove(1)
+    assert board.count_at_least('4.5') == 0
+
+
+def test_top_skips_unreviewed_employees(board):
+    assert [employee['id'] for employee in board.top(10)] == [1, 2, 3, 4]
+    # Equal ratings rank the employee with more reviews first
+    assert [employee['id'] for employee in board.top(2, 1)] == [1, 2]
+
+
+def test_leaderboard_route_counts_from_the_board(app_module, admin_client, fake_db):
+    app_module.leaderboard.load(EMPLOYEES, fake_db.versions['employees'])
+    response = admin_client.get('/api/leaderboard?min_rating=4&department=Engineering')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['count_at_least'] == 2
+    assert [employee['department'] for employee in result['employees']] == ['Engineering', 'Engineering']
+    assert not fake_db.executed(r'FROM employees')
+
+
+def test_leaderboard_route_falls_back_to_sql(app_module, admin_client, fake_db):
+    app_module.leaderboard.version = None
+    # Hold off the background rebuild so the request is answered by SQL
+    app_module.leaderboard._rebuilding = True
+    try:
+        fake_db.on(r'^SELECT COUNT\(\*\)', [{'count': 7}])
+        response = admin_client.get('/api/leaderboard?min_rating=4')
+    finally:
+        app_module.leaderboard._rebuilding = False
+    assert response.get_json()['count_at_least'] == 7
+    sql, params = fake_db.executed(r'SELECT COUNT')[-1]
+    assert params == (4.0,)
+
+
+def test_caches_are_built_at_startup(app_module, fake_db, monkeypatch):
+    fake_db.versions.update(employees=5, directory=3)
+    fake_db.on(r'^SELECT id, name, department_id, customer_rating, review_count FROM employees$', EMPLOYEES)
+    monkeypatch.setattr(app_module.pymysql, 'connect', lambda **config: fake_db.connect())
+    app_module.warm_caches()
+    assert app_module.leaderboard.version == 5
+    assert len(app_module.leaderboard) == len(EMPLOYEES)
+    assert app_module.search_index.version == 3
+    assert fake_db.connections[-1].open is False
+
+
+def test_check_compares_with_the_registered_queries(board, fake_db):
+    fake_db.on(r'^SELECT id, name, department_id, customer_rating, review_count FROM employees$', EMPLOYEES)
+    fake_db.on(r'^SELECT id\s+FROM employees\s+WHERE review_count > 0', [{'id': 1}, {'id': 2}, {'id': 3}, {'id': 4}])
+    fake_db.on(r'^SELECT COUNT\(\*\) as count FROM employees WHERE customer_rating >= %s',
+               lambda params: [{'count': sum(employee['customer_rating'] >= Decimal(str(params[0]))
+                                             for employee in EMPLOYEES)}])
+    assert board.check(fake_db.connect()) == []
+
+    board.update(4, Decimal('4.2'), 3)
+    problems = board.check(fake_db.connect())
+    assert {problem['problem'] for problem in problems} == {'stale entry', 'top list differs'}
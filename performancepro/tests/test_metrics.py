@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_token(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'METRICS_TOKEN', 's3cret')
+    return 's3cret'
+
+
+def test_metrics_need_a_login(client):
+    assert client.get('/metrics').status_code == 401
+
+
+def test_metrics_are_for_admins(customer_client):
+    assert customer_client.get('/metrics').status_code == 403
+
+
+def test_admins_read_metrics(admin_client):
+    response = admin_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    assert 'performancepro_request_duration_seconds' in response.get_data(as_text=True)
+
+
+def test_scraper_reads_metrics_with_the_token(client, metrics_token):
+    response = client.get('/metrics', headers={'Authorization': f'Bearer {metrics_token}'})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('authorization', ['Bearer wrong', 's3cret', 'Bearer '])
+def test_wrong_token_is_refused(client, metrics_token, authorization):
+    assert client.get('/metrics', headers={'Authorization': authorization}).status_code == 401
+
+
+def test_no_token_is_accepted_when_none_is_configured(client):
+    assert client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code == 401
@@ -0,0 +1,19 @@
+from decimal import Decimal
+
+import pytest
+
+from ratings import expected_rating
+
+
+@pytest.mark.parametrize('rating_sum, review_count, rating', [
+    (0, 0, '0.0'),
+    (5, 1, '5.0'),
+    (9, 2, '4.5'),
+    (13, 3, '4.3'),
+    (14, 3, '4.7'),
+    # 1.44995 is 1.4500 at MySQL's division precision, which rounds up
+    (28999, 20000, '1.5'),
+    (28998, 20000, '1.4')
+])
+def test_expected_rating_matches_mysql_rounding(rating_sum, review_count, rating):
+    assert expected_rating(rating_sum, review_count) == Decimal(rating)
@@ -0,0 +1,150 @@
+import json
+
+import pymysql
+import pytest
+
+from review_queue import ReviewQueue
+
+
+def review(number, employee_id=1, **fields):
+    return dict({'employee_id': employee_id, 'customer_name': f'Customer {number}',
+                 'customer_email': f'customer{number}@example.com', 'rating': 4, 'comment': '',
+                 'date': '2024-03-02'}, **fields)
+
+
+@pytest.fixture
+def queue(fake_db, tmp_path, monkeypatch):
+    fake_db.on(r'^SELECT id, department_id FROM employees WHERE id IN',
+               [{'id': 1, 'department_id': 3}, {'id': 2, 'department_id': 1}])
+    queue = ReviewQueue(str(tmp_path / 'queue.sqlite3'), fake_db.connect, flush_size=10)
+    # Flush by hand instead of on the batcher thread
+    monkeypatch.setattr(queue, 'ensure_started', lambda: None)
+    return queue
+
+
+def inserted_reviews(fake_db):
+    return [params for sql, params in fake_db.executed(r'^INSERT INTO customer_reviews ')]
+
+
+def test_batch_is_written_in_one_transaction(queue, fake_db):
+    for number in range(3):
+        queue.enqueue(review(number))
+    assert queue.flush_once() == 3
+    assert len(inserted_reviews(fake_db)) == 3
+    assert fake_db.connections[-1].commits == 1
+    stats = queue.stats()
+    assert (stats['pending'], stats['flushed'], stats['dead'], stats['dead_letters']) == (0, 3, 0, 0)
+
+
+def test_reviews_of_deleted_employees_are_dropped(queue, fake_db):
+    queue.enqueue(review(1))
+    queue.enqueue(review(2, employee_id=9))
+    queue.flush_once()
+    assert queue.stats()['flushed'] == 1
+    assert queue.stats()['dropped'] == 1
+
+
+@pytest.mark.parametrize('error', [pymysql.DataError, pymysql.IntegrityError])
+def test_refused_review_is_moved_to_dead_letters(queue, fake_db, error):
+    def insert(params):
+        if params[1] == 'Customer 1':
+            raise error(1406, "Data too long for column 'customer_name'")
+        return []
+
+    fake_db.on(r'^INSERT INTO customer_reviews ', insert)
+    for number in range(3):
+        queue.enqueue(review(number))
+    assert queue.flush_once() == 3
+
+    # The batch is rolled back and written again one review at a time
+    assert fake_db.connections[-1].rollbacks == 1
+    assert len(fake_db.executed(r'^SAVEPOINT queued_review')) == 3
+    assert len(fake_db.executed(r'^ROLLBACK TO SAVEPOINT queued_review')) == 1
+    stats = queue.stats()
+    assert (stats['pending'], stats['flushed'], stats['dead'], stats['dead_letters']) == (0, 2, 1, 1)
+    payload, error_text = queue._db().execute("SELECT payload, error FROM dead_reviews").fetchone()
+    assert json.loads(payload)['customer_name'] == 'Customer 1'
+    assert 'Data too long' in error_text
+    # The queue moves on
+    queue.enqueue(review(3))
+    assert queue.flush_once() == 1
+
+
+def test_undecodable_review_is_moved_to_dead_letters(queue, fake_db):
+    queue.enqueue(review(1))
+    queue.enqueue(review(2, date='2024-02-30'))
+    queue._db().execute("INSERT INTO pending_reviews (payload, enqueued_at) VALUES ('{\"employee_id\": 1', 0)")
+    assert queue.flush_once() == 3
+
+    assert [params[1] for params in inserted_reviews(fake_db)] == ['Customer 1']
+    stats = queue.stats()
+    assert (stats['pending'], stats['flushed'], stats['dead'], stats['dead_letters']) == (0, 1, 2, 2)
+    dead = queue._db().execute("SELECT payload, error FROM dead_reviews ORDER BY id").fetchall()
+    assert json.loads(dead[0][0])['customer_name'] == 'Customer 2'
+    assert dead[1][0] == '{"employee_id": 1'
+    assert all(error.startswith('undecodable payload') for _, error in dead)
+
+
+def test_batch_of_undecodable_reviews_is_not_written(queue, fake_db):
+    queue.enqueue(review(1, rating=None, date=None))
+    assert queue.flush_once() == 1
+    assert fake_db.executed(r'^INSERT INTO') == []
+    assert queue.stats()['dead_letters'] == 1
+
+
+def test_unexpected_error_abandons_the_claim(queue, fake_db):
+    def insert(params):
+        raise RuntimeError('unexpected')
+
+    fake_db.on(r'^INSERT INTO customer_reviews ', insert)
+    queue.enqueue(review(1))
+    with pytest.raises(RuntimeError):
+        queue.flush_once()
+    assert queue.stats()['failures'] == 1
+    assert queue._db().execute("SELECT claimed_at FROM pending_reviews").fetchone() == (0,)
+
+
+def test_failed_batch_is_retried(queue, fake_db):
+    attempts = []
+
+    def insert(params):
+        attempts.append(params)
+        if len(attempts) == 1:
+            raise pymysql.OperationalError(2013, 'Lost connection to MySQL server during query')
+        return []
+
+    fake_db.on(r'^INSERT INTO customer_reviews ', insert)
+    queue.enqueue(review(1))
+    with pytest.raises(pymysql.OperationalError):
+        queue.flush_once()
+    assert queue.stats()['failures'] == 1
+    assert queue.stats()['pending'] == 1
+
+    # The abandoned claim is stale, so the next flush takes it over after
+    # checking that its commit did not go through
+    assert queue.flush_once() == 1
+    assert fake_db.executed(r'^SELECT 1 FROM review_ingest_batches WHERE batch_id = %s')
+    assert queue.stats()['pending'] == 0
+    assert queue.stats()['flushed'] == 1
+
+
+def test_recovered_batch_that_was_committed_is_not_written_again(queue, fake_db):
+    queue.enqueue(review(1))
+    batch_id, _, _ = queue._claim()
+    queue._abandon(batch_id)
+    fake_db.on(r'^SELECT 1 FROM review_ingest_batches', [{'1': 1}])
+    assert queue.flush_once() == 1
+    assert inserted_reviews(fake_db) == []
+    assert queue.stats()['pending'] == 0
+
+
+def test_over_long_review_is_refused_before_queueing(app_module, customer_client, queue, monkeypatch):
+    monkeypatch.setattr(app_module, 'review_queue', queue)
+    response = customer_client.post('/api/reviews', json=review(1, customer_name='x' * 101))
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'customer_name must be at most 100 characters'
+    assert queue.stats()['pending'] == 0
+
+    response = customer_client.post('/api/reviews', json=review(2))
+    assert response.status_code == 202
+    assert queue.stats()['pending'] == 1
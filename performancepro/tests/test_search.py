@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+
+def employee_row(employee_id, name, department_id=1, position='Engineer'):
+    return {'id': employee_id, 'name': name, 'department_id': department_id, 'position': position,
+            'email': f'{name.split()[0].lower()}@example.com', 'avatar': '', 'customer_rating': Decimal('4.0'),
+            'review_count': 3}
+
+
+def test_search_ranks_and_hydrates_employees(app_module, customer_client, fake_db):
+    rows = [employee_row(1, 'Ada Lovelace'), employee_row(2, 'Adam Smith', 2, 'Sales Lead')]
+    app_module.search_index.load(rows, fake_db.versions['directory'])
+    fake_db.on(r'FROM employees e WHERE e.id IN', rows)
+    response = customer_client.get('/api/search?scope=employees&q=ada')
+    assert response.status_code == 200
+    employees = response.get_json()['employees']
+    assert [employee['id'] for employee in employees][0] == 1
+    assert employees[0]['department'] == 'Engineering'
+    assert employees[0]['avatar'] == 'AL'
+
+
+def test_search_resolves_caches_before_taking_a_connection(app_module, customer_client, fake_db,
+                                                          single_connection_pool):
+    rows = [employee_row(1, 'Ada Lovelace')]
+    app_module.search_index.load(rows, fake_db.versions['directory'])
+    fake_db.on(r'FROM employees e WHERE e.id IN', rows)
+    app_module.departments.invalidate()
+    app_module.data_versions.invalidate()
+
+    response = customer_client.get('/api/search?scope=employees&q=ada')
+    assert response.status_code == 200
+    assert response.get_json()['employees'][0]['department'] == 'Engineering'
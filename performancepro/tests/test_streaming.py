@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+
+REVIEWS = [
+    {'id': review_id, 'employee_id': 1, 'customer_name': f'Customer {review_id}',
+     'customer_email': f'customer{review_id}@example.com', 'rating': 5, 'comment': 'Great',
+     'date': date(2024, 1, review_id)}
+    for review_id in range(5, 0, -1)
+]
+
+
+@pytest.fixture
+def reviews_db(fake_db):
+    fake_db.on(r'SELECT id FROM employees WHERE id = %s', lambda params: [{'id': 1}] if params[0] == 1 else [])
+    fake_db.on(r'FROM customer_reviews WHERE employee_id = %s', REVIEWS)
+    return fake_db
+
+
+# Responses are closed as a WSGI server closes them once they are sent
+def test_streamed_reviews_return_the_connection(app_module, customer_client, reviews_db):
+    with customer_client.get('/api/employees/1/reviews?format=ndjson') as response:
+        assert response.status_code == 200
+        assert len(response.get_data(as_text=True).splitlines()) == len(REVIEWS)
+    stats = app_module.db_pool.stats()
+    assert stats['in_use'] == 0
+    # Read to the end, so the connection is kept
+    assert stats['idle'] == stats['size'] == app_module.Config.DB_POOL_MIN_SIZE
+
+
+def test_head_of_streamed_reviews_returns_the_connection(app_module, customer_client, reviews_db):
+    with customer_client.head('/api/employees/1/reviews?format=ndjson') as response:
+        assert response.status_code == 200
+        assert response.get_data() == b''
+    assert app_module.db_pool.stats()['in_use'] == 0
+
+
+def test_abandoned_stream_drops_the_connection(app_module, customer_client, reviews_db):
+    response = customer_client.get('/api/employees/1/reviews?format=ndjson')
+    next(iter(response.response))
+    assert app_module.db_pool.stats()['in_use'] == 1
+    # The client disconnects after the first row
+    response.close()
+    stats = app_module.db_pool.stats()
+    assert stats['in_use'] == 0
+    # Unread rows may be left on the unbuffered cursor
+    assert stats['size'] == app_module.Config.DB_POOL_MIN_SIZE - 1
+    streamed = [connection for connection in reviews_db.connections if connection.rows_streamed]
+    assert len(streamed) == 1 and not streamed[0].open
+
+
+def test_stream_of_unknown_employee_returns_the_connection(app_module, customer_client, reviews_db):
+    with customer_client.get('/api/employees/2/reviews?format=ndjson') as response:
+        assert response.status_code == 404
+    assert app_module.db_pool.stats()['in_use'] == 0